@@ -5,16 +5,21 @@ from strategies.indicators import (
     calculate_indicators, identify_levels, check_trend_ema200, 
     detect_patterns, check_candlestick_patterns
 )
+from strategies.performance import analyze_trades, write_report
+from strategies.monte_carlo import monte_carlo, format_monte_carlo
+from strategies.intrabar import IntrabarResolver, resolve_exits, OUTCOME_NAMES
 import logging
+import os
 
 # Loglarni o'chirish (toza output uchun)
 logging.getLogger("treding.data.feed").setLevel(logging.ERROR)
 
-def run_backtest(symbol="XAU/USD"):
+def run_backtest(symbol="XAU/USD", report_path=None, plot=False, use_m1=True, data_handler=None):
     print(f"--- {symbol} uchun 3-Bosqichli Strategiya Backtesti (1 Oy) ---")
     print("Ma'lumotlar yuklanmoqda...")
     
-    data = DataHandler()
+    # data_handler - DataHandler yoki offline manba (masalan, data.synthetic.SyntheticDataHandler)
+    data = data_handler or DataHandler()
     
     # 1. Ma'lumotlarni yuklash (60 kunlik - indikatorlar hisoblash uchun zaxira bilan)
     # H4 - Global Context
@@ -36,6 +41,7 @@ def run_backtest(symbol="XAU/USD"):
     # Simulyatsiya
     balance = 1000
     trades = []
+    entries = [] # (index, yo'nalish, narx, sl, tp)
     
     # H4 ma'lumotlarini tezkor qidirish uchun dictionaryga o'tkazish (optimization)
     # Aslida M15 sham vaqtiga mos keladigan H4 shamni topishimiz kerak.
@@ -166,75 +172,72 @@ def run_backtest(symbol="XAU/USD"):
              sl = entry_price - atr if direction == "BUY" else entry_price + atr
              tp = entry_price + (atr * 2) if direction == "BUY" else entry_price - (atr * 2)
              
-             # Oddiy natijani tekshirish (pips)
-             # Keyingi 4 soat (16 ta M15 sham) ichida nima bo'ldi?
-             future_candles = df_m15.iloc[i+1:i+20]
-             
-             outcome = "BE" # Breakeven default
-             pnl = 0
-             
-             for _, future_row in future_candles.iterrows():
-                 high = future_row['high']
-                 low = future_row['low']
-                 
-                 if direction == "BUY":
-                     if low <= sl:
-                         outcome = "LOSS"
-                         pnl = sl - entry_price
-                         break
-                     if high >= tp:
-                         outcome = "WIN"
-                         pnl = tp - entry_price
-                         break
-                 elif direction == "SELL":
-                     if high >= sl:
-                         outcome = "LOSS"
-                         pnl = entry_price - sl
-                         break
-                     if low <= tp:
-                         outcome = "WIN"
-                         pnl = entry_price - tp
-                         break
-             
-             # Agar vaqt tugasa va SL/TP bo'lmasa, current price da yopamiz
-             if outcome == "BE" and not future_candles.empty:
-                 exit_price = future_candles.iloc[-1]['close']
-                 if direction == "BUY": pnl = exit_price - entry_price
-                 else: pnl = entry_price - exit_price
-                 outcome = "CLOSE"
-                 
-             trades.append({
-                 "time": current_time,
-                 "type": direction,
-                 "price": entry_price,
-                 "outcome": outcome,
-                 "pnl": pnl
-             })
+             # Natija sikldan keyin bitta paketda aniqlanadi (resolve_exits)
+             entries.append((i, direction, entry_price, sl, tp))
              
              # Savdo ochilgandan keyin biroz kutish (cooldown) - masalan keyingi 10 sham
              # i += 10 # Loop ichida i ni o'zgartirib bo'lmaydi, lekin biz shunchaki continue qilishimiz mumkin
              # Real loopda bu murakkabroq, shuning uchun shunchaki davom etamiz.
+    
+    # Oddiy natijani tekshirish (pips)
+    # Keyingi ~5 soat (19 ta M15 sham) ichida nima bo'ldi?
+    # Bitta shamda ham SL, ham TP bo'lsa - M1 orqali aniqlaymiz (agar M1 ma'lumoti bo'lsa)
+    resolver = None
+    if use_m1:
+        df_m1 = data.fetch_data(symbol, "M1", limit=20000)
+        if not df_m1.empty:
+            resolver = IntrabarResolver(df_m15.index, df_m1)
+            print(f"M1 qamrovi: {resolver.coverage()} ta M15 sham")
+    
+    if entries:
+        pos, directions, prices, sls, tps = map(np.array, zip(*entries))
+        exits = resolve_exits(df_m15, pos, directions == "BUY", prices, sls, tps, horizon=19, resolver=resolver)
+        print(f"Noaniq (SL+TP bitta shamda) holatlar: {int(exits['ambiguous'].sum())}")
+        
+        for j in range(len(entries)):
+            trades.append({
+                "time": df_m15.index[pos[j]],
+                "type": str(directions[j]),
+                "price": float(prices[j]),
+                "outcome": str(OUTCOME_NAMES[exits["outcome"][j]]),
+                "pnl": float(exits["pnl"][j])
+            })
              
-    # Natijalar
-    total_trades = len(trades)
-    wins = len([t for t in trades if t['pnl'] > 0])
-    losses = len([t for t in trades if t['pnl'] < 0])
-    win_rate = (wins / total_trades * 100) if total_trades > 0 else 0
-    total_pnl = sum([t['pnl'] for t in trades])
+    # Natijalar (vektorlashtirilgan tahlil)
+    report = analyze_trades(trades, initial_balance=balance)
+    m = report["metrics"]
     
     if trades:
         print("\n--- BARCHA SAVDOLAR RO'YXATI ---")
         print(f"{'VAQT (UTC)':<25} | {'TUR':<5} | {'NATIJA':<6} | {'PnL':<8}")
         print("-" * 55)
         for t in trades:
-            print(f"{str(t['type']):<5} | {t['outcome']:<6} | {t['pnl']:.2f} | {t['time']}")
+            print(f"{str(t['time']):<25} | {str(t['type']):<5} | {t['outcome']:<6} | {t['pnl']:<8.2f}")
 
     print("\n--- BACKTEST NATIJALARI (YAKUNIY) ---")
-    print(f"Jami Savdolar: {total_trades}")
-    print(f"Yutuqlar: {wins}")
-    print(f"Yo'qotishlar: {losses}")
-    print(f"Win Rate: {win_rate:.2f}%")
-    print(f"Total PnL (Price diff): {total_pnl:.2f}")
+    print(f"Jami Savdolar: {m['trades']}")
+    print(f"Yutuqlar: {m['wins']}")
+    print(f"Yo'qotishlar: {m['losses']}")
+    print(f"Win Rate: {m['win_rate']:.2f}%")
+    print(f"Total PnL (Price diff): {m['total_pnl']:.2f}")
+    print(f"Profit Factor: {m['profit_factor']:.2f}")
+    print(f"Expectancy: {m['expectancy']:.2f}")
+    print(f"Max Drawdown: {m['max_drawdown']:.2f} ({m['max_drawdown_pct']:.2f}%)")
+    print(f"Sharpe / Sortino (per-trade): {m['sharpe']:.2f} / {m['sortino']:.2f}")
+    
+    for name, row in report.get("sessions", {}).items():
+        print(f"  {name:<9} | {row['trades']:>4} savdo | WR {row['win_rate']:.1f}% | PnL {row['pnl']:.2f}")
+    
+    # Drawdown riski: savdolar ketma-ketligini qayta tanlash (Monte Carlo)
+    if trades:
+        report["monte_carlo"] = monte_carlo([t['pnl'] for t in trades], initial_balance=balance, seed=0)
+        print(format_monte_carlo(report["monte_carlo"]))
+    
+    if report_path is None:
+        report_path = os.path.join("reports", f"backtest_{symbol.replace('/', '')}")
+    files = write_report(report, trades, report_path, initial_balance=balance, plot=plot)
+    print(f"Hisobot saqlandi: {', '.join(files)}")
+    return report
 
 if __name__ == "__main__":
-    run_backtest()
+    run_backtest(plot=True)
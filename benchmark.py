@@ -0,0 +1,291 @@
+"""
+Strategiya "hot path" funksiyalari uchun offline benchmark.
+
+Ma'lumotlar data.synthetic generatoridan olinadi (tarmoq kerak emas).
+Har bir funksiya uchun: throughput (sham/s; check_signal uchun - chaqiruv/s), latency foizlari (p50/p90/p99) va
+eng yuqori xotira (tracemalloc). Natijalar JSON ga yoziladi va baseline bilan solishtiriladi.
+
+Misollar:
+    python benchmark.py --sizes 1000,10000
+    python benchmark.py --sizes 1000,100000,10000000 --only calculate_indicators,resolve_exits
+    python benchmark.py --baseline reports/benchmark_baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data.synthetic import generate_ohlcv, resample_ohlcv
+from strategies.indicators import (
+    calculate_indicators, identify_levels, detect_patterns, check_candlestick_patterns
+)
+from strategies.intrabar import resolve_exits
+
+CONFIG = {"RSI_PERIOD": 14, "EMA_FAST": 50, "EMA_SLOW": 200}
+
+
+class _FrameHandler:
+    """Oldindan tayyorlangan DataFrame'larni DataHandler interfeysi orqali beradi."""
+    def __init__(self, frames: dict):
+        self.frames = frames
+
+    def fetch_data(self, symbol, timeframe, limit=100):
+        df = self.frames.get(timeframe)
+        if df is None:
+            return pd.DataFrame()
+        return df.tail(limit).copy()
+
+    def get_current_price(self, symbol, force_fetch=False):
+        return float(self.frames["M15"]["close"].iloc[-1])
+
+
+def _frames(n, seed):
+    """n ta M15 sham va ularga mos H1/H4 (resample)."""
+    m15 = generate_ohlcv(n, "M15", seed=seed)
+    return {"M15": m15, "H1": resample_ohlcv(m15, "H1"), "H4": resample_ohlcv(m15, "H4")}
+
+
+# --- Benchmark holatlari ---
+# Har bir holat: (n, seed) -> (chaqiriladigan funksiya, bir chaqiruvdagi shamlar soni)
+
+def case_generate_ohlcv(n, seed):
+    return (lambda: generate_ohlcv(n, "M15", seed=seed)), n
+
+
+def case_calculate_indicators(n, seed):
+    df = generate_ohlcv(n, "M15", seed=seed)
+    return (lambda: calculate_indicators(df.copy(), CONFIG)), n
+
+
+def case_identify_levels(n, seed):
+    df = generate_ohlcv(n, "M15", seed=seed)
+    return (lambda: identify_levels(df, window=10)), n
+
+
+def case_detect_patterns(n, seed):
+    df = generate_ohlcv(n, "M15", seed=seed)
+    return (lambda: detect_patterns(df)), n
+
+
+def case_check_candlestick_patterns(n, seed):
+    df = generate_ohlcv(n, "M15", seed=seed)
+    rows = [row for _, row in df.iterrows()]
+
+    def run():
+        for i in range(2, len(rows)):
+            check_candlestick_patterns(rows[i], rows[i - 1], rows[i - 2])
+    return run, n
+
+
+def case_resolve_exits(n, seed):
+    df = generate_ohlcv(n, "M15", seed=seed)
+    pos = np.arange(200, n - 1, 10)
+    price = df["close"].to_numpy()[pos]
+    is_buy = (pos // 10) % 2 == 0
+    dist = price * 0.003
+    sl = np.where(is_buy, price - dist, price + dist)
+    tp = np.where(is_buy, price + 2 * dist, price - 2 * dist)
+    return (lambda: resolve_exits(df, pos, is_buy, price, sl, tp, horizon=29)), n
+
+
+def case_monte_carlo(n, seed):
+    # n - savdolar soni, 10 000 sinov bitta paketda
+    from strategies.monte_carlo import monte_carlo
+    pnl = np.random.default_rng(seed).normal(0.5, 10.0, n)
+    return (lambda: monte_carlo(pnl, trials=10_000, seed=seed)), n
+
+
+def case_run_scenario(n, seed):
+    from optimize_strategy import run_scenario
+    frames = {tf: calculate_indicators(df, CONFIG) for tf, df in _frames(n, seed).items()}
+    return (lambda: run_scenario(frames["H4"], frames["H1"], frames["M15"], "bench", {"multi_tf": True})), n
+
+
+def case_feature_store(n, seed):
+    from strategies.features import FeatureStore
+    frames = {tf: calculate_indicators(df, CONFIG) for tf, df in _frames(n, seed).items()}
+    return (lambda: FeatureStore(frames["H4"], frames["H1"], frames["M15"]).prepare(windows=(10,))), n
+
+
+def case_scenario_shared_features(n, seed):
+    # Qo'shimcha ssenariy narxi: FeatureStore tayyor, faqat parametr shartlari + SL/TP
+    from optimize_strategy import run_scenario
+    from strategies.features import FeatureStore
+    frames = {tf: calculate_indicators(df, CONFIG) for tf, df in _frames(n, seed).items()}
+    store = FeatureStore(frames["H4"], frames["H1"], frames["M15"]).prepare(windows=(10,))
+    return (lambda: run_scenario(frames["H4"], frames["H1"], frames["M15"], "bench", {"multi_tf": True},
+                                 features=store)), n
+
+
+def case_run_backtest(n, seed):
+    from backtest import run_backtest
+    handler = _FrameHandler(_frames(n, seed))
+    out_dir = tempfile.mkdtemp(prefix="bench_")
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_backtest("XAU/USD", report_path=os.path.join(out_dir, "bt"), use_m1=False, data_handler=handler)
+    return run, n
+
+
+def case_check_signal(n, seed):
+    from db.database import Database
+    from strategies.engine import StrategyEngine
+    from strategies.state_manager import TradeBook
+    handler = _FrameHandler(_frames(max(n, 4000), seed))
+    # Savdo holati (trades jadvali) xotiradagi bazada; joriy papkadagi trading_state.json ga tegilmaydi
+    db = Database("sqlite:///:memory:")
+    engine = StrategyEngine(db, handler, trades=TradeBook(db, legacy_state_file=None))
+
+    def run():
+        # Xato yutilmaydi: ishlamay qolgan baholashning vaqti o'lchov sifatida chiqmasligi kerak
+        engine.check_signal("XAU/USD")
+    return run, 1
+
+
+# nom -> (holat, maksimal sham soni (None - cheklovsiz), hajmga bog'liqmi)
+CASES = {
+    "generate_ohlcv": (case_generate_ohlcv, None, True),
+    "calculate_indicators": (case_calculate_indicators, None, True),
+    "identify_levels": (case_identify_levels, 20_000, True),
+    "detect_patterns": (case_detect_patterns, 20_000, True),
+    "check_candlestick_patterns": (case_check_candlestick_patterns, 200_000, True),
+    "resolve_exits": (case_resolve_exits, None, True),
+    "feature_store": (case_feature_store, None, True),
+    "monte_carlo": (case_monte_carlo, 2_000, True),
+    "run_scenario": (case_run_scenario, None, True),
+    "scenario_shared_features": (case_scenario_shared_features, None, True),
+    "run_backtest": (case_run_backtest, 5_000, True),
+    "check_signal": (case_check_signal, None, False),
+}
+
+
+def measure(fn, bars, budget=2.0, max_repeats=50):
+    """Funksiyani o'lchaydi: latency foizlari, throughput va eng yuqori xotira."""
+    t0 = time.perf_counter()
+    fn()
+    first = time.perf_counter() - t0
+    # Tez funksiyalar uchun birinchi chaqiruv - qizdirish (import, kesh), qayta o'lchaymiz
+    if first < budget / 10:
+        t0 = time.perf_counter()
+        fn()
+        first = time.perf_counter() - t0
+
+    # Sekin funksiyalar (sikl asosidagi backtestlar) byudjetdan oshsa 1 marta o'lchanadi
+    repeats = int(min(max_repeats, max(1, budget / max(first, 1e-9))))
+    latencies = [first]
+    for _ in range(repeats - 1):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+
+    # Xotira alohida o'lchanadi (tracemalloc vaqtni sekinlashtiradi)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    lat = np.array(latencies)
+    p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+    return {
+        "bars": bars,
+        "repeats": len(lat),
+        "p50_ms": p50 * 1000,
+        "p90_ms": p90 * 1000,
+        "p99_ms": p99 * 1000,
+        "mean_ms": float(lat.mean() * 1000),
+        "throughput_bars_per_s": bars / p50 if p50 > 0 else None,
+        "peak_mem_mb": peak / 1024 / 1024,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Baseline bilan solishtiradi. Sekinlashgan holatlar ro'yxatini qaytaradi."""
+    base = {(r["name"], r["bars"]): r for r in baseline.get("results", [])}
+    regressions = []
+    print("\n--- BASELINE BILAN SOLISHTIRISH (p50) ---")
+    for r in results:
+        b = base.get((r["name"], r["bars"]))
+        if not b:
+            continue
+        ratio = r["p50_ms"] / b["p50_ms"] if b["p50_ms"] > 0 else float("inf")
+        flag = "SEKINLASHDI" if ratio > threshold else ""
+        print(f"{r['name']:<28} {r['bars']:>10} | {b['p50_ms']:>10.2f} -> {r['p50_ms']:>10.2f} ms | x{ratio:.2f} {flag}")
+        if ratio > threshold:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strategiya benchmarklari (offline)")
+    parser.add_argument("--sizes", default="1000,10000", help="Shamlar soni, vergul bilan (1000 ... 10000000)")
+    parser.add_argument("--only", default="", help="Faqat shu holatlar (vergul bilan)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--budget", type=float, default=2.0, help="Har bir o'lchov uchun taxminiy vaqt (s)")
+    parser.add_argument("--no-limit", action="store_true", help="Sekin holatlar uchun hajm cheklovini o'chirish")
+    parser.add_argument("--output", default=os.path.join("reports", "benchmark.json"))
+    parser.add_argument("--baseline", default=None, help="Solishtirish uchun oldingi JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Sekinlashish chegarasi (p50 nisbati)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    only = {s for s in args.only.split(",") if s}
+
+    results = []
+    for name, (case, max_bars, sized) in CASES.items():
+        if only and name not in only:
+            continue
+        case_sizes = sizes if sized else sizes[:1]
+        for n in case_sizes:
+            if max_bars and n > max_bars and not args.no_limit:
+                print(f"{name:<28} {n:>10} | o'tkazib yuborildi (> {max_bars}, --no-limit)")
+                continue
+            try:
+                fn, bars = case(n, args.seed)
+                row = measure(fn, bars, budget=args.budget)
+            except ImportError as e:
+                print(f"{name:<28} {n:>10} | o'tkazib yuborildi: {e}")
+                continue
+            row["name"] = name
+            results.append(row)
+            tput = row["throughput_bars_per_s"]
+            print(f"{name:<28} {n:>10} | p50 {row['p50_ms']:>10.2f} ms | p99 {row['p99_ms']:>10.2f} ms | "
+                  f"{tput:>14,.0f} sham/s | {row['peak_mem_mb']:>8.1f} MB")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\nNatijalar saqlandi: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 from datetime import datetime, timedelta
@@ -7,6 +8,9 @@ from db.database import Database
 from strategies.engine import StrategyEngine
 from data.feed import DataHandler
 from bot.languages import TEXTS
+from bot.worker import EvaluationRunner, LoopLagMonitor
+from strategies.alerts import PriceAlertManager, ABOVE, BELOW
+from strategies.signal_tracker import SignalOutcomeTracker
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +18,17 @@ logger = logging.getLogger(__name__)
 db = Database()
 data_handler = DataHandler()
 engine = StrategyEngine(db, data_handler)
+# Strategiya baholash oqimlari (Telegram event loop ni bloklamaslik uchun) va loop kechikishi
+runner = EvaluationRunner(max_workers=2, timeout=60)
+loop_monitor = LoopLagMonitor()
+# Narx ogohlantirishlari: har bir yangi narx (GoldAPI/yfinance) saralangan indeks orqali tekshiriladi
+price_alerts = PriceAlertManager(db)
+price_alerts.load()
+data_handler.add_price_listener(price_alerts.on_price)
+# Chiqarilgan signallarning SL/TP natijalari (har bir yangi narx bo'yicha)
+signal_tracker = SignalOutcomeTracker(db)
+signal_tracker.load()
+data_handler.add_price_listener(signal_tracker.on_price)
 
 # States for manual signal conversation
 SIGNAL_TYPE, SIGNAL_PRICE, SIGNAL_SL, SIGNAL_TP, SIGNAL_REASON = range(5)
@@ -260,6 +275,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             try:
                 await context.bot.send_message(chat_id=CHANNEL_ID, text=channel_msg, parse_mode='HTML')
                 db.update_signal_status(signal_id, "published")
+                signal_tracker.track(db.get_signal_by_id(signal_id))
                 await query.edit_message_text(f"{query.message.text_html}\n\n✅ <b>Kanalga chiqarildi!</b>", parse_mode='HTML')
             except Exception as e:
                 logger.error(f"Error: {e}")
@@ -281,6 +297,204 @@ async def grant_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     end_date = db.grant_subscription(user_id, days)
     await update.message.reply_text(f"✅ User {user_id} ga {days} kunlik obuna berildi.")
 
+async def top_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Optimizatsiya natijalari: /top [metrika] [N] [run_id]
+    Metrikalar: pnl, sharpe, profit_factor, wr, max_dd
+    """
+    if str(update.effective_user.id) != ADMIN_ID: return
+
+    args = context.args
+    metric = args[0].lower() if args else "pnl"
+    try:
+        limit = max(1, min(int(args[1]), 30)) if len(args) > 1 else 10
+    except ValueError:
+        limit = 10
+    run_id = args[2] if len(args) > 2 else None
+
+    try:
+        rows = db.get_top_optimization_results(metric, limit, run_id=run_id, min_trades=5)
+    except ValueError:
+        await update.message.reply_text("⚠️ Format: /top [pnl|sharpe|profit_factor|wr|max_dd] [N] [run_id]")
+        return
+
+    if not rows:
+        runs = db.get_optimization_runs(5)
+        text = "📭 Natijalar yo'q."
+        if runs:
+            text += "\nRunlar: " + ", ".join(f"{r['run_id']} ({r['count']})" for r in runs)
+        await update.message.reply_text(text)
+        return
+
+    lines = [f"🏆 <b>TOP {len(rows)} - {metric}</b> (run: {rows[0]['run_id']})\n"]
+    for i, r in enumerate(rows, 1):
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        lines.append(
+            f"{i}. PnL ${r['pnl']:.2f} | WR {r['wr']:.1f}% | {r['trades']} savdo | "
+            f"PF {r['profit_factor']:.2f} | DD ${r['max_dd']:.2f} | Sharpe {r['sharpe']:.2f}\n"
+            f"<code>{params}</code>"
+        )
+    await update.message.reply_text("\n".join(lines), parse_mode='HTML')
+
+async def health_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Bot holati: event loop kechikishi va strategiya baholash statistikasi."""
+    if str(update.effective_user.id) != ADMIN_ID: return
+
+    lag = loop_monitor.summary()
+    st = runner.stats
+    text = (
+        f"🩺 <b>Bot holati</b>\n\n"
+        f"Loop kechikishi: p50 {lag['p50_ms']:.1f} ms | p99 {lag['p99_ms']:.1f} ms | max {lag['max_ms']:.1f} ms "
+        f"({lag['samples']} o'lchov)\n"
+        f"Baholashlar: {st['runs']} | o'tkazib yuborildi: {st['skipped']} | "
+        f"muddat tugadi: {st['timeouts']} | sham kechikdi: {st['not_ready']} | xato: {st['errors']}\n"
+        f"Oxirgi baholash: {st['last_duration']:.2f} s\n"
+        f"Ochiq signallar: {signal_tracker.open_count()} | Narx ogohlantirishlari: {price_alerts.active_count()}\n"
+    )
+    outcomes = db.get_signal_outcome_stats(days=30)
+    closed = outcomes.get("TP", 0) + outcomes.get("SL", 0)
+    if closed:
+        text += (f"Signallar (30 kun): TP {outcomes.get('TP', 0)} | SL {outcomes.get('SL', 0)} | "
+                 f"win rate {outcomes.get('TP', 0) / closed * 100:.0f}%\n")
+    sessions = engine.sessions
+    if sessions.is_open():
+        at, _ = sessions.next_transition()
+        active = ", ".join(sessions.active_sessions()) or "-"
+        text += f"Bozor: ochiq ({active}) | yopilish: {at:%Y-%m-%d %H:%M} UTC"
+    else:
+        text += f"Bozor: yopiq | ochilishigacha {sessions.seconds_until_open() / 3600:.1f} soat"
+
+    await update.message.reply_text(text, parse_mode='HTML')
+
+async def trace_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Strategiya bosqichlari izi: /trace [N] - bosqichlar statistikasi va oxirgi N baholash,
+    /trace on|off - izlashni yoqish/o'chirish, /trace reset - statistikani tozalash.
+    """
+    if str(update.effective_user.id) != ADMIN_ID: return
+
+    tracer = engine.tracer
+    arg = context.args[0].lower() if context.args else ""
+    if arg in ("on", "off"):
+        tracer.enabled = arg == "on"
+        await update.message.reply_text(f"🔎 Trace: {'yoqildi' if tracer.enabled else 'o‘chirildi'}")
+        return
+    if arg == "reset":
+        tracer.reset()
+        await update.message.reply_text("🔎 Trace statistikasi tozalandi")
+        return
+    limit = max(1, min(int(arg), 20)) if arg.isdigit() else 5
+
+    summary = tracer.summary()
+    res = summary["results"]
+    lines = [
+        f"🔎 <b>Signal trace</b> ({'yoqilgan' if tracer.enabled else 'o‘chirilgan'})\n",
+        f"Signal: {res['signal']} | Signalsiz: {res['none']} | Xato: {res['error']}\n",
+        "<b>Bosqich: ishladi / rad / xato | p50 / p99 / max ms</b>",
+    ]
+    for name in engine.STAGES:
+        st = summary["stages"].get(name)
+        if not st:
+            continue
+        lines.append(
+            f"{name}: {st['runs']} / {st['rejected']} / {st['errors']} | "
+            f"{st['p50_ms']:.0f} / {st['p99_ms']:.0f} / {st['max_ms']:.0f}"
+        )
+
+    recent = tracer.recent(limit)
+    if recent:
+        lines.append("\n<b>Oxirgi baholashlar:</b>")
+    for t in recent:
+        last = t["stages"][-1] if t["stages"] else {"stage": "-", "outcome": "-", "inputs": {}}
+        inputs = ", ".join(f"{k}={v}" for k, v in last["inputs"].items())
+        lines.append(
+            f"{t['time'].strftime('%m-%d %H:%M')} {t['symbol']} → {t['result']} "
+            f"({last['stage']}: {last['outcome']}) {t['total_ms']:.0f} ms"
+            + (f"\n   <code>{inputs}</code>" if inputs else "")
+        )
+    await update.message.reply_text("\n".join(lines), parse_mode='HTML')
+
+def is_premium(user_id):
+    if str(user_id) == ADMIN_ID:
+        return True
+    sub = db.get_subscription(user_id)
+    return bool(sub and sub.is_active)
+
+async def alert_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/alert PRICE | /alert above|below PRICE - narx ogohlantirishi (Premium)."""
+    chat_id = update.effective_chat.id
+    user_id = update.effective_user.id
+    if not is_premium(user_id):
+        await update.message.reply_text(get_text(chat_id, 'alert_premium_only'))
+        return
+
+    args = context.args
+    direction = None
+    if len(args) == 2 and args[0].lower() in ("above", "below"):
+        direction = ABOVE if args[0].lower() == "above" else BELOW
+        args = args[1:]
+    try:
+        threshold = float(args[0].replace(",", "."))
+    except (IndexError, ValueError):
+        await update.message.reply_text(get_text(chat_id, 'alert_usage'), parse_mode='HTML')
+        return
+
+    current_price = None
+    if direction is None:
+        # Tarmoq so'rovi event loop ni to'xtatmasligi uchun oqimda
+        current_price = await asyncio.to_thread(data_handler.get_current_price, "XAU/USD")
+    try:
+        alert = price_alerts.add(user_id, "XAU/USD", threshold, direction=direction, current_price=current_price)
+    except ValueError as e:
+        await update.message.reply_text(f"⚠️ {e}")
+        return
+
+    sign = get_text(chat_id, 'alert_above' if alert['direction'] == ABOVE else 'alert_below')
+    await update.message.reply_text(
+        get_text(chat_id, 'alert_created', id=alert['id'], direction=sign, threshold=alert['threshold']),
+        parse_mode='HTML'
+    )
+
+async def alerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    items = price_alerts.user_alerts(update.effective_user.id)
+    if not items:
+        await update.message.reply_text(get_text(chat_id, 'alert_list_empty'))
+        return
+    msg = get_text(chat_id, 'alert_list_header')
+    for a in items:
+        sign = get_text(chat_id, 'alert_above' if a['direction'] == ABOVE else 'alert_below')
+        msg += f"#{a['id']}: {sign} <b>{a['threshold']:.2f}</b>\n"
+    await update.message.reply_text(msg, parse_mode='HTML')
+
+async def unalert_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    if not context.args or not context.args[0].lstrip("#").isdigit():
+        await update.message.reply_text(get_text(chat_id, 'alert_usage'), parse_mode='HTML')
+        return
+    alert_id = int(context.args[0].lstrip("#"))
+    if price_alerts.cancel(alert_id, user_id=update.effective_user.id):
+        await update.message.reply_text(get_text(chat_id, 'alert_cancelled', id=alert_id))
+    else:
+        await update.message.reply_text(get_text(chat_id, 'alert_not_found'))
+
+async def cot_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/cot - barcha bozorlar bo'yicha COT kayfiyati (keshlangan jadvaldan, tarmoqsiz; Premium)."""
+    chat_id = update.effective_chat.id
+    if not is_premium(update.effective_user.id):
+        await update.message.reply_text(get_text(chat_id, 'cot_premium_only'))
+        return
+    table = engine.cot_analyzer.sentiment_table()
+    if table.empty:
+        await update.message.reply_text(get_text(chat_id, 'cot_empty'))
+        return
+    msg = get_text(chat_id, 'cot_header', date=table["report_date"].max().strftime("%Y-%m-%d"))
+    for market, row in table.iterrows():
+        emoji = "📈" if row["sentiment"] in ("BULLISH", "REVERSAL_BULLISH") else "📉" if row["sentiment"] != "NEUTRAL" else "➖"
+        msg += get_text(chat_id, 'cot_line', emoji=emoji, market=market, sentiment=row["sentiment"],
+                        cot_index=row["cot_index"], net_change=row["net_change"], zscore=row["zscore"])
+    await update.message.reply_text(msg, parse_mode='HTML')
+
 async def signal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if str(update.effective_user.id) != ADMIN_ID: return
 
@@ -36,7 +36,22 @@ TEXTS = {
         'manual_signal_reason': "✅ TP: {tp}\n\nEndi <b>Signal Sababini</b> yozing (masalan: Trendline Support):",
         'manual_signal_preview': "✅ Signal tayyorlandi! Quyida ko'rib chiqing:",
         'error_num': "⚠️ Iltimos, faqat raqam yuboring.",
-        'error_type': "⚠️ Iltimos, BUY yoki SELL ni tanlang."
+        'error_type': "⚠️ Iltimos, BUY yoki SELL ni tanlang.",
+        'alert_premium_only': "💎 Narx ogohlantirishlari faqat Premium obunachilar uchun.",
+        'alert_usage': "🔔 <b>Narx ogohlantirishi</b>\n\n<code>/alert 2450</code> - narx 2450 ga yetganda xabar\n<code>/alert above 2450</code> yoki <code>/alert below 2380</code>\n<code>/alerts</code> - ro'yxat, <code>/unalert ID</code> - bekor qilish",
+        'alert_created': "✅ Ogohlantirish #{id}: GOLD narxi {direction} <b>{threshold:.2f}</b> bo'lganda xabar beraman.",
+        'alert_cancelled': "✅ Ogohlantirish #{id} bekor qilindi.",
+        'alert_not_found': "⚠️ Ogohlantirish topilmadi.",
+        'alert_list_header': "🔔 <b>Faol ogohlantirishlar</b>\n\n",
+        'alert_list_empty': "🔔 Faol ogohlantirishlar yo'q.",
+        'alert_above': "≥",
+        'alert_below': "≤",
+        'alert_triggered': "🔔 <b>Narx ogohlantirishi</b>\n\n",
+        'alert_triggered_line': "#{id}: GOLD {direction} {threshold:.2f} (narx {price:.2f})\n",
+        'cot_premium_only': "💎 COT tahlili faqat Premium obunachilar uchun.",
+        'cot_header': "🏦 <b>Smart Money (COT)</b> - {date}\n<i>Index: 52 haftalik oraliq, Δ: haftalik o'zgarish</i>\n\n",
+        'cot_line': "{emoji} <b>{market}</b>: {sentiment} | Index {cot_index:.0f}% | Δ {net_change:+.1f}% | z {zscore:+.1f}\n",
+        'cot_empty': "🏦 COT ma'lumotlari hali yuklanmagan."
     },
     'ru': {
         'welcome': "👋 Добро пожаловать! Бот торговых сигналов по золоту (XAU/USD).\n\nУправляйте ботом с помощью кнопок ниже:",
@@ -75,6 +90,21 @@ TEXTS = {
         'manual_signal_reason': "✅ TP: {tp}\n\nТеперь напишите <b>Причину</b> (например: Trendline Support):",
         'manual_signal_preview': "✅ Сигнал готов! Проверьте ниже:",
         'error_num': "⚠️ Пожалуйста, отправьте только число.",
-        'error_type': "⚠️ Пожалуйста, выберите BUY или SELL."
+        'error_type': "⚠️ Пожалуйста, выберите BUY или SELL.",
+        'alert_premium_only': "💎 Ценовые уведомления доступны только Премиум подписчикам.",
+        'alert_usage': "🔔 <b>Ценовое уведомление</b>\n\n<code>/alert 2450</code> - уведомить, когда цена достигнет 2450\n<code>/alert above 2450</code> или <code>/alert below 2380</code>\n<code>/alerts</code> - список, <code>/unalert ID</code> - отменить",
+        'alert_created': "✅ Уведомление #{id}: сообщу, когда цена GOLD будет {direction} <b>{threshold:.2f}</b>.",
+        'alert_cancelled': "✅ Уведомление #{id} отменено.",
+        'alert_not_found': "⚠️ Уведомление не найдено.",
+        'alert_list_header': "🔔 <b>Активные уведомления</b>\n\n",
+        'alert_list_empty': "🔔 Активных уведомлений нет.",
+        'alert_above': "≥",
+        'alert_below': "≤",
+        'alert_triggered': "🔔 <b>Ценовое уведомление</b>\n\n",
+        'alert_triggered_line': "#{id}: GOLD {direction} {threshold:.2f} (цена {price:.2f})\n",
+        'cot_premium_only': "💎 Анализ COT доступен только Премиум подписчикам.",
+        'cot_header': "🏦 <b>Smart Money (COT)</b> - {date}\n<i>Index: диапазон 52 недель, Δ: изменение за неделю</i>\n\n",
+        'cot_line': "{emoji} <b>{market}</b>: {sentiment} | Index {cot_index:.0f}% | Δ {net_change:+.1f}% | z {zscore:+.1f}\n",
+        'cot_empty': "🏦 Данные COT ещё не загружены."
     }
 }
@@ -1,17 +1,24 @@
 import os
+import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter
 from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, ChatJoinRequestHandler, MessageHandler, filters, ContextTypes, ConversationHandler
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from dotenv import load_dotenv
 
 from bot.handlers import (
-    start, button_handler, grant_command, signal_command, join_request_handler, main_menu_text_handler, 
+    start, button_handler, grant_command, signal_command, top_command, health_command, trace_command, alert_command, alerts_command, unalert_command, cot_command, join_request_handler, main_menu_text_handler, 
     start_signal_creation, get_signal_type, get_signal_price, get_signal_sl, get_signal_tp, get_signal_reason, cancel_handler,
     SIGNAL_TYPE, SIGNAL_PRICE, SIGNAL_SL, SIGNAL_TP, SIGNAL_REASON,
-    db, engine
+    db, engine, runner, loop_monitor, data_handler, price_alerts, signal_tracker, get_text, ADMIN_ID
 )
+from bot.scheduler import (
+    next_bar_close, last_bar_close, BAR_MINUTES, BAR_CLOSE_DELAY, TICK_INTERVAL, ALERT_INTERVAL, ALERT_BATCH_SIZE, COT_CHECK_INTERVAL
+)
+from strategies.alerts import ABOVE
+from data.feed import closed_bars
 
 # Muhit o'zgaruvchilarini yuklash
 load_dotenv()
@@ -34,17 +41,60 @@ CHANNEL_ID = os.getenv("CHANNEL_ID") # Maxfiy kanal ID si
 last_signal_info = db.get_last_signal_info()
 last_signal_time = last_signal_info['time'] if last_signal_info else None
 last_signal_type = last_signal_info['type'] if last_signal_info else None
+# Oxirgi to'liq baholangan M15 sham (bitta sham ikki marta baholanmasligi uchun)
+last_evaluated_bar = None
+# Bozor holati o'zgarishini bir marta log qilish uchun
+market_was_open = None
+
+def market_closed() -> bool:
+    """
+    Bozor yopiq bo'lsa (dam olish, kunlik tanaffus, bayram) True - ma'lumot olish va baholash to'xtatiladi.
+    Tekshiruv oldindan hisoblangan sessiya jadvalida bisect (tarmoqsiz).
+    """
+    global market_was_open
+    is_open = engine.sessions.is_open()
+    if is_open != market_was_open:
+        market_was_open = is_open
+        if is_open:
+            logger.info("Bozor ochildi: ma'lumot olish va baholash davom etadi")
+        else:
+            wait = engine.sessions.seconds_until_open()
+            logger.info(f"Bozor yopiq: ochilishigacha {wait / 3600:.1f} soat, so'rovlar to'xtatildi")
+    return not is_open
+
+def bar_in_session(bar: datetime) -> bool:
+    """
+    bar (yopilish vaqti) bilan tugagan M15 sham savdo vaqtida ochilganmi. Sessiyaning oxirgi shami
+    (masalan, 16:45-17:00 NY) bozor yopilgandan keyin baholansa ham o'tkazib yuborilmaydi.
+    """
+    return engine.sessions.is_open(bar - timedelta(minutes=BAR_MINUTES))
 
 async def check_market_job(context: ContextTypes.DEFAULT_TYPE):
     """
     Bozorni tekshirish va signallarni yuborish uchun rejalashtirilgan vazifa.
+    M15 sham yopilishida ishga tushadi (strategiya faqat yopilgan shamlarni o'qiydi).
     """
-    global last_signal_time, last_signal_type
+    global last_signal_time, last_signal_type, last_evaluated_bar
     try:
         symbol = "XAU/USD"
+        bar = last_bar_close()
+        if bar == last_evaluated_bar:
+            return
+        # Tekshiruv sham ochilgan vaqt bo'yicha: yopilishdan keyingi 17:00:05 dagi baholash ham o'tadi
+        if not bar_in_session(bar):
+            return
+
+        # Tick tekshiruvi ishlayotgan bo'lsa, u tugashini kutamiz (sham baholashi o'tkazib yuborilmaydi)
+        await runner.wait(f"{symbol}:tick", timeout=20)
         # StrategyEngine endi NewsFilter va COTAnalyzer ni o'z ichiga oladi
-        signal = engine.check_signal(symbol)
-        
+        # Baholash alohida oqimda: sekin yfinance so'rovi Telegram handlerlarini to'xtatmaydi
+        # bar_open: manba hali shu shamni bermagan bo'lsa, natija "not_ready" (eski sham qayta baholanmaydi)
+        signal = await runner.run(symbol, engine.check_signal, symbol, bar_open=bar - timedelta(minutes=BAR_MINUTES))
+        # Sham faqat baholash haqiqatan tugaganda belgilanadi; aks holda (not_ready, timeout, ...) tick_check_job qayta urinadi
+        if runner.last_outcome.get(symbol) != "ok":
+            return
+        last_evaluated_bar = bar
+
         if signal:
             signal_time = signal['time']
             signal_type = signal['type']
@@ -149,7 +199,6 @@ async def check_market_job(context: ContextTypes.DEFAULT_TYPE):
                 ]
             ]
 
-            ADMIN_ID = "1032563269"
             try:
                 await context.bot.send_message(
                     chat_id=ADMIN_ID, 
@@ -164,6 +213,97 @@ async def check_market_job(context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logger.error(f"check_market_job da xatolik: {e}")
 
+async def tick_check_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Shamlar orasidagi arzon tekshiruv: ochiq savdoning SL/TP holati va narxning
+    daraja zonasiga kirishi (to'liq strategiya faqat sham yopilganda ishlaydi).
+    """
+    try:
+        symbol = "XAU/USD"
+        # To'liq baholash ishlayotgan bo'lsa, tick o'tkazib yuboriladi
+        if runner.in_flight(symbol):
+            return
+        # Oxirgi yopilgan sham baholanmay qolgan bo'lsa (o'tkazib yuborildi, muddat tugadi, xato) - qayta urinish
+        # (sessiyaning oxirgi shami bozor yopilgandan keyin ham)
+        bar = last_bar_close()
+        if (bar != last_evaluated_bar and bar_in_session(bar)
+                and (datetime.now(timezone.utc) - bar).total_seconds() >= BAR_CLOSE_DELAY):
+            await check_market_job(context)
+            return
+        if market_closed():
+            return
+        await runner.run(f"{symbol}:tick", engine.tick_check, symbol, timeout=20)
+    except Exception as e:
+        logger.error(f"tick_check_job da xatolik: {e}")
+
+async def price_alert_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Faol narx ogohlantirishlari yoki ochiq signallar bo'lsa narxni yangilaydi (DataHandler kuzatuvchilari
+    indekslarni tekshiradi), ishlagan ogohlantirishlarni paketlab yuboradi va yopilgan signallar haqida
+    adminga xabar beradi.
+    """
+    try:
+        has_watchers = price_alerts.active_count("XAU/USD") or signal_tracker.open_count("XAU/USD")
+        if has_watchers and not market_closed():
+            # Narx keshi 5 soniya: boshqa joyda yaqinda olingan bo'lsa, tarmoqqa chiqilmaydi
+            await asyncio.to_thread(data_handler.get_current_price, "XAU/USD")
+        await deliver_price_alerts(context.bot)
+        await report_signal_outcomes(context.bot)
+    except Exception as e:
+        logger.error(f"price_alert_job da xatolik: {e}")
+
+async def report_signal_outcomes(bot):
+    """SL/TP ga yetgan signallar (natija bazaga allaqachon yozilgan) - adminga bitta xabar."""
+    outcomes = signal_tracker.drain_resolved()
+    if not outcomes:
+        return
+    lines = ["📊 <b>Signal natijalari</b>\n"]
+    for o in outcomes:
+        icon = "🎯" if o['outcome'] == "TP" else "🛑"
+        lines.append(f"{icon} #{o['id']} {o['symbol']} {o['type']}: <b>{o['outcome']}</b> @ <code>{o['exit_price']:.2f}</code>")
+    try:
+        await bot.send_message(chat_id=ADMIN_ID, text="\n".join(lines), parse_mode='HTML')
+    except Exception as e:
+        logger.error(f"Signal natijalarini adminga yuborishda xatolik: {e}")
+
+async def deliver_price_alerts(bot):
+    """
+    Navbatdagi ogohlantirishlarni foydalanuvchi bo'yicha guruhlab (bitta xabar) yuboradi.
+    Har ALERT_BATCH_SIZE xabardan keyin 1 soniya pauza; Telegram RetryAfter qaytarsa qolganlari navbatga qaytadi.
+    """
+    items = price_alerts.drain()
+    if not items:
+        return
+    by_user = {}
+    for item in items:
+        by_user.setdefault(item['user_id'], []).append(item)
+
+    users = list(by_user.items())
+    for n, (user_id, user_items) in enumerate(users):
+        if n and n % ALERT_BATCH_SIZE == 0:
+            await asyncio.sleep(1)
+        msg = get_text(user_id, 'alert_triggered')
+        for a in user_items:
+            sign = get_text(user_id, 'alert_above' if a['direction'] == ABOVE else 'alert_below')
+            msg += get_text(user_id, 'alert_triggered_line', id=a['id'], direction=sign,
+                            threshold=a['threshold'], price=a['price'])
+        try:
+            await bot.send_message(chat_id=user_id, text=msg, parse_mode='HTML')
+        except RetryAfter as e:
+            logger.warning(f"Telegram cheklovi: {e.retry_after} s, {len(users) - n} ta foydalanuvchi keyingi siklda")
+            price_alerts.requeue(item for _, rest in users[n:] for item in rest)
+            return
+        except Exception as e:
+            logger.error(f"Narx ogohlantirishini {user_id} ga yuborishda xatolik: {e}")
+
+async def cot_refresh_job(context: ContextTypes.DEFAULT_TYPE):
+    """Yangi haftalik COT hisoboti bo'lsa bazaga yuklaydi (odatda haftasiga bitta kichik so'rov)."""
+    try:
+        if engine.cot_analyzer.refresh_due():
+            await asyncio.to_thread(engine.cot_analyzer.refresh)
+    except Exception as e:
+        logger.error(f"cot_refresh_job da xatolik: {e}")
+
 async def check_subscription_job(context: ContextTypes.DEFAULT_TYPE):
     expired_subs = db.get_expired_subscriptions()
     for sub in expired_subs:
@@ -190,11 +330,28 @@ async def check_subscription_job(context: ContextTypes.DEFAULT_TYPE):
             )
         except: pass
 
+def replay_open_signals(symbol="XAU/USD"):
+    """Bot o'chiq turgan paytda SL/TP ga yetgan ochiq signallarni yopilgan M15 shamlar bo'yicha yopish."""
+    if not signal_tracker.open_count(symbol):
+        return []
+    df = closed_bars(data_handler.fetch_data(symbol, timeframe="M15", limit=500), "M15")
+    return signal_tracker.replay_bars(symbol, df)
+
+async def post_init(app):
+    loop_monitor.start()
+    try:
+        await asyncio.to_thread(replay_open_signals)
+    except Exception as e:
+        logger.error(f"Ochiq signallarni tiklashda xatolik: {e}")
+
+async def post_shutdown(app):
+    runner.shutdown()
+
 def run_bot():
     if not TOKEN:
         print("Xatolik: .env faylida BOT_TOKEN topilmadi")
         return
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = ApplicationBuilder().token(TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
     
     # Conversation Handler yaratish (RegEx updated for multi-language)
     signal_conv_handler = ConversationHandler(
@@ -214,6 +371,13 @@ def run_bot():
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("grant", grant_command))
     app.add_handler(CommandHandler("signal", signal_command))
+    app.add_handler(CommandHandler("top", top_command))
+    app.add_handler(CommandHandler("health", health_command))
+    app.add_handler(CommandHandler("trace", trace_command))
+    app.add_handler(CommandHandler("alert", alert_command))
+    app.add_handler(CommandHandler("alerts", alerts_command))
+    app.add_handler(CommandHandler("unalert", unalert_command))
+    app.add_handler(CommandHandler("cot", cot_command))
     app.add_handler(CallbackQueryHandler(button_handler))
     app.add_handler(ChatJoinRequestHandler(join_request_handler))
     
@@ -221,7 +385,12 @@ def run_bot():
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, main_menu_text_handler))
     
     scheduler = app.job_queue
-    scheduler.run_repeating(check_market_job, interval=20, first=10)
+    # To'liq baholash: ishga tushganda bir marta, so'ng har bir M15 sham yopilishida (soat chegarasiga tekislangan)
+    scheduler.run_once(check_market_job, when=10)
+    scheduler.run_repeating(check_market_job, interval=BAR_MINUTES * 60, first=next_bar_close())
+    scheduler.run_repeating(tick_check_job, interval=TICK_INTERVAL, first=TICK_INTERVAL)
+    scheduler.run_repeating(price_alert_job, interval=ALERT_INTERVAL, first=ALERT_INTERVAL)
+    scheduler.run_repeating(cot_refresh_job, interval=COT_CHECK_INTERVAL, first=30)
     scheduler.run_daily(check_subscription_job, time=datetime.now().time())
     print("Bot ishga tushdi...")
     app.run_polling()
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+# Strategiya M15 shamlarda ishlaydi
+BAR_MINUTES = 15
+# Sham yopilgandan keyin ma'lumot manbai yangi shamni berishi uchun kutish (soniya)
+BAR_CLOSE_DELAY = 5
+# Shamlar orasidagi arzon tekshiruv oralig'i (soniya)
+TICK_INTERVAL = 60
+# Narx ogohlantirishlari uchun narx tekshiruvi oralig'i (soniya); faol ogohlantirish bo'lmasa so'rov yo'q
+ALERT_INTERVAL = 15
+# Telegram cheklovi (~30 xabar/soniya) ostida qolish uchun bir paketdagi xabarlar soni
+ALERT_BATCH_SIZE = 25
+# COT hisobotini tekshirish oralig'i (soniya); so'rov faqat yangi hisobot e'lon qilinishi kerak bo'lganda yuboriladi
+COT_CHECK_INTERVAL = 3600
+
+
+def next_bar_close(now: datetime = None, minutes: int = BAR_MINUTES, delay: float = BAR_CLOSE_DELAY) -> datetime:
+    """
+    Keyingi sham yopilish vaqti (UTC, soat chegarasiga tekislangan) + delay.
+    Masalan, 10:07:30 -> 10:15:05.
+    """
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    period = minutes * 60
+    elapsed = (now.timestamp() - delay) % period
+    return now + timedelta(seconds=period - elapsed)
+
+
+def last_bar_close(now: datetime = None, minutes: int = BAR_MINUTES) -> datetime:
+    """Oxirgi yopilgan shamning yopilish vaqti (UTC)."""
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    period = minutes * 60
+    ts = now.timestamp() - now.timestamp() % period
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
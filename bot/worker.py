@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from data.feed import BarNotReady
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationTimeout(Exception):
+    """Baholash muddati tugadi (Deadline.check() tomonidan ko'tariladi)."""
+
+
+class Deadline:
+    """
+    Ishchi oqimdagi baholash uchun muddat va bekor qilish belgisi.
+    Oqimni majburan to'xtatib bo'lmaydi, shuning uchun engine bosqichlar orasida check() ni chaqiradi.
+    """
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self._cancelled.is_set() or self.remaining() <= 0
+
+    def check(self):
+        if self.expired():
+            raise EvaluationTimeout("baholash muddati tugadi")
+
+
+class EvaluationRunner:
+    """
+    Strategiya baholashini asyncio loop dan tashqarida (alohida oqimlar pulida) bajaradi.
+
+    - har bir kalit (simvol) uchun bir vaqtda bittadan ko'p baholash bo'lmaydi:
+      oldingisi tugamagan bo'lsa, yangi chaqiruv o'tkazib yuboriladi;
+    - har bir baholashning qat'iy muddati bor: muddat o'tsa, kutish to'xtatiladi va
+      Deadline bekor qilinadi (engine keyingi bosqichda to'xtaydi);
+    - last_outcome[key]: oxirgi chaqiruv natijasi ("ok", "skipped", "timeout", "not_ready", "error") -
+      None natija "signal yo'q" mi yoki baholash bajarilmadimi, shundan ajratiladi;
+      "not_ready" - manba kutilgan shamni hali bermagan (BarNotReady), keyinroq qayta urinish kerak.
+    """
+    def __init__(self, max_workers: int = 2, timeout: float = 60.0):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="strategy")
+        self.timeout = timeout
+        self._in_flight = {}
+        self.last_outcome = {}
+        self.stats = {"runs": 0, "skipped": 0, "timeouts": 0, "not_ready": 0, "errors": 0, "last_duration": 0.0}
+
+    def in_flight(self, key) -> bool:
+        return key in self._in_flight
+
+    async def wait(self, key, timeout: float = None):
+        """Shu kalitdagi baholash tugashini kutadi (natija va xatolar e'tiborsiz)."""
+        future = self._in_flight.get(key)
+        if future is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+        except Exception:
+            pass
+
+    async def run(self, key, fn, *args, timeout: float = None, **kwargs):
+        """
+        fn(*args, deadline=Deadline, **kwargs) ni oqimda bajaradi.
+        Returns: natija; o'tkazib yuborilsa yoki muddat tugasa - None.
+        """
+        if key in self._in_flight:
+            self.last_outcome[key] = "skipped"
+            self.stats["skipped"] += 1
+            logger.info(f"{key}: oldingi baholash hali tugamagan, o'tkazib yuborildi")
+            return None
+
+        timeout = timeout or self.timeout
+        deadline = Deadline(timeout)
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        future = loop.run_in_executor(self.executor, lambda: fn(*args, deadline=deadline, **kwargs))
+        self._in_flight[key] = future
+
+        def _done(f):
+            # Muddat o'tgandan keyin tugagan bo'lsa ham kalit shu yerda bo'shatiladi
+            self._in_flight.pop(key, None)
+            self.stats["last_duration"] = time.monotonic() - started
+            if not f.cancelled() and f.exception() is not None \
+                    and not isinstance(f.exception(), (EvaluationTimeout, BarNotReady)):
+                self.stats["errors"] += 1
+        future.add_done_callback(_done)
+
+        self.stats["runs"] += 1
+        self.last_outcome[key] = "error"
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+            self.last_outcome[key] = "ok"
+            return result
+        except asyncio.TimeoutError:
+            self.last_outcome[key] = "timeout"
+            deadline.cancel()
+            self.stats["timeouts"] += 1
+            logger.warning(f"{key}: baholash {timeout:.0f} soniyada tugamadi, bekor qilindi")
+            return None
+        except EvaluationTimeout:
+            self.last_outcome[key] = "timeout"
+            self.stats["timeouts"] += 1
+            logger.warning(f"{key}: baholash muddati tugadi")
+            return None
+        except BarNotReady as e:
+            self.last_outcome[key] = "not_ready"
+            self.stats["not_ready"] += 1
+            logger.info(f"{key}: {e}")
+            return None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LoopLagMonitor:
+    """
+    Event loop kechikishini o'lchaydi: har `interval` soniyada uxlab, haqiqiy uyg'onish
+    vaqtidan kutilganini ayiradi. Loop bloklansa (masalan, sinxron tarmoq so'rovi), kechikish o'sadi.
+    """
+    def __init__(self, interval: float = 0.5, window: int = 1200):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.monotonic() - started - self.interval))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def summary(self) -> dict:
+        """Kechikish (ms): p50, p99, max - oxirgi `window` o'lchov bo'yicha."""
+        if not self.samples:
+            return {"samples": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        lag = np.fromiter(self.samples, dtype=np.float64) * 1000
+        p50, p99 = np.percentile(lag, [50, 99])
+        return {"samples": len(lag), "p50_ms": float(p50), "p99_ms": float(p99), "max_ms": float(lag.max())}
@@ -0,0 +1,310 @@
+"""
+Iqtisodiy kalendar importi: katta ICS yoki CSV eksportlarini oqim (stream) tarzida o'qiydi,
+vaqtlarni UTC ga keltiradi, takrorlarni olib tashlaydi va `news_events` jadvaliga
+(NewsFilter o'qiydigan indekslangan ombor) paketlab yozadi. Qayta importda faqat
+o'zgargan yozuvlar yangilanadi.
+
+    python -m data.calendar_import calendar.ics
+    python -m data.calendar_import calendar.csv --tz America/New_York --impact High,Medium
+"""
+import argparse
+import csv
+import hashlib
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+# Bir paketda bazaga yoziladigan yangiliklar soni
+BATCH_SIZE = 5000
+
+IMPACT_ALIASES = {
+    "high": "High", "red": "High",
+    "medium": "Medium", "orange": "Medium", "moderate": "Medium",
+    "low": "Low", "yellow": "Low",
+    "holiday": "Holiday", "non-economic": "Holiday", "gray": "Holiday",
+}
+# CSV "impact/importance" ustunidagi yulduzchalar soni (3 - eng muhim)
+CSV_STAR_ALIASES = {"3": "High", "2": "Medium", "1": "Low"}
+
+# CSV sarlavhalari (kichik harfda) -> maydon
+CSV_COLUMNS = {
+    "uid": ("uid", "id", "event_id"),
+    "datetime": ("datetime", "timestamp", "date_time", "start"),
+    "date": ("date", "day"),
+    "time": ("time",),
+    "currency": ("currency", "country", "ccy"),
+    "title": ("title", "event", "name", "summary"),
+    "impact": ("impact", "importance", "volatility", "priority"),
+}
+
+_CURRENCY_PREFIX = re.compile(r"^([A-Z]{3})\s*[-:]?\s+(.+)$")
+_IMPACT_IN_TEXT = re.compile(r"impact\s*[:=]\s*(\w+)", re.IGNORECASE)
+
+
+def normalize_impact(value, aliases=None) -> str:
+    if value is None:
+        return "Low"
+    value = str(value).strip()
+    if aliases and value in aliases:
+        return aliases[value]
+    return IMPACT_ALIASES.get(value.lower(), value.capitalize() or "Low")
+
+
+def priority_to_impact(value) -> str:
+    """ICS PRIORITY (RFC 5545): 1-4 yuqori, 5 o'rta, 6-9 past; 0 yoki noma'lum - Low."""
+    try:
+        priority = int(str(value).strip())
+    except (TypeError, ValueError):
+        return "Low"
+    if 1 <= priority <= 4:
+        return "High"
+    if priority == 5:
+        return "Medium"
+    return "Low"
+
+
+def to_utc(dt: datetime, tz) -> datetime:
+    """Naive vaqtni tz bo'yicha talqin qilib, naive UTC ga o'tkazadi (bazadagi boshqa vaqtlar kabi)."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz)
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def make_event(event_time: datetime, currency, title, impact, uid=None, source=None) -> dict:
+    """
+    Normallashtirilgan yozuv. uid berilmasa (CSV), u (valyuta, nom, UTC sana) dan olinadi:
+    shu kun ichida vaqti o'zgargan yangilik yangi yozuv emas, mavjudining yangilanishi bo'ladi.
+    """
+    currency = (currency or "").strip().upper()[:8]
+    title = (title or "").strip()
+    impact = normalize_impact(impact)
+    if not uid:
+        key = f"{currency}|{title.lower()}|{event_time.date().isoformat()}"
+        uid = "csv-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:32]
+    content = f"{event_time.isoformat()}|{currency}|{title}|{impact}"
+    return {
+        "uid": str(uid)[:255],
+        "event_time": event_time,
+        "currency": currency,
+        "title": title,
+        "impact": impact,
+        "content_hash": hashlib.sha1(content.encode("utf-8")).hexdigest(),
+        "source": source,
+    }
+
+
+# --- ICS ---
+
+def _unfold(lines):
+    """RFC 5545: bo'shliq/tab bilan boshlangan qator oldingisining davomi."""
+    current = None
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _ics_value(text: str) -> str:
+    return text.replace("\\n", "\n").replace("\\N", "\n").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def _parse_ics_time(params: dict, value: str, default_tz) -> datetime:
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return to_utc(datetime.strptime(value[:8], "%Y%m%d"), default_tz)
+    if value.endswith("Z"):
+        return datetime.strptime(value[:-1], "%Y%m%dT%H%M%S")
+    tz = ZoneInfo(params["TZID"]) if "TZID" in params else default_tz
+    fmt = "%Y%m%dT%H%M%S" if len(value) >= 15 else "%Y%m%dT%H%M"
+    return to_utc(datetime.strptime(value, fmt), tz)
+
+
+def iter_ics(path: str, default_tz=timezone.utc, source=None):
+    """ICS faylidagi VEVENT larni birma-bir (butun faylni xotiraga yuklamasdan) qaytaradi."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        event = None
+        for line in _unfold(f):
+            if line == "BEGIN:VEVENT":
+                event = {}
+                continue
+            if line == "END:VEVENT":
+                if event is not None:
+                    item = _ics_event(event, default_tz, source)
+                    if item is not None:
+                        yield item
+                event = None
+                continue
+            if event is None or ":" not in line:
+                continue
+            head, value = line.split(":", 1)
+            name, *param_parts = head.split(";")
+            params = dict(p.split("=", 1) for p in param_parts if "=" in p)
+            event[name.upper()] = (params, value)
+
+
+def _ics_event(event: dict, default_tz, source):
+    if "DTSTART" not in event:
+        return None
+    try:
+        params, value = event["DTSTART"]
+        event_time = _parse_ics_time(params, value, default_tz)
+    except Exception as e:
+        logger.debug(f"ICS vaqti o'qilmadi: {event.get('DTSTART')}: {e}")
+        return None
+
+    summary = _ics_value(event.get("SUMMARY", ({}, ""))[1])
+    description = _ics_value(event.get("DESCRIPTION", ({}, ""))[1])
+    currency = event.get("X-CURRENCY", ({}, None))[1] or _ics_value(event.get("CATEGORIES", ({}, ""))[1]).split(",")[0]
+    # Ko'p eksportlarda valyuta nomning boshida: "USD Non-Farm Employment Change"
+    match = _CURRENCY_PREFIX.match(summary)
+    if match and (not currency or len(currency) != 3):
+        currency, summary = match.group(1), match.group(2)
+    elif match and currency and match.group(1) == currency.upper():
+        summary = match.group(2)
+
+    impact = event.get("X-IMPACT", ({}, None))[1]
+    if not impact:
+        found = _IMPACT_IN_TEXT.search(description)
+        if found:
+            impact = found.group(1)
+        elif "PRIORITY" in event:
+            impact = priority_to_impact(event["PRIORITY"][1])
+    uid = event.get("UID", ({}, None))[1]
+    return make_event(event_time, currency, summary, impact, uid=uid, source=source)
+
+
+# --- CSV ---
+
+def _csv_fields(header):
+    lookup = {h.strip().lower(): h for h in header if h}
+    fields = {}
+    for field, names in CSV_COLUMNS.items():
+        for name in names:
+            if name in lookup:
+                fields[field] = lookup[name]
+                break
+    return fields
+
+
+def _parse_csv_time(row, fields, tz):
+    if "datetime" in fields:
+        value = row[fields["datetime"]].strip()
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return to_utc(dt, tz)
+    date_value = row[fields["date"]].strip()
+    time_value = row[fields["time"]].strip() if "time" in fields else ""
+    # "All Day", "Tentative" va h.k. - kun boshi
+    if not re.match(r"^\d{1,2}:\d{2}", time_value):
+        time_value = "00:00"
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%m/%d/%Y %H:%M", "%d.%m.%Y %H:%M"):
+        try:
+            return to_utc(datetime.strptime(f"{date_value} {time_value}", fmt), tz)
+        except ValueError:
+            continue
+    # 12 soatlik format: "8:30am"
+    return to_utc(datetime.strptime(f"{date_value} {time_value.upper()}", "%Y-%m-%d %I:%M%p"), tz)
+
+
+def iter_csv(path: str, default_tz=timezone.utc, source=None):
+    """CSV eksportini qatorma-qator o'qiydi (sarlavhalar CSV_COLUMNS bo'yicha aniqlanadi)."""
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+        reader = csv.DictReader(f)
+        fields = _csv_fields(reader.fieldnames or [])
+        if "datetime" not in fields and "date" not in fields:
+            raise ValueError(f"CSV da sana ustuni topilmadi: {reader.fieldnames}")
+        for row in reader:
+            try:
+                event_time = _parse_csv_time(row, fields, default_tz)
+            except Exception:
+                continue
+            yield make_event(
+                event_time,
+                row.get(fields.get("currency", ""), ""),
+                row.get(fields.get("title", ""), ""),
+                normalize_impact(row.get(fields.get("impact", ""), None), CSV_STAR_ALIASES),
+                uid=row.get(fields["uid"]) if "uid" in fields else None,
+                source=source,
+            )
+
+
+def iter_calendar(path: str, fmt: str = None, default_tz=timezone.utc):
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    source = os.path.basename(path)
+    if fmt == "ics":
+        return iter_ics(path, default_tz, source)
+    if fmt == "csv":
+        return iter_csv(path, default_tz, source)
+    raise ValueError(f"Noma'lum format: {fmt} (ics yoki csv)")
+
+
+def import_calendar(path: str, db, fmt: str = None, tz: str = "UTC", impacts=None,
+                    currencies=None, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Faylni paketlab bazaga yozadi. impacts/currencies - filtr (masalan, {"High", "Medium"}, {"USD"}).
+    Bir fayldagi takrorlar (bir xil uid) paket ichida birlashtiriladi - oxirgisi qoladi.
+    Returns: {"read", "skipped", "inserted", "updated", "unchanged", "seconds"}
+    """
+    started = time.perf_counter()
+    default_tz = ZoneInfo(tz) if tz and tz.upper() != "UTC" else timezone.utc
+    stats = {"read": 0, "skipped": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+
+    batch = {}
+
+    def flush():
+        result = db.upsert_news_events(list(batch.values()))
+        for key in ("inserted", "updated", "unchanged"):
+            stats[key] += result[key]
+        batch.clear()
+
+    for event in iter_calendar(path, fmt, default_tz):
+        stats["read"] += 1
+        if impacts and event["impact"] not in impacts:
+            stats["skipped"] += 1
+            continue
+        if currencies and event["currency"] not in currencies:
+            stats["skipped"] += 1
+            continue
+        # Oldingi paketdagi takror bazada hash bo'yicha yangilanadi
+        batch[event["uid"]] = event
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Kalendar importi ({path}): {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ICS/CSV iqtisodiy kalendarni bazaga import qilish")
+    parser.add_argument("path", help="calendar.ics yoki calendar.csv")
+    parser.add_argument("--format", choices=["ics", "csv"], default=None, help="Fayl kengaytmasidan aniqlanadi")
+    parser.add_argument("--tz", default="UTC", help="Zona ko'rsatilmagan vaqtlar uchun (masalan, America/New_York)")
+    parser.add_argument("--impact", default=None, help="Faqat shu ta'sirlar, masalan: High,Medium")
+    parser.add_argument("--currency", default=None, help="Faqat shu valyutalar, masalan: USD,EUR")
+    parser.add_argument("--db", default="sqlite:///bot_data.db")
+    args = parser.parse_args()
+
+    from db.database import Database
+    impacts = {normalize_impact(i) for i in args.impact.split(",")} if args.impact else None
+    currencies = {c.strip().upper() for c in args.currency.split(",")} if args.currency else None
+    stats = import_calendar(args.path, Database(args.db), fmt=args.format, tz=args.tz,
+                            impacts=impacts, currencies=currencies)
+    print(f"O'qildi: {stats['read']} | o'tkazib yuborildi: {stats['skipped']} | yangi: {stats['inserted']} | "
+          f"yangilandi: {stats['updated']} | o'zgarmagan: {stats['unchanged']} | {stats['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,13 +9,55 @@ import time
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Taymfreym -> yfinance interval (H4 uchun 1h shamlar olinadi)
+TIMEFRAME_INTERVALS = {"M1": "1m", "M5": "5m", "M15": "15m", "M30": "30m", "H1": "1h", "H4": "1h", "D1": "1d"}
+# yfinance interval -> sham uzunligi (daqiqa)
+INTERVAL_MINUTES = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60, "1d": 1440}
+
+class BarNotReady(Exception):
+    """Kutilgan yopilgan sham ma'lumot manbaida hali yo'q (manba kechikmoqda) - baholash keyinroq qayta uriniladi."""
+
+
+def closed_bars(df: pd.DataFrame, timeframe: str, now: pd.Timestamp = None) -> pd.DataFrame:
+    """
+    Faqat yopilgan shamlarni qaytaradi: yfinance oxirgi qatorda hali shakllanayotgan
+    shamni ham beradi, uni olib tashlaymiz (ochilish vaqti + uzunlik > hozir).
+    """
+    if df.empty:
+        return df
+    minutes = INTERVAL_MINUTES.get(TIMEFRAME_INTERVALS.get(timeframe, "1d"), 1440)
+    now = now if now is not None else pd.Timestamp.now(tz="UTC")
+    last_open = pd.Timestamp(df.index[-1])
+    if last_open.tzinfo is None:
+        last_open = last_open.tz_localize("UTC")
+    if last_open + pd.Timedelta(minutes=minutes) > now:
+        return df.iloc[:-1]
+    return df
+
 class DataHandler:
     def __init__(self, source="yfinance"):
         self.source = source
         self._price_cache = {} # {simbol: (narx, vaqt)}
+        # Yangi narx kuzatuvchilari: listener(simbol, narx, source=manba) - masalan, narx ogohlantirishlari
+        self._price_listeners = []
         # API kalitini muhit o'zgaruvchilaridan yuklash
         self.goldapi_key = os.getenv("GOLDAPI_KEY")
 
+    def add_price_listener(self, listener):
+        """
+        listener(symbol, price, source=...) - manbadan yangi narx olinganda chaqiriladi (keshdan o'qishda emas).
+        source: "goldapi" (spot bid) yoki "yfinance" (GC=F fyuchers) - ular orasida doimiy farq bor.
+        """
+        self._price_listeners.append(listener)
+
+    def _set_price(self, symbol: str, price: float, source: str):
+        self._price_cache[symbol] = (price, time.time())
+        for listener in self._price_listeners:
+            try:
+                listener(symbol, price, source=source)
+            except Exception as e:
+                logger.error(f"Narx kuzatuvchisida xatolik: {e}")
+
     def fetch_data(self, symbol: str, timeframe: str, limit: int = 100) -> pd.DataFrame:
         if self.source == "yfinance":
             return self._fetch_yfinance(symbol, timeframe, limit)
@@ -29,11 +71,7 @@ class DataHandler:
         }
         yf_symbol = yf_symbol_map.get(symbol, symbol)
 
-        yf_tf_map = {
-            "M1": "1m", "M5": "5m", "M15": "15m", "M30": "30m",
-            "H1": "1h", "H4": "1h", "D1": "1d"
-        }
-        interval = yf_tf_map.get(timeframe, "1d")
+        interval = TIMEFRAME_INTERVALS.get(timeframe, "1d")
         
         period = "5d" 
         if timeframe in ["D1", "H4"]:
@@ -56,7 +94,7 @@ class DataHandler:
             if timeframe == "M1" and not df.empty:
                 curr_price, ts = self._price_cache.get(symbol, (None, 0))
                 if time.time() - ts > 15:
-                    self._price_cache[symbol] = (float(df["close"].iloc[-1]), time.time())
+                    self._set_price(symbol, float(df["close"].iloc[-1]), "yfinance")
 
             return df.tail(limit)
 
@@ -81,7 +119,7 @@ class DataHandler:
                     # Ustuvorlik: bid > price (bid - foydalanuvchilar bozor narxi sifatida ko'radigan narx)
                     price = float(data.get('price'))
                     bid = float(data.get('bid', price))
-                    self._price_cache[symbol] = (bid, time.time())
+                    self._set_price(symbol, bid, "goldapi")
                     return bid
             except Exception as e:
                 logger.error(f"GoldAPI dan yuklashda xatolik: {e}")
@@ -104,6 +142,6 @@ class DataHandler:
         df = self.fetch_data(symbol, "M1", limit=1)
         if not df.empty:
             price = float(df["close"].iloc[-1])
-            self._price_cache[symbol] = (price, time.time())
+            self._set_price(symbol, price, "yfinance")
             return price
         return 0.0
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+# Taymfreym -> daqiqa
+TF_MINUTES = {"M1": 1, "M5": 5, "M15": 15, "M30": 30, "H1": 60, "H4": 240, "D1": 1440}
+
+# Savdo soatlari (UTC, oltin fyuchersi kabi):
+# Yakshanba 22:00 - Juma 21:00, har kuni 21:00-22:00 tanaffus
+DAILY_BREAK = (21 * 60, 22 * 60)
+WEEK_OPEN = 22 * 60  # Yakshanba
+WEEK_CLOSE = 21 * 60  # Juma
+
+MINUTES_PER_YEAR = 252 * 23 * 60
+
+
+def _market_open_mask(minutes: np.ndarray) -> np.ndarray:
+    """Unix-daqiqalar massivi uchun bozor ochiqligi (dam olish va tanaffuslarsiz)."""
+    days = minutes // 1440
+    mod = minutes % 1440
+    weekday = (days + 3) % 7  # 1970-01-01 - payshanba; Dushanba = 0
+
+    in_break = (mod >= DAILY_BREAK[0]) & (mod < DAILY_BREAK[1])
+    closed = (
+        (weekday == 5) |
+        ((weekday == 4) & (mod >= WEEK_CLOSE)) |
+        ((weekday == 6) & (mod < WEEK_OPEN)) |
+        ((weekday <= 3) & in_break)
+    )
+    return ~closed
+
+
+def _session_grid(n_bars: int, tf_minutes: int, start: str) -> tuple:
+    """
+    Faqat bozor ochiq bo'lgan vaqtlarni qaytaradi.
+    Returns: (unix-daqiqalar, gap_mask) - gap_mask: oldida yopiq davr bo'lgan shamlar
+    """
+    start_min = int(pd.Timestamp(start, tz="UTC").value // 60_000_000_000)
+    start_min -= start_min % tf_minutes
+
+    picked = []
+    count = 0
+    cursor = start_min
+    # Haftaning ~70% qismi ochiq, shuning uchun bo'laklab generatsiya qilamiz
+    chunk = max(int(n_bars * 1.5), 1024)
+    while count < n_bars:
+        grid = cursor + np.arange(chunk, dtype=np.int64) * tf_minutes
+        open_grid = grid[_market_open_mask(grid)]
+        picked.append(open_grid)
+        count += len(open_grid)
+        cursor = grid[-1] + tf_minutes
+    minutes = np.concatenate(picked)[:n_bars]
+
+    gaps = np.zeros(n_bars, dtype=bool)
+    gaps[1:] = np.diff(minutes) > tf_minutes
+    return minutes, gaps
+
+
+def generate_ohlcv(n_bars: int, timeframe: str = "M15", seed: int = 42, start: str = "2024-01-07 22:00",
+                   s0: float = 2000.0, mu: float = 0.05, vol_regimes=(0.12, 0.30),
+                   regime_switch_prob: float = 0.002, gap_vol: float = 0.004) -> pd.DataFrame:
+    """
+    Deterministik sintetik OHLCV generatori (offline benchmark va testlar uchun).
+
+    - Narx: Geometrik Broun harakati (GBM).
+    - Volatillik rejimlari: past/yuqori volatillik o'rtasida Markov almashinuvi.
+    - Sessiya bo'shliqlari va dam olish kunlari: yopiq vaqtlarda sham yo'q,
+      qayta ochilishda narx sakrashi (gap) bo'ladi.
+
+    1k dan 10M gacha sham uchun ishlaydi (sikllarsiz, to'liq vektorlashtirilgan).
+    Index - UTC DatetimeIndex (yfinance kabi).
+    """
+    tf_minutes = TF_MINUTES[timeframe]
+    rng = np.random.default_rng(seed)
+
+    minutes, gaps = _session_grid(n_bars, tf_minutes, start)
+
+    # Rejimlar: har shamda `regime_switch_prob` ehtimol bilan almashadi
+    switches = rng.random(n_bars) < regime_switch_prob
+    regime = np.cumsum(switches) % len(vol_regimes)
+    sigma = np.asarray(vol_regimes, dtype=np.float64)[regime]
+
+    dt = tf_minutes / MINUTES_PER_YEAR
+    diffusion = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * rng.standard_normal(n_bars)
+    jumps = np.where(gaps, gap_vol * rng.standard_normal(n_bars), 0.0)
+
+    log_close = np.log(s0) + np.cumsum(jumps + diffusion)
+    log_open = log_close - diffusion
+    close = np.exp(log_close)
+    open_ = np.exp(log_open)
+
+    bar_sigma = sigma * np.sqrt(dt)
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.standard_normal(n_bars)) * bar_sigma * 0.5)
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.standard_normal(n_bars)) * bar_sigma * 0.5)
+    volume = rng.lognormal(mean=6.0, sigma=0.5, size=n_bars) * (1 + regime)
+
+    index = pd.DatetimeIndex(minutes.astype("datetime64[m]").astype("datetime64[ns]"), tz="UTC")
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=index
+    )
+
+
+def resample_ohlcv(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """Kichik taymfreymdan kattasiga o'tkazish (sham ochilish vaqti bo'yicha)."""
+    rule = f"{TF_MINUTES[timeframe]}min"
+    out = df.resample(rule, label="left", closed="left").agg({
+        "open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"
+    })
+    return out.dropna(subset=["close"])
+
+
+class SyntheticDataHandler:
+    """
+    DataHandler o'rnini bosuvchi offline manba: bitta M1 qatoridan barcha
+    taymfreymlarni (M15/H1/H4...) resample qiladi, shuning uchun ular o'zaro mos.
+    """
+    def __init__(self, base_bars: int = 120_000, seed: int = 42, start: str = "2024-01-07 22:00"):
+        self.source = "synthetic"
+        self._base = generate_ohlcv(base_bars, "M1", seed=seed, start=start)
+        self._frames = {"M1": self._base}
+
+    def fetch_data(self, symbol: str, timeframe: str, limit: int = 100) -> pd.DataFrame:
+        if timeframe not in self._frames:
+            self._frames[timeframe] = resample_ohlcv(self._base, timeframe)
+        # Strategiya DataFrame ga ustun qo'shadi, shuning uchun nusxa qaytaramiz
+        return self._frames[timeframe].tail(limit).copy()
+
+    def get_current_price(self, symbol: str, force_fetch: bool = False) -> float:
+        return float(self._base["close"].iloc[-1])
@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, text
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, Index, UniqueConstraint, func, text, insert, update
 from sqlalchemy.orm import declarative_base, sessionmaker
 from datetime import datetime, timedelta
+import json
+import logging
+import math
 import os
+import threading
+
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
@@ -28,6 +34,15 @@ class SignalLog(Base):
     reason = Column(String)
     status = Column(String, default="pending")  # pending (kutilmoqda), published (chiqarildi), rejected (rad etildi)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    published_at = Column(DateTime)
+    # Chiqarilgan signal natijasi: TP / SL (ochiq bo'lsa - NULL)
+    outcome = Column(String)
+    exit_price = Column(Float)
+    exit_time = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_signals_open', 'status', 'outcome'),
+    )
 
 class Subscriber(Base):
     """
@@ -49,6 +64,131 @@ class Subscription(Base):
     plan_type = Column(String)  # 'weekly', 'monthly' va h.k.
     is_active = Column(Boolean, default=True)
 
+class OptimizationResult(Base):
+    """
+    Optimizatsiya qidiruvida baholangan har bir konfiguratsiya va uning metrikalari.
+    (run_id, config_hash) bo'yicha takrorlanmaydi - qayta ishga tushganda tugaganlar o'tkazib yuboriladi.
+    """
+    __tablename__ = 'optimization_results'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, nullable=False)
+    config_hash = Column(String, nullable=False)
+    params = Column(Text)           # JSON
+    name = Column(String)
+    data_digest = Column(String)
+    pnl = Column(Float)
+    wr = Column(Float)
+    trades = Column(Integer)
+    profit_factor = Column(Float)
+    max_dd = Column(Float)
+    sharpe = Column(Float)
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('run_id', 'config_hash', name='uq_optimization_run_config'),
+        Index('ix_optimization_pnl', 'run_id', 'pnl'),
+        Index('ix_optimization_sharpe', 'run_id', 'sharpe'),
+        Index('ix_optimization_pf', 'run_id', 'profit_factor'),
+        Index('ix_optimization_max_dd', 'run_id', 'max_dd'),
+    )
+
+class Trade(Base):
+    """
+    Strategiya ochgan savdolar (cooldown va ochiq pozitsiyalar hisobi uchun).
+    Bir simvolda bir nechta ochiq savdo bo'lishi mumkin; cooldown simvol bo'yicha hisoblanadi.
+    """
+    __tablename__ = 'trades'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    symbol = Column(String, nullable=False)
+    direction = Column(String, nullable=False)  # BUY / SELL
+    entry = Column(Float)
+    sl = Column(Float)
+    tp = Column(Float)
+    status = Column(String, default="OPEN")  # OPEN / WIN / LOSS
+    opened_at = Column(DateTime, default=datetime.utcnow)
+    closed_at = Column(DateTime)
+    exit_price = Column(Float)
+
+    __table_args__ = (
+        # Ochiq savdolar va simvol bo'yicha oxirgi LOSS (cooldown): WHERE symbol=? AND status=? ORDER BY closed_at
+        Index('ix_trades_symbol_status', 'symbol', 'status', 'closed_at'),
+        Index('ix_trades_closed_at', 'closed_at'),
+    )
+
+class NewsEvent(Base):
+    """
+    Iqtisodiy kalendar yangiliklari (ICS/CSV importi - data/calendar_import.py).
+    uid bo'yicha takrorlanmaydi; content_hash o'zgarmagan yozuvlar qayta importda yangilanmaydi.
+    """
+    __tablename__ = 'news_events'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    uid = Column(String, nullable=False, unique=True)
+    event_time = Column(DateTime, nullable=False)  # UTC (naive)
+    currency = Column(String(8))
+    title = Column(String)
+    impact = Column(String(10))  # High / Medium / Low / Holiday
+    content_hash = Column(String(40))
+    source = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_news_events_time', 'event_time'),
+        Index('ix_news_events_impact_time', 'impact', 'event_time'),
+    )
+
+class PriceAlert(Base):
+    """
+    Foydalanuvchi narx ogohlantirishlari: "narx X dan oshsa / tushsa xabar ber".
+    Faol ogohlantirishlar ishga tushishda xotiradagi saralangan indeksga yuklanadi.
+    """
+    __tablename__ = 'price_alerts'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=False)
+    symbol = Column(String, default="XAU/USD")
+    direction = Column(String, nullable=False)  # ABOVE (narx >= threshold) / BELOW (narx <= threshold)
+    threshold = Column(Float, nullable=False)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    triggered_at = Column(DateTime)
+    triggered_price = Column(Float)
+
+    __table_args__ = (
+        Index('ix_price_alerts_active', 'is_active', 'symbol'),
+        Index('ix_price_alerts_user', 'user_id', 'is_active'),
+    )
+
+class CotReport(Base):
+    """
+    CFTC COT hisobotlari (haftalik, seshanba holati) - strategies/cot_analyzer.py keshi.
+    market - qisqa kod (masalan, "GOLD"); long/short - "smart money" (Managed Money) pozitsiyalari.
+    """
+    __tablename__ = 'cot_reports'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    market = Column(String(16), nullable=False)
+    report_date = Column(DateTime, nullable=False)
+    long = Column(Float)
+    short = Column(Float)
+    open_interest = Column(Float)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Bir bozorda bir sana bir marta; oxirgi sana va tarix so'rovlari shu indeks bo'yicha
+        UniqueConstraint('market', 'report_date', name='uq_cot_market_date'),
+    )
+
+# Savdo qatori bo'lmagan cooldown vaqtlari shu prefiksli Config kalitlarida saqlanadi
+LAST_LOSS_PREFIX = "LAST_LOSS:"
+
+# Top-N so'rovlari uchun ruxsat etilgan metrikalar: (ustun, kattasi yaxshimi)
+OPTIMIZATION_METRICS = {
+    "pnl": True,
+    "sharpe": True,
+    "profit_factor": True,
+    "wr": True,
+    "max_dd": False,
+}
+
 class Database:
     def __init__(self, db_path="sqlite:///bot_data.db"):
         if 'sqlite' in db_path:
@@ -56,8 +196,13 @@ class Database:
         else:
             self.engine = create_engine(db_path, echo=False)
         self.Session = sessionmaker(bind=self.engine)
+        # Config jadvalining xotiradagi nusxasi: bir marta yuklanadi, set_config orqali yangilanadi
+        self._config = None
+        self._config_lock = threading.Lock()
+        self._config_listeners = []
         self._init_db()
         self._check_schema_updates()
+        self.load_config()
 
     def _init_db(self):
         Base.metadata.create_all(self.engine)
@@ -75,6 +220,18 @@ class Database:
                 # Add column if it doesn't exist
                 session.execute(text("ALTER TABLE subscribers ADD COLUMN language VARCHAR(10) DEFAULT 'uz'"))
                 session.commit()
+
+            # Signal natijalari uchun ustunlar (eski bazalarda yo'q)
+            for name, ddl in (("published_at", "TIMESTAMP"), ("outcome", "VARCHAR(10)"),
+                              ("exit_price", "FLOAT"), ("exit_time", "TIMESTAMP")):
+                try:
+                    session.execute(text(f"SELECT {name} FROM signals LIMIT 1"))
+                except Exception:
+                    session.rollback()
+                    session.execute(text(f"ALTER TABLE signals ADD COLUMN {name} {ddl}"))
+                    session.commit()
+            session.execute(text("CREATE INDEX IF NOT EXISTS ix_signals_open ON signals (status, outcome)"))
+            session.commit()
         except Exception as e:
             # Agar jadval bo'sh bo'lsa yoki boshqa xato bo'lsa
             print(f"Schema update info: {e}")
@@ -187,7 +344,19 @@ class Database:
         finally:
             session.close()
 
+    def load_config(self):
+        """Config jadvalini to'liq xotiraga yuklaydi (ishga tushishda yoki tashqi o'zgarishdan keyin)."""
+        session = self.Session()
+        try:
+            values = {item.key: item.value for item in session.query(Config).all()}
+        finally:
+            session.close()
+        with self._config_lock:
+            self._config = values
+        return dict(values)
+
     def set_config(self, key, value):
+        """Bazaga yozadi (write-through), keshni yangilaydi va o'zgarish kuzatuvchilarini chaqiradi."""
         session = self.Session()
         try:
             item = session.query(Config).filter_by(key=key).first()
@@ -200,13 +369,41 @@ class Database:
         finally:
             session.close()
 
-    def get_config(self, key, default=None):
-        session = self.Session()
+        with self._config_lock:
+            if self._config is None:
+                self._config = {}
+            old = self._config.get(key)
+            self._config[key] = str(value)
+        if old != str(value):
+            for listener in list(self._config_listeners):
+                try:
+                    listener(key, str(value))
+                except Exception as e:
+                    logger.error(f"Config kuzatuvchisida xato ({key}): {e}")
+
+    def get_config(self, key, default=None, cast=None):
+        """
+        Sozlama qiymati xotiradagi keshdan (bazaga so'rov yo'q).
+        cast: masalan int/float - qiymat shu turga o'tkaziladi; o'tkazib bo'lmasa default qaytariladi.
+        """
+        config = self._config
+        if config is None:
+            self.load_config()
+            config = self._config
+        value = config.get(key)
+        if value is None:
+            return default
+        if cast is None:
+            return value
         try:
-            item = session.query(Config).filter_by(key=key).first()
-            return item.value if item else default
-        finally:
-            session.close()
+            return cast(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Config {key}={value!r} {cast.__name__} emas, standart qiymat ishlatiladi")
+            return default
+
+    def add_config_listener(self, listener):
+        """listener(key, value) - set_config qiymatni o'zgartirganda chaqiriladi."""
+        self._config_listeners.append(listener)
 
     def log_signal(self, symbol, signal_type, price, sl, tp, reason):
         session = self.Session()
@@ -232,6 +429,8 @@ class Database:
             signal = session.query(SignalLog).filter_by(id=signal_id).first()
             if signal:
                 signal.status = status
+                if status == "published" and signal.published_at is None:
+                    signal.published_at = datetime.utcnow()
                 session.commit()
         finally:
             session.close()
@@ -262,3 +461,435 @@ class Database:
             return None
         finally:
             session.close()
+
+    def get_open_signals(self, symbol=None):
+        """Chiqarilgan, lekin hali SL/TP ga yetmagan signallar (eskisi birinchi)."""
+        session = self.Session()
+        try:
+            query = session.query(SignalLog).filter(SignalLog.status == "published", SignalLog.outcome.is_(None))
+            if symbol:
+                query = query.filter(SignalLog.symbol == symbol)
+            return query.order_by(SignalLog.id).all()
+        finally:
+            session.close()
+
+    def resolve_signals(self, outcomes):
+        """
+        Signal natijalarini bitta tranzaksiyada yozadi.
+        outcomes: [{"id", "outcome", "exit_price", "exit_time"}, ...]; faqat hali ochiqlari yangilanadi.
+        """
+        if not outcomes:
+            return 0
+        session = self.Session()
+        try:
+            count = 0
+            for o in outcomes:
+                count += session.query(SignalLog).filter(
+                    SignalLog.id == o["id"], SignalLog.outcome.is_(None)
+                ).update({"outcome": o["outcome"], "exit_price": o["exit_price"], "exit_time": o["exit_time"]},
+                         synchronize_session=False)
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    def get_signal_outcome_stats(self, days=30):
+        """Oxirgi `days` kunda yopilgan signallar: {"TP": n, "SL": n, "open": n}."""
+        session = self.Session()
+        try:
+            since = datetime.utcnow() - timedelta(days=days)
+            rows = session.query(SignalLog.outcome, func.count(SignalLog.id)).filter(
+                SignalLog.status == "published", SignalLog.published_at >= since
+            ).group_by(SignalLog.outcome).all()
+            return {(outcome or "open"): count for outcome, count in rows}
+        finally:
+            session.close()
+
+    # --- Optimizatsiya natijalari ---
+
+    def save_optimization_results(self, run_id, rows, data_digest=None):
+        """
+        Bir nechta natijani bitta tranzaksiyada saqlaydi.
+        rows: [(config_hash, params, result), ...] - result: run_scenario metrikalari yoki {"error": ...}
+        """
+        session = self.Session()
+        try:
+            hashes = [h for h, _, _ in rows]
+            existing = {
+                r.config_hash: r for r in session.query(OptimizationResult)
+                .filter(OptimizationResult.run_id == run_id, OptimizationResult.config_hash.in_(hashes))
+            }
+            for config_hash, params, result in rows:
+                item = existing.get(config_hash)
+                if item is None:
+                    item = OptimizationResult(run_id=run_id, config_hash=config_hash)
+                    session.add(item)
+                    existing[config_hash] = item
+                item.params = json.dumps(params, sort_keys=True, default=str)
+                item.name = result.get("name")
+                item.data_digest = data_digest
+                item.error = result.get("error")
+                for key in ("pnl", "wr", "profit_factor", "max_dd", "sharpe"):
+                    value = result.get(key)
+                    # NaN -> NULL (inf saqlanadi: zararsiz savdolarda profit factor = inf)
+                    setattr(item, key, None if value is None or math.isnan(value) else float(value))
+                item.trades = int(result.get("trades") or 0)
+            session.commit()
+        finally:
+            session.close()
+
+    def get_completed_configs(self, run_id, data_digest=None):
+        """
+        Berilgan run uchun muvaffaqiyatli baholangan konfiguratsiyalar hashlari (xatolar qayta baholanadi).
+        data_digest berilsa - faqat shu ma'lumotlarda hisoblanganlari.
+        """
+        session = self.Session()
+        try:
+            query = session.query(OptimizationResult.config_hash).filter(
+                OptimizationResult.run_id == run_id,
+                OptimizationResult.error.is_(None)
+            )
+            if data_digest is not None:
+                query = query.filter(OptimizationResult.data_digest == data_digest)
+            rows = query.all()
+            return {r[0] for r in rows}
+        finally:
+            session.close()
+
+    def get_optimization_results(self, run_id):
+        """Run ning barcha natijalari (rank_results uchun dict ko'rinishida)."""
+        session = self.Session()
+        try:
+            rows = session.query(OptimizationResult).filter_by(run_id=run_id).all()
+            return [self._optimization_row(r) for r in rows]
+        finally:
+            session.close()
+
+    def get_top_optimization_results(self, metric="pnl", limit=10, run_id=None, min_trades=0):
+        """
+        Metrika bo'yicha eng yaxshi N ta natija (indeks bo'yicha saralanadi).
+        run_id berilmasa - eng oxirgi run.
+        """
+        if metric not in OPTIMIZATION_METRICS:
+            raise ValueError(f"Noma'lum metrika: {metric}")
+        session = self.Session()
+        try:
+            if run_id is None:
+                last = session.query(OptimizationResult.run_id)\
+                              .order_by(OptimizationResult.created_at.desc())\
+                              .first()
+                if not last:
+                    return []
+                run_id = last[0]
+            column = getattr(OptimizationResult, metric)
+            query = session.query(OptimizationResult).filter(
+                OptimizationResult.run_id == run_id,
+                OptimizationResult.error.is_(None),
+                column.isnot(None),
+                OptimizationResult.trades >= min_trades
+            )
+            order = column.desc() if OPTIMIZATION_METRICS[metric] else column.asc()
+            return [self._optimization_row(r) for r in query.order_by(order).limit(limit).all()]
+        finally:
+            session.close()
+
+    def get_optimization_runs(self, limit=10):
+        """Oxirgi runlar: [{"run_id", "count", "last"}, ...]"""
+        session = self.Session()
+        try:
+            rows = session.query(
+                OptimizationResult.run_id,
+                func.count(OptimizationResult.id),
+                func.max(OptimizationResult.created_at)
+            ).group_by(OptimizationResult.run_id)\
+             .order_by(func.max(OptimizationResult.created_at).desc())\
+             .limit(limit).all()
+            return [{"run_id": r[0], "count": r[1], "last": r[2]} for r in rows]
+        finally:
+            session.close()
+
+    @staticmethod
+    def _optimization_row(r):
+        row = {
+            "run_id": r.run_id, "config_hash": r.config_hash, "name": r.name,
+            "params": json.loads(r.params) if r.params else {},
+            "pnl": r.pnl, "wr": r.wr, "trades": r.trades, "profit_factor": r.profit_factor,
+            "max_dd": r.max_dd, "sharpe": r.sharpe,
+        }
+        if r.error:
+            row["error"] = r.error
+        return row
+
+    # --- Savdolar (cooldown / ochiq pozitsiyalar) ---
+
+    def open_trade(self, symbol, direction, entry, sl, tp, opened_at=None):
+        session = self.Session()
+        try:
+            trade = Trade(symbol=symbol, direction=direction, entry=float(entry), sl=float(sl), tp=float(tp),
+                          status="OPEN", opened_at=opened_at or datetime.utcnow())
+            session.add(trade)
+            session.commit()
+            return self._trade_row(trade)
+        finally:
+            session.close()
+
+    def close_trade(self, trade_id, status, exit_price=None, closed_at=None):
+        """status: WIN / LOSS. Faqat ochiq savdo yopiladi; Returns: yopilgan bo'lsa True."""
+        session = self.Session()
+        try:
+            count = session.query(Trade).filter(Trade.id == trade_id, Trade.status == "OPEN").update(
+                {"status": status, "closed_at": closed_at or datetime.utcnow(),
+                 "exit_price": float(exit_price) if exit_price is not None else None},
+                synchronize_session=False
+            )
+            session.commit()
+            return count > 0
+        finally:
+            session.close()
+
+    def get_open_trades(self, symbol=None):
+        session = self.Session()
+        try:
+            query = session.query(Trade).filter(Trade.status == "OPEN")
+            if symbol:
+                query = query.filter(Trade.symbol == symbol)
+            return [self._trade_row(t) for t in query.order_by(Trade.id).all()]
+        finally:
+            session.close()
+
+    def get_last_loss_times(self):
+        """
+        {simvol: oxirgi LOSS vaqti} - barcha simvollar uchun bitta so'rov.
+        Eski trading_state.json dan ko'chirilgan cooldownlar (LAST_LOSS:<simvol> sozlamalari) ham hisobga olinadi.
+        """
+        session = self.Session()
+        try:
+            rows = session.query(Trade.symbol, func.max(Trade.closed_at)).filter(
+                Trade.status == "LOSS"
+            ).group_by(Trade.symbol).all()
+            out = {symbol: closed_at for symbol, closed_at in rows}
+        finally:
+            session.close()
+        if self._config is None:
+            self.load_config()
+        for key, value in list(self._config.items()):
+            if not key.startswith(LAST_LOSS_PREFIX):
+                continue
+            symbol = key[len(LAST_LOSS_PREFIX):]
+            try:
+                loss_time = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                continue
+            if out.get(symbol) is None or loss_time > out[symbol]:
+                out[symbol] = loss_time
+        return out
+
+    def set_last_loss_time(self, symbol, loss_time):
+        """Savdosiz cooldown (eski holatdan ko'chirish): Config dagi LAST_LOSS:<simvol>, naive UTC."""
+        self.set_config(LAST_LOSS_PREFIX + symbol, loss_time.isoformat())
+
+    @staticmethod
+    def _trade_row(t):
+        return {
+            "id": t.id, "symbol": t.symbol, "direction": t.direction, "entry": t.entry,
+            "sl": t.sl, "tp": t.tp, "status": t.status, "opened_at": t.opened_at,
+        }
+
+    # --- Iqtisodiy kalendar ---
+
+    def upsert_news_events(self, events, chunk_size=500):
+        """
+        Yangiliklarni uid bo'yicha yozadi: yangilari INSERT, content_hash o'zgarganlari UPDATE,
+        o'zgarmaganlari tegilmaydi. events: [{"uid", "event_time", "currency", "title", "impact",
+        "content_hash", "source"}, ...]. Returns: {"inserted", "updated", "unchanged"}.
+        """
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+        if not events:
+            return stats
+        session = self.Session()
+        try:
+            now = datetime.utcnow()
+            for start in range(0, len(events), chunk_size):
+                chunk = events[start:start + chunk_size]
+                existing = {
+                    uid: (row_id, content_hash) for row_id, uid, content_hash in session.query(
+                        NewsEvent.id, NewsEvent.uid, NewsEvent.content_hash
+                    ).filter(NewsEvent.uid.in_([e["uid"] for e in chunk]))
+                }
+                new_rows, changed_rows = [], []
+                for e in chunk:
+                    found = existing.get(e["uid"])
+                    if found is None:
+                        new_rows.append(dict(e, updated_at=now))
+                    elif found[1] != e["content_hash"]:
+                        changed_rows.append(dict(e, id=found[0], updated_at=now))
+                    else:
+                        stats["unchanged"] += 1
+                if new_rows:
+                    session.execute(insert(NewsEvent), new_rows)
+                if changed_rows:
+                    # Birlamchi kalit bo'yicha bulk UPDATE (executemany)
+                    session.execute(update(NewsEvent), changed_rows)
+                stats["inserted"] += len(new_rows)
+                stats["updated"] += len(changed_rows)
+            session.commit()
+            return stats
+        finally:
+            session.close()
+
+    def get_news_events(self, start=None, end=None, impact=None):
+        """[start, end) oralig'idagi yangiliklar (UTC, vaqt bo'yicha tartiblangan) - ix_news_events_time."""
+        session = self.Session()
+        try:
+            query = session.query(NewsEvent)
+            if start is not None:
+                query = query.filter(NewsEvent.event_time >= start)
+            if end is not None:
+                query = query.filter(NewsEvent.event_time < end)
+            if impact:
+                query = query.filter(NewsEvent.impact == impact)
+            return [
+                {"uid": e.uid, "event_time": e.event_time, "currency": e.currency,
+                 "title": e.title, "impact": e.impact}
+                for e in query.order_by(NewsEvent.event_time).all()
+            ]
+        finally:
+            session.close()
+
+    def get_news_signature(self):
+        """(soni, oxirgi yangilanish) - NewsFilter jadval o'zgarganini arzon aniqlashi uchun."""
+        session = self.Session()
+        try:
+            count, last = session.query(func.count(NewsEvent.id), func.max(NewsEvent.updated_at)).one()
+            return count, last
+        finally:
+            session.close()
+
+    def add_price_alert(self, user_id, symbol, direction, threshold):
+        session = self.Session()
+        try:
+            alert = PriceAlert(user_id=str(user_id), symbol=symbol, direction=direction, threshold=float(threshold))
+            session.add(alert)
+            session.commit()
+            return self._price_alert_row(alert)
+        finally:
+            session.close()
+
+    def get_active_price_alerts(self, symbol=None, user_id=None):
+        session = self.Session()
+        try:
+            query = session.query(PriceAlert).filter(PriceAlert.is_active == True)
+            if symbol:
+                query = query.filter(PriceAlert.symbol == symbol)
+            if user_id is not None:
+                query = query.filter(PriceAlert.user_id == str(user_id))
+            return [self._price_alert_row(a) for a in query.order_by(PriceAlert.threshold).all()]
+        finally:
+            session.close()
+
+    def deactivate_price_alert(self, alert_id, user_id=None):
+        """Ogohlantirishni bekor qiladi. Returns: yozuv (topilmasa yoki boshqa foydalanuvchiniki bo'lsa - None)."""
+        session = self.Session()
+        try:
+            query = session.query(PriceAlert).filter(PriceAlert.id == int(alert_id), PriceAlert.is_active == True)
+            if user_id is not None:
+                query = query.filter(PriceAlert.user_id == str(user_id))
+            alert = query.first()
+            if not alert:
+                return None
+            alert.is_active = False
+            session.commit()
+            return self._price_alert_row(alert)
+        finally:
+            session.close()
+
+    def mark_price_alerts_triggered(self, alert_ids, price):
+        """Ishga tushgan ogohlantirishlarni bitta UPDATE bilan yopadi."""
+        if not alert_ids:
+            return 0
+        session = self.Session()
+        try:
+            count = session.query(PriceAlert).filter(PriceAlert.id.in_(list(alert_ids))).update(
+                {"is_active": False, "triggered_at": datetime.utcnow(),
+                 "triggered_price": float(price) if price is not None else None},
+                synchronize_session=False
+            )
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    @staticmethod
+    def _price_alert_row(a):
+        return {
+            "id": a.id, "user_id": a.user_id, "symbol": a.symbol, "direction": a.direction,
+            "threshold": a.threshold, "created_at": a.created_at,
+        }
+
+    # --- COT hisobotlari ---
+
+    def upsert_cot_reports(self, rows):
+        """
+        rows: [{"market", "report_date", "long", "short", "open_interest"}, ...].
+        Yangi sanalar INSERT, mavjudlari (CFTC tuzatishlari) UPDATE qilinadi. Returns: yozilganlar soni.
+        """
+        if not rows:
+            return 0
+        session = self.Session()
+        try:
+            now = datetime.utcnow()
+            existing = {}
+            for market in {r["market"] for r in rows}:
+                dates = [r["report_date"] for r in rows if r["market"] == market]
+                existing.update({
+                    (market, d): row_id for row_id, d in session.query(CotReport.id, CotReport.report_date).filter(
+                        CotReport.market == market, CotReport.report_date >= min(dates))
+                })
+            new_rows, changed_rows = {}, {}
+            for r in rows:
+                key = (r["market"], r["report_date"])
+                if key in existing:
+                    changed_rows[key] = dict(r, id=existing[key], fetched_at=now)
+                else:
+                    new_rows[key] = dict(r, fetched_at=now)
+            if new_rows:
+                session.execute(insert(CotReport), list(new_rows.values()))
+            if changed_rows:
+                session.execute(update(CotReport), list(changed_rows.values()))
+            session.commit()
+            return len(new_rows) + len(changed_rows)
+        finally:
+            session.close()
+
+    def get_cot_reports(self, market=None, limit=None):
+        """Hisobotlar sana bo'yicha o'sish tartibida; limit - har bozor uchun oxirgi N ta."""
+        session = self.Session()
+        try:
+            query = session.query(CotReport)
+            if market:
+                query = query.filter(CotReport.market == market)
+            if limit and market:
+                rows = query.order_by(CotReport.report_date.desc()).limit(limit).all()[::-1]
+            else:
+                rows = query.order_by(CotReport.market, CotReport.report_date).all()
+            out = [
+                {"market": r.market, "report_date": r.report_date, "long": r.long,
+                 "short": r.short, "open_interest": r.open_interest}
+                for r in rows
+            ]
+            if limit and not market:
+                by_market = {}
+                for r in out:
+                    by_market.setdefault(r["market"], []).append(r)
+                out = [r for items in by_market.values() for r in items[-limit:]]
+            return out
+        finally:
+            session.close()
+
+    def get_cot_latest_dates(self):
+        """{bozor: oxirgi hisobot sanasi}."""
+        session = self.Session()
+        try:
+            return dict(session.query(CotReport.market, func.max(CotReport.report_date)).group_by(CotReport.market).all())
+        finally:
+            session.close()
@@ -1,183 +1,192 @@
 import pandas as pd
 import numpy as np
 from data.feed import DataHandler
-from strategies.indicators import (
-    calculate_indicators, identify_levels, check_trend_ema200, 
-    detect_patterns, check_candlestick_patterns
+from db.database import Database
+from strategies.indicators import calculate_indicators
+from strategies.features import FeatureStore
+from strategies.performance import compute_metrics, write_report
+from strategies.monte_carlo import monte_carlo, format_monte_carlo
+from strategies.intrabar import IntrabarResolver, resolve_exits, OUTCOME_NAMES
+from strategies.result_cache import ResultCache, dataset_digest
+from strategies.optimizer import (
+    grid_configs, random_configs, space_size, run_parallel, rank_results, config_hash, run_hash,
+    adaptive_search, result_score, walk_forward_windows, parameter_stability,
+    FIDELITY_KEY, RANGE_KEY
 )
+import argparse
 import logging
+import os
 
 logging.getLogger("treding.data.feed").setLevel(logging.ERROR)
 
-def run_scenario(df_h4, df_h1, df_m15, scenario_name, params):
-    # Params: {multi_tf: bool, strict_candle: bool}
+# Ssenariy parametrlari (standart qiymatlar - hozirgi strategiya)
+DEFAULT_PARAMS = {
+    "multi_tf": False,
+    "rsi_period": 14,
+    "rsi_upper": 70,       # BUY: RSI < rsi_upper
+    "rsi_lower": 30,       # SELL: RSI > rsi_lower
+    "level_tolerance": 5.0,
+    "level_window": 10,
+    "sl_atr_mult": 1.0,
+    "tp_atr_mult": 2.0,
+    "max_hold_bars": 29,   # Savdo ochiq turadigan maksimal M15 shamlar
+    "cooldown_bars": 16,   # LOSS dan keyin (4 soat)
+}
+
+# Qidiruv maydoni (grid / random search)
+PARAM_SPACE = {
+    "multi_tf": [False, True],
+    "rsi_period": [9, 14, 21],
+    "rsi_upper": [65, 70, 75],
+    "rsi_lower": [25, 30, 35],
+    "level_tolerance": [3.0, 5.0, 7.5],
+    "level_window": [5, 10, 20],
+    "sl_atr_mult": [0.75, 1.0, 1.5],
+    "tp_atr_mult": [1.5, 2.0, 3.0],
+    "max_hold_bars": [16, 29, 48],
+    "cooldown_bars": [0, 16, 32],
+}
+
+def find_entries(df_h4, df_h1, df_m15, params, start=None, end=None, features=None):
+    """
+    Strategiya shartlari bajarilgan barcha M15 kirish nuqtalarini qaytaradi
+    (cooldown hisobga olinmagan): [(index, yo'nalish, narx, sl, tp), ...]
+    start/end - M15 shamlar oralig'i (standart: butun tarix).
+    features - shu dataset uchun FeatureStore (bo'lmasa yaratiladi); ssenariy faqat
+    parametrga bog'liq arzon shartlarni uning ustida qo'llaydi.
+    """
+    # Params: {multi_tf, rsi_period, rsi_upper, rsi_lower, level_tolerance, level_window,
+    #          sl_atr_mult, tp_atr_mult} - berilmaganlari DEFAULT_PARAMS dan olinadi
+    p = {**DEFAULT_PARAMS, **params}
+    f = features if features is not None else FeatureStore(df_h4, df_h1, df_m15)
+    if not f.has_ema:
+        return []
+    
+    start_index = max(200, start or 0)
+    end_index = f.n if end is None else min(end, f.n)
+    if end_index <= start_index:
+        return []
+    bars = slice(start_index, end_index)
+    
+    # 1. H4 Analysis: trend (EMA 200) + yaqin darajalar
+    dist_sup, dist_res = f.level_distances(p["level_window"])
+    near_sup = dist_sup[bars] < p["level_tolerance"]
+    near_res = dist_res[bars] < p["level_tolerance"]
+    trend_up = f.trend_up[bars]
+    
+    # UP: support -> BUY, aks holda resistance -> SELL; DOWN: resistance -> SELL, aks holda support -> BUY
+    is_buy = np.where(trend_up, near_sup, near_sup & ~near_res)
+    is_sell = np.where(trend_up, ~near_sup & near_res, near_res)
     
-    use_multi_tf = params.get("multi_tf", False)
+    # 2. H1 Confirmation: H4 va H1 sham ranglari yo'nalishga mos bo'lishi kerak
+    if p["multi_tf"]:
+        is_buy &= f.h1_bull[bars] & f.h4_bull[bars]
+        is_sell &= f.h1_bear[bars] & f.h4_bear[bars]
     
+    # 3. Entry (M15): shamcha patterni + RSI + MACD momentum
+    rsi = f.rsi(p["rsi_period"])[bars]
+    is_buy &= f.buy_candle[bars] & (rsi < p["rsi_upper"]) & f.momentum_up[bars]
+    is_sell &= f.sell_candle[bars] & (rsi > p["rsi_lower"]) & f.momentum_down[bars]
+    
+    signal = (is_buy | is_sell) & f.aligned[bars]
+    pos = np.flatnonzero(signal) + start_index
+    buy = is_buy[pos - start_index]
+    
+    entry_price = f.close[pos]
+    atr = f.atr[pos]
+    # Optimal settings from previous search: SL 1.0, TP 2.0 (Total 3.0 ATR)
+    sl_dist = atr * p["sl_atr_mult"]
+    tp_dist = atr * p["tp_atr_mult"]
+    sl = np.where(buy, entry_price - sl_dist, entry_price + sl_dist)
+    tp = np.where(buy, entry_price + tp_dist, entry_price - tp_dist)
+    directions = np.where(buy, "BUY", "SELL")
+    
+    return list(zip(pos.tolist(), directions.tolist(), entry_price.tolist(), sl.tolist(), tp.tolist()))
+
+def simulate_entries(df_m15, entries, resolver=None, horizon=29):
+    """Kirish nuqtalari uchun SL/TP natijalarini bitta paketda aniqlaydi (resolve_exits)."""
+    pos, directions, prices, sls, tps = map(np.array, zip(*entries))
+    exits = resolve_exits(df_m15, pos, directions == "BUY", prices, sls, tps, horizon=horizon, resolver=resolver)
+    exits["entry_pos"] = pos
+    exits["direction"] = directions
+    exits["sl_dist"] = np.abs(prices - sls)
+    return exits
+
+def scenario_trades(df_h4, df_h1, df_m15, params, resolver=None, start=None, end=None, features=None):
+    """
+    Ssenariy savdolari (cooldown qo'llangan): [{"pnl", "outcome", "type", "time"}, ...].
+    resolver: IntrabarResolver - noaniq SL/TP shamlari uchun M1 drill-down (ixtiyoriy)
+    start/end: faqat shu oraliqdagi M15 shamlarda kirish (qisqa bo'lak / walk-forward oynasi)
+    features: umumiy FeatureStore (bir nechta ssenariy uchun bir marta hisoblanadi)
+    """
     trades = []
-    start_index = 200
     
-    cooldown_until = 0 # Index to skip until
+    # Kirish nuqtalari avval yig'iladi, natijalar esa bitta paketda aniqlanadi.
+    # Cooldown faqat natijaga bog'liq, shuning uchun u oxirida qo'llanadi.
+    entries = find_entries(df_h4, df_h1, df_m15, params, start, end, features)
+    horizon = params.get("max_hold_bars", DEFAULT_PARAMS["max_hold_bars"])
+    cooldown_bars = params.get("cooldown_bars", DEFAULT_PARAMS["cooldown_bars"])
     
-    for i in range(start_index, len(df_m15)):
-        if i < cooldown_until: continue
-        
-        current_m15_row = df_m15.iloc[i]
-        current_time = current_m15_row.name
-        
-        # Sync H4 and H1
-        h4_subset = df_h4[df_h4.index <= current_time]
-        h1_subset = df_h1[df_h1.index <= current_time]
-        
-        if h4_subset.empty or h1_subset.empty: continue
-        
-        # ... (rest of logic) ...
-        
-        # 1. H4 Analysis
-        # Trend EMA 200 (Standard)
-        h4_last = h4_subset.iloc[-1]
-        ema_200 = h4_last.get("EMA_200")
-        if ema_200 is None: continue
-        
-        global_trend = "UP" if h4_last['close'] > ema_200 else "DOWN"
-        
-        # Levels
-        h4_slice_for_levels = h4_subset.tail(100)
-        h4_levels = identify_levels(h4_slice_for_levels, window=10)
-        current_price = current_m15_row['close']
-        LEVEL_TOLERANCE = 5.0
-        
-        nearby_support = [l for l in h4_levels if l['type'] == 'SUPPORT' and abs(l['price'] - current_price) < LEVEL_TOLERANCE]
-        nearby_resistance = [l for l in h4_levels if l['type'] == 'RESISTANCE' and abs(l['price'] - current_price) < LEVEL_TOLERANCE]
+    if entries:
+        exits = simulate_entries(df_m15, entries, resolver, horizon=horizon)
+        pos = exits["entry_pos"]
         
-        direction = None
-        if global_trend == "UP" and nearby_support: direction = "BUY"
-        elif global_trend == "DOWN" and nearby_resistance: direction = "SELL"
-        
-        if not direction:
-             if nearby_support: direction = "BUY"
-             elif nearby_resistance: direction = "SELL"
-             else: continue
-
-        # 2. H1 Confirmation (NEW)
-        if use_multi_tf:
-            h1_last = h1_subset.iloc[-1]
-            h1_open = h1_last['open']
-            h1_close = h1_last['close']
-            
-            is_h1_bullish = h1_close > h1_open
-            is_h1_bearish = h1_close < h1_open
+        cooldown_until = 0 # Index to skip until
+        for j in range(len(pos)):
+            if pos[j] < cooldown_until: continue
             
-            # Additional Check: H4 Candle Color
-            h4_open = h4_last['open']
-            h4_close = h4_last['close']
-            is_h4_bullish = h4_close > h4_open
-            is_h4_bearish = h4_close < h4_open
+            outcome = OUTCOME_NAMES[exits["outcome"][j]]
+            trades.append({
+                "pnl": float(exits["pnl"][j]), "outcome": str(outcome),
+                "type": str(exits["direction"][j]), "time": df_m15.index[exits["exit_pos"][j]]
+            })
             
-            if direction == "BUY":
-                if not (is_h1_bullish and is_h4_bullish): continue # Strict: H1 and H4 must show GREEN
-            elif direction == "SELL":
-                if not (is_h1_bearish and is_h4_bearish): continue # Strict: H1 and H4 must show RED
-
-        # 3. Entry (M15)
-        last_m15 = df_m15.iloc[i]
-        prev_m15 = df_m15.iloc[i-1]
-        prev_2_m15 = df_m15.iloc[i-2]
-        
-        candlesticks = check_candlestick_patterns(last_m15, prev_m15, prev_2_m15)
-        
-        # Standard Signals
-        buy_candles = ["HAMMER", "BULLISH_ENGULFING", "MORNING_STAR"]
-        sell_candles = ["SHOOTING_STAR", "BEARISH_ENGULFING", "EVENING_STAR"]
-        
-        entry_signal = False
-        
-        if direction == "BUY":
-            has_candle = any(p in candlesticks for p in buy_candles)
-            # RSI/MACD Standard
-            rsi_ok = last_m15.get("RSI_14", 50) < 70
-            macd_hist = last_m15.get("MACDh_12_26_9", 0)
-            momentum_ok = macd_hist > prev_m15.get("MACDh_12_26_9", 0) or macd_hist > 0
-            
-            if has_candle and rsi_ok and momentum_ok:
-                entry_signal = True
-                
-        elif direction == "SELL":
-            has_candle = any(p in candlesticks for p in sell_candles)
-            rsi_ok = last_m15.get("RSI_14", 50) > 30
-            macd_hist = last_m15.get("MACDh_12_26_9", 0)
-            momentum_ok = macd_hist < prev_m15.get("MACDh_12_26_9", 0) or macd_hist < 0
-            
-            if has_candle and rsi_ok and momentum_ok:
-                entry_signal = True
-                
-        if entry_signal:
-             entry_price = current_price
-             atr = last_m15.get("ATRr_14", entry_price * 0.002) * 1.5
-             
-             # Optimal settings from previous search
-             sl_dist = atr * 1.0
-             tp_dist = atr * 2.0 # Total 3.0 ATR
-             
-             sl = entry_price - sl_dist if direction == "BUY" else entry_price + sl_dist
-             tp = entry_price + tp_dist if direction == "BUY" else entry_price - tp_dist
-             
-             future_candles = df_m15.iloc[i+1:i+30]
-             outcome = "BE"
-             pnl = 0
-             
-             for _, future_row in future_candles.iterrows():
-                 high = future_row['high']
-                 low = future_row['low']
-                 
-                 if direction == "BUY":
-                     if low <= sl:
-                         outcome = "LOSS"
-                         pnl = sl - entry_price
-                         break
-                     if high >= tp:
-                         outcome = "WIN"
-                         pnl = tp - entry_price
-                         break
-                 elif direction == "SELL":
-                     if high >= sl:
-                         outcome = "LOSS"
-                         pnl = entry_price - sl
-                         break
-                     if low <= tp:
-                         outcome = "WIN"
-                         pnl = entry_price - tp
-                         break
-             
-             if outcome == "BE" and not future_candles.empty:
-                 exit_price = future_candles.iloc[-1]['close']
-                 if direction == "BUY": pnl = exit_price - entry_price
-                 else: pnl = entry_price - exit_price
-                 outcome = "CLOSE"
-                 
-             trades.append({"pnl": pnl, "outcome": outcome})
-             
-             # COOLDOWN LOGIC: If Loss, skip 4 hours (16 M15 candles)
-             if outcome == "LOSS":
-                 cooldown_until = i + 16
-             
-    total = len(trades)
-    wins = len([t for t in trades if t['pnl'] > 0])
-    wr = (wins / total * 100) if total > 0 else 0
-    total_pnl = sum([t['pnl'] for t in trades])
-    
-    return {"name": scenario_name, "wr": wr, "pnl": total_pnl, "trades": total}
-
-def optimize():
+            # COOLDOWN LOGIC: If Loss, skip 4 hours (16 M15 candles)
+            if outcome == "LOSS":
+                cooldown_until = pos[j] + cooldown_bars
+    
+    return trades
+
+def run_scenario(df_h4, df_h1, df_m15, scenario_name, params, resolver=None, start=None, end=None, features=None):
+    trades = scenario_trades(df_h4, df_h1, df_m15, params, resolver, start, end, features)
+    m = compute_metrics([t['pnl'] for t in trades])
+    
+    return {
+        "name": scenario_name, "wr": m["win_rate"], "pnl": m["total_pnl"], "trades": m["trades"],
+        "profit_factor": m["profit_factor"], "max_dd": m["max_drawdown"], "sharpe": m["sharpe"]
+    }
+
+def cached_scenario(cache, data_digest, df_h4, df_h1, df_m15, scenario_name, params, resolver=None,
+                    start=None, end=None, features=None):
+    """
+    run_scenario + natija keshi: ma'lumotlar, parametrlar va kod o'zgarmagan bo'lsa
+    natija diskdan darhol qaytadi.
+    """
+    compute = lambda: run_scenario(df_h4, df_h1, df_m15, scenario_name, params, resolver, start, end, features)
+    if cache is None:
+        return compute()
+    
+    key = cache.key(data_digest, {
+        "params": {**DEFAULT_PARAMS, **params}, "m1": resolver is not None, "range": [start, end]
+    })
+    result = cache.get_or_compute(key, compute)
+    result["name"] = scenario_name
+    return result
+
+def load_data(symbol="XAU/USD", data_handler=None, m15_limit=3000):
+    """
+    Optimizatsiya uchun ma'lumotlar: H4/H1/M15 (+ indikatorlar), FeatureStore, M1 resolver va dataset hash.
+    """
     print("Loading Data...")
-    data = DataHandler()
-    df_h4 = data.fetch_data("XAU/USD", "H4", limit=1000)
-    df_h1 = data.fetch_data("XAU/USD", "H1", limit=2000) # Added H1
-    df_m15 = data.fetch_data("XAU/USD", "M15", limit=3000)
+    data = data_handler or DataHandler()
+    df_h4 = data.fetch_data(symbol, "H4", limit=1000)
+    df_h1 = data.fetch_data(symbol, "H1", limit=2000) # Added H1
+    df_m15 = data.fetch_data(symbol, "M15", limit=m15_limit)
+    df_m1 = data.fetch_data(symbol, "M1", limit=20000) # Noaniq shamlar uchun (yfinance: ~oxirgi 5 kun)
     
     if df_h4.empty or df_h1.empty or df_m15.empty:
         print("Data Error")
-        return
+        return None
         
     print("Calculating Indicators...")
     config = {"RSI_PERIOD": 14, "EMA_FAST": 50, "EMA_SLOW": 200}
@@ -185,18 +194,319 @@ def optimize():
     df_h1 = calculate_indicators(df_h1, config)
     df_m15 = calculate_indicators(df_m15, config)
     
+    # Parametrga bog'liq bo'lmagan belgilar bir marta; qidiruv maydonidagi variantlar ham oldindan
+    features = FeatureStore(df_h4, df_h1, df_m15).prepare(
+        windows=PARAM_SPACE["level_window"], rsi_periods=PARAM_SPACE["rsi_period"]
+    )
+    
+    return {
+        "h4": df_h4, "h1": df_h1, "m15": df_m15, "features": features,
+        "resolver": IntrabarResolver(df_m15.index, df_m1) if not df_m1.empty else None,
+        # Natija keshi: kalit = hash(shamlar, parametrlar, kod versiyasi)
+        "digest": dataset_digest(df_h4, df_h1, df_m15, df_m1),
+    }
+
+def config_label(params):
+    """Konfiguratsiyaning qisqa nomi (faqat standartdan farq qiluvchi parametrlar)."""
+    diff = [f"{k}={v}" for k, v in params.items() if DEFAULT_PARAMS.get(k) != v]
+    return ", ".join(diff) or "default"
+
+def evaluate_config(state, params):
+    """
+    Bitta konfiguratsiyani baholaydi (optimizer ishchi jarayonlarida chaqiriladi).
+    state: load_data() natijasi + "use_cache".
+    params[FIDELITY_KEY] (ixtiyoriy): faqat oxirgi shu ulushdagi M15 shamlarda baholash.
+    params[RANGE_KEY] (ixtiyoriy): (start, end) - faqat shu M15 oralig'ida baholash.
+    """
+    params = dict(params)
+    fidelity = params.pop(FIDELITY_KEY, 1.0)
+    start, end = params.pop(RANGE_KEY, (None, None))
+    if fidelity < 1.0:
+        n = len(state["m15"])
+        start = n - max(1, int(round((n - 200) * fidelity)))
+    
+    # Kesh har bir jarayonda bir marta ochiladi
+    if state.get("use_cache") and "cache" not in state:
+        state["cache"] = ResultCache()
+    
+    return cached_scenario(
+        state.get("cache"), state["digest"], state["h4"], state["h1"], state["m15"],
+        config_label(params), params, state["resolver"], start=start, end=end, features=state["features"]
+    )
+
+def robustness(state, params, trials=10_000, seed=0):
+    """Eng yaxshi konfiguratsiya savdolari bo'yicha Monte Carlo (drawdown / seriyalar ishonch oraliqlari)."""
+    if state is None:
+        return None
+    trades = scenario_trades(state["h4"], state["h1"], state["m15"], params, state["resolver"],
+                             features=state["features"])
+    mc = monte_carlo([t["pnl"] for t in trades], trials=trials, seed=seed)
+    print(f"\n#1 barqarorligi | {config_label(params)}")
+    print(format_monte_carlo(mc))
+    return mc
+
+def print_ranking(ranked, top=20):
+    print(f"\n--- TOP {min(top, len(ranked))} (o'rtacha rank: PnL, PF, Sharpe, MaxDD) ---")
+    for r in ranked[:top]:
+        print(f"#{r['rank']:<4} PnL=${r['pnl']:.2f}, WR={r['wr']:.1f}%, Trades={r['trades']}, "
+              f"PF={r['profit_factor']:.2f}, MaxDD=${r['max_dd']:.2f}, Sharpe={r['sharpe']:.2f} | {r['name']}")
+
+class ResultRecorder:
+    """
+    Optimizatsiya natijalarini bazaga paket (batch) bilan yozadi: har bir natija alohida
+    tranzaksiya bo'lmasligi uchun `batch_size` tadan yoki `flush()` da saqlanadi.
+    """
+    def __init__(self, db, run_id, data_digest=None, batch_size=25):
+        self.db = db
+        self.run_id = run_id
+        self.data_digest = data_digest
+        self.batch_size = batch_size
+        self.pending = []
+    
+    def add(self, result):
+        params = result.get("params", {})
+        self.pending.append((config_hash(params), params, result))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if self.pending:
+            self.db.save_optimization_results(self.run_id, self.pending, self.data_digest)
+            self.pending = []
+
+def search(mode="random", samples=500, workers=None, top=20, use_cache=True, seed=0, space=None,
+           run_id=None, resume=True, db=None, data_handler=None):
+    """
+    Parametrlar maydoni bo'yicha qidiruv (grid yoki random), barcha yadrolarda parallel.
+    
+    Har bir natija `optimization_results` jadvaliga yoziladi. Xuddi shu run (run_id) qayta
+    ishga tushirilsa, shu ma'lumotlarda (data digest) tugagan konfiguratsiyalar o'tkazib yuboriladi
+    va navbat davom etadi; ma'lumotlar o'zgargan bo'lsa, eski natijalar qayta baholanadi.
+    """
+    space = space or PARAM_SPACE
+    db = db or Database()
+    run_id = run_id or run_hash(mode, space, samples=samples if mode != "grid" else None, seed=seed)
+    
+    if mode == "grid":
+        configs = list(grid_configs(space))
+    else:
+        configs = list(random_configs(space, samples, seed=seed))
+    
+    # Ma'lumotlar avval yuklanadi: tayyor natijalar faqat shu ma'lumotlar (digest) bo'yicha hisoblangan bo'lsa qabul qilinadi
+    state = load_data(data_handler=data_handler)
+    if state is None:
+        return []
+    state["use_cache"] = use_cache
+
+    done = set()
+    if resume:
+        done = db.get_completed_configs(run_id, data_digest=state["digest"])
+        stale = db.get_completed_configs(run_id) - done
+        if stale:
+            print(f"Ogohlantirish: {len(stale)} ta tayyor natija boshqa ma'lumotlarda hisoblangan "
+                  f"(digest {state['digest']} emas) - qayta baholanadi")
+    pending = [c for c in configs if config_hash(c) not in done]
+    print(f"Qidiruv: {mode} (run: {run_id}), {len(configs)} ta konfiguratsiya (maydon: {space_size(space)}), "
+          f"{workers or os.cpu_count()} jarayon")
+    if len(pending) < len(configs):
+        print(f"Davom ettirish: {len(configs) - len(pending)} ta tayyor, {len(pending)} ta qoldi")
+    
+    if pending:
+        recorder = ResultRecorder(db, run_id, state["digest"])
+        try:
+            run_parallel(evaluate_config, state, pending, workers=workers, on_result=recorder.add)
+        finally:
+            recorder.flush()
+    
+    results = db.get_optimization_results(run_id)
+    errors = [r for r in results if "error" in r]
+    if errors:
+        print(f"Xatoliklar: {len(errors)} (masalan: {errors[0]['error']})")
+    
+    ranked = rank_results(results)
+    print_ranking(ranked, top)
+    if ranked:
+        robustness(state, ranked[0]["params"], seed=seed)
+    return ranked
+
+def halving_search(n_configs=81, rounds=2, eta=3, min_fidelity=1 / 9, surrogate=True,
+                   workers=None, top=20, use_cache=True, seed=0, space=None):
+    """
+    Moslashuvchan qidiruv: successive halving (qisqa bo'laklarda saralash) +
+    keyingi raundlarda surrogate model takliflari.
+    """
+    state = load_data()
+    if state is None:
+        return []
+    state["use_cache"] = use_cache
+    space = space or PARAM_SPACE
+    
+    results, budget = adaptive_search(
+        evaluate_config, state, space, n_configs=n_configs, rounds=rounds, eta=eta,
+        min_fidelity=min_fidelity, surrogate=surrogate, workers=workers, seed=seed
+    )
+    print(f"\nBudjet: {budget:.1f} to'liq backtest ekvivalenti "
+          f"(grid: {space_size(space)}, random: {n_configs * rounds})")
+    
+    ranked = rank_results(results)
+    print_ranking(ranked, top)
+    if ranked:
+        robustness(state, ranked[0]["params"], seed=seed)
+    return ranked
+
+def walk_forward(train_bars=1200, test_bars=400, samples=200, workers=None, purge_bars=None,
+                 anchored=False, use_cache=True, seed=0, space=None, metric="pnl", min_trades=5,
+                 state=None, report_path=None, plot=True):
+    """
+    Walk-forward optimizatsiya: k-oynada (train) eng yaxshi konfiguratsiya tanlanadi,
+    k+1-oynada (test, out-of-sample) tekshiriladi, so'ng oyna suriladi.
+    
+    Barcha oynalarning train baholashlari bitta pul ichida parallel bajariladi.
+    Train oxiridan `purge_bars` sham olib tashlanadi (ochiq savdolar test oralig'iga qaramasligi uchun).
+    Natija: ulangan OOS equity, oynalar jadvali va parametrlar barqarorligi.
+    """
+    state = state or load_data(m15_limit=max(3000, train_bars + test_bars * 4 + 200))
+    if state is None:
+        return None
+    state["use_cache"] = use_cache
+    space = space or PARAM_SPACE
+    purge = max(space["max_hold_bars"]) if purge_bars is None else purge_bars
+    
+    df_h4, df_h1, df_m15 = state["h4"], state["h1"], state["m15"]
+    windows = walk_forward_windows(len(df_m15), train_bars, test_bars, start=200, anchored=anchored)
+    if not windows:
+        print(f"Ma'lumot yetarli emas: {len(df_m15)} sham (kerak: {200 + train_bars + test_bars})")
+        return None
+    
+    if samples >= space_size(space):
+        configs = list(grid_configs(space))
+    else:
+        configs = list(random_configs(space, samples, seed=seed))
+    print(f"Walk-forward: {len(windows)} oyna x {len(configs)} konfiguratsiya "
+          f"(train {train_bars}, test {test_bars}, purge {purge} sham)")
+    
+    tasks = [{**c, RANGE_KEY: (tr_start, tr_end - purge)} for tr_start, tr_end, _ in windows for c in configs]
+    results = run_parallel(evaluate_config, state, tasks, workers=workers)
+    
+    winners, rows, oos_trades = [], [], []
+    for w, (tr_start, tr_end, te_end) in enumerate(windows):
+        chunk = results[w * len(configs):(w + 1) * len(configs)]
+        scores = np.array([result_score(r, metric, min_trades=min_trades) for r in chunk])
+        best = int(np.argmax(scores))
+        params, is_result = configs[best], chunk[best]
+        winners.append(params)
+        
+        # Out-of-sample: g'olib parametrlar keyingi oynada
+        trades = scenario_trades(df_h4, df_h1, df_m15, params, state["resolver"],
+                                 start=tr_end, end=te_end, features=state["features"])
+        for t in trades:
+            t["window"] = w
+        oos_trades.extend(trades)
+        
+        oos_pnl = sum(t["pnl"] for t in trades)
+        rows.append({
+            "window": w,
+            "train": [str(df_m15.index[tr_start]), str(df_m15.index[tr_end - 1])],
+            "test": [str(df_m15.index[tr_end]), str(df_m15.index[te_end - 1])],
+            "is_pnl": is_result.get("pnl", 0.0), "is_trades": is_result.get("trades", 0),
+            "oos_pnl": oos_pnl, "oos_trades": len(trades),
+            "valid": bool(np.isfinite(scores[best])),
+            "params": config_label(params),
+        })
+    
+    metrics = compute_metrics([t["pnl"] for t in oos_trades])
+    stability = parameter_stability(winners, space)
+    mc = monte_carlo([t["pnl"] for t in oos_trades], seed=seed)
+    
+    # Walk-forward samaradorligi: OOS daromad / IS daromad (sham boshiga)
+    is_rate = sum(r["is_pnl"] for r in rows) / max(1, len(rows) * (train_bars - purge))
+    oos_rate = metrics["total_pnl"] / max(1, len(rows) * test_bars)
+    efficiency = oos_rate / is_rate if is_rate > 0 else None
+    
+    print("\n--- WALK-FORWARD (out-of-sample) ---")
+    for r in rows:
+        flag = "" if r["valid"] else " (kam savdo)"
+        print(f"#{r['window']:<3} {r['test'][0][:16]} .. {r['test'][1][:16]} | IS ${r['is_pnl']:.2f} ({r['is_trades']}) | "
+              f"OOS ${r['oos_pnl']:.2f} ({r['oos_trades']}){flag} | {r['params']}")
+    print(f"OOS jami: PnL=${metrics['total_pnl']:.2f}, Trades={metrics['trades']}, WR={metrics['win_rate']:.1f}%, "
+          f"PF={metrics['profit_factor']:.2f}, MaxDD=${metrics['max_drawdown']:.2f}")
+    if efficiency is not None:
+        print(f"WF samaradorligi (OOS/IS): {efficiency:.2f}")
+    print(format_monte_carlo(mc))
+    print("\nParametrlar barqarorligi (eng ko'p tanlangan qiymat, ulush, o'zgarishlar):")
+    for key, st in stability.items():
+        print(f"  {key:<16} {str(st['mode']):<6} {st['share'] * 100:5.1f}%  {st['changes']}")
+    
+    report = {
+        "metrics": metrics, "efficiency": efficiency, "windows": rows, "monte_carlo": mc,
+        "stability": {k: {**v, "values": [str(x) for x in v["values"]]} for k, v in stability.items()},
+        "config": {"train_bars": train_bars, "test_bars": test_bars, "purge_bars": purge,
+                   "anchored": anchored, "samples": len(configs), "metric": metric},
+    }
+    if report_path is None:
+        report_path = os.path.join("reports", "walk_forward")
+    files = write_report(report, oos_trades, report_path, plot=plot)
+    print(f"Hisobot saqlandi: {', '.join(files)}")
+    return report
+
+def optimize(use_cache=True):
+    state = load_data()
+    if state is None:
+        return
+    df_h4, df_h1, df_m15 = state["h4"], state["h1"], state["m15"]
+    resolver, data_digest, features = state["resolver"], state["digest"], state["features"]
+    cache = ResultCache() if use_cache else None
+    
     results = []
     
     # 1. Base Strategy (No Multi-TF checks, just levels/trend)
-    results.append(run_scenario(df_h4, df_h1, df_m15, "Base Strategy", {"multi_tf": False}))
+    results.append(cached_scenario(cache, data_digest, df_h4, df_h1, df_m15, "Base Strategy", {"multi_tf": False}, resolver, features=features))
     
     # 2. Multi-TF Alignment (H4+H1 Candle Colors must match M15 entry)
-    results.append(run_scenario(df_h4, df_h1, df_m15, "Multi-TF Alignment (H4+H1+M15)", {"multi_tf": True}))
+    results.append(cached_scenario(cache, data_digest, df_h4, df_h1, df_m15, "Multi-TF Alignment (H4+H1+M15)", {"multi_tf": True}, resolver, features=features))
+    
+    if cache is not None:
+        print(f"Kesh: {cache.hits} hit, {cache.misses} miss")
     
     print("\n--- RESULTS ---")
     results.sort(key=lambda x: x['pnl'], reverse=True)
     for r in results:
-        print(f"{r['name']}: PnL=${r['pnl']:.2f}, WR={r['wr']:.1f}%, Trades={r['trades']}")
+        print(f"{r['name']}: PnL=${r['pnl']:.2f}, WR={r['wr']:.1f}%, Trades={r['trades']}, "
+              f"PF={r['profit_factor']:.2f}, MaxDD=${r['max_dd']:.2f}, Sharpe={r['sharpe']:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Strategiya parametrlarini optimizatsiya qilish")
+    parser.add_argument("--mode", choices=["scenarios", "grid", "random", "halving", "walkforward"], default="scenarios",
+                        help="scenarios - 2 ta asosiy ssenariy; grid/random - parametrlar qidiruvi; "
+                             "halving - successive halving + surrogate; walkforward - out-of-sample tekshiruv")
+    parser.add_argument("--samples", type=int, default=500,
+                        help="random: konfiguratsiyalar soni; halving: har bir raunddagi nomzodlar")
+    parser.add_argument("--rounds", type=int, default=2, help="halving raundlari soni")
+    parser.add_argument("--eta", type=int, default=3, help="halving: har bosqichda 1/eta qismi qoladi")
+    parser.add_argument("--min-fidelity", type=float, default=1 / 9, help="halving: eng qisqa bo'lak ulushi")
+    parser.add_argument("--no-surrogate", action="store_true")
+    parser.add_argument("--train-bars", type=int, default=1200, help="walkforward: train oynasi (M15 sham)")
+    parser.add_argument("--test-bars", type=int, default=400, help="walkforward: test oynasi (M15 sham)")
+    parser.add_argument("--anchored", action="store_true", help="walkforward: train boshi joyida qoladi")
+    parser.add_argument("--workers", type=int, default=None, help="Jarayonlar soni (standart: barcha yadrolar)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--run-id", default=None, help="grid/random: natijalar bazadagi run nomi (standart: maydon+sozlamalar hashi)")
+    parser.add_argument("--no-resume", action="store_true", help="grid/random: tugagan konfiguratsiyalarni ham qayta baholash")
+    args = parser.parse_args()
+    
+    if args.mode == "scenarios":
+        optimize(use_cache=not args.no_cache)
+    elif args.mode == "walkforward":
+        walk_forward(args.train_bars, args.test_bars, args.samples, args.workers, anchored=args.anchored,
+                     use_cache=not args.no_cache, seed=args.seed)
+    elif args.mode == "halving":
+        halving_search(args.samples, args.rounds, args.eta, args.min_fidelity, not args.no_surrogate,
+                       args.workers, args.top, use_cache=not args.no_cache, seed=args.seed)
+    else:
+        search(args.mode, args.samples, args.workers, args.top, use_cache=not args.no_cache, seed=args.seed,
+               run_id=args.run_id, resume=not args.no_resume)
 
 if __name__ == "__main__":
-    optimize()
+    main()
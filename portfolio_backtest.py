@@ -0,0 +1,108 @@
+"""
+Ko'p simvolli portfel backtesti.
+
+Har bir simvol uchun kirish nuqtalari va SL/TP natijalari alohida hisoblanadi
+(optimize_strategy.find_entries + simulate_entries), keyin PortfolioBacktester ularni
+yagona vaqt oqimida umumiy yoki simvol bo'yicha cooldown/ekspozitsiya qoidalari bilan o'ynaydi.
+
+Misol:
+    python portfolio_backtest.py --symbols XAU/USD,EUR/USD,SI=F --cooldown-scope per_symbol --max-open 3
+"""
+import argparse
+import logging
+import os
+
+from data.feed import DataHandler
+from strategies.indicators import calculate_indicators
+from strategies.portfolio import PortfolioBacktester, PortfolioPolicy, candidates_from_exits
+from strategies.performance import write_report
+from optimize_strategy import find_entries, simulate_entries
+
+logging.getLogger("treding.data.feed").setLevel(logging.ERROR)
+
+CONFIG = {"RSI_PERIOD": 14, "EMA_FAST": 50, "EMA_SLOW": 200}
+# Darajaga yaqinlik chegarasi narxga nisbatan (%): DEFAULT_PARAMS dagi $5 faqat oltin uchun mos,
+# EUR/USD (~1.1) yoki BTC/USD (~100k) uchun har bir simvolning o'z narx darajasidan hisoblanadi
+LEVEL_TOLERANCE_PCT = 0.25
+
+
+def load_candidates(data, symbol, params):
+    """
+    Bitta simvol uchun portfel nomzod savdolari (yoki None).
+    params da level_tolerance berilmasa, u simvol narxining LEVEL_TOLERANCE_PCT foizi sifatida olinadi.
+    """
+    df_h4 = data.fetch_data(symbol, "H4", limit=1000)
+    df_h1 = data.fetch_data(symbol, "H1", limit=2000)
+    df_m15 = data.fetch_data(symbol, "M15", limit=3000)
+    if df_h4.empty or df_h1.empty or df_m15.empty:
+        print(f"{symbol}: ma'lumot yo'q, o'tkazib yuborildi")
+        return None
+
+    df_h4 = calculate_indicators(df_h4, CONFIG)
+    df_h1 = calculate_indicators(df_h1, CONFIG)
+    df_m15 = calculate_indicators(df_m15, CONFIG)
+
+    if "level_tolerance" not in params:
+        # Simvolning M15 median narxidan (masalan, oltin ~$2000 -> $5)
+        tolerance = float(df_m15["close"].median()) * LEVEL_TOLERANCE_PCT / 100
+        params = {**params, "level_tolerance": tolerance}
+        print(f"{symbol}: level_tolerance = {tolerance:.6g} ({LEVEL_TOLERANCE_PCT}% narx)")
+
+    entries = find_entries(df_h4, df_h1, df_m15, params)
+    print(f"{symbol}: {len(entries)} ta nomzod savdo")
+    if not entries:
+        return None
+    return candidates_from_exits(df_m15, simulate_entries(df_m15, entries))
+
+
+def run_portfolio(symbols, policy, params=None, data_handler=None, report_path=None):
+    data = data_handler or DataHandler()
+    params = params or {"multi_tf": True}
+
+    candidates = {}
+    for symbol in symbols:
+        c = load_candidates(data, symbol, params)
+        if c is not None:
+            candidates[symbol] = c
+
+    result = PortfolioBacktester(policy).run(candidates)
+    m = result["metrics"]
+
+    print("\n--- PORTFEL NATIJALARI ---")
+    print(f"Cooldown: {policy.cooldown_scope} | Max ochiq: {policy.max_open_total} (simvol: {policy.max_open_per_symbol})")
+    print(f"Savdolar: {m['trades']} | WR: {m['win_rate']:.1f}% | PnL: ${m['total_pnl']:.2f} | "
+          f"MaxDD: ${m['max_drawdown']:.2f} | PF: {m['profit_factor']:.2f}")
+    print(f"O'tkazib yuborildi: cooldown={result['skipped']['cooldown']}, ekspozitsiya={result['skipped']['exposure']}")
+    for sym, row in result["per_symbol"].items():
+        print(f"  {sym:<10} | {row['trades']:>4} savdo | PnL ${row['pnl']:.2f}")
+
+    if report_path is None:
+        report_path = os.path.join("reports", "portfolio")
+    report = {k: result[k] for k in ("metrics", "per_symbol", "skipped")}
+    files = write_report(report, result["trades"], report_path)
+    print(f"Hisobot saqlandi: {', '.join(files)}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ko'p simvolli portfel backtesti")
+    parser.add_argument("--symbols", default="XAU/USD,EUR/USD,BTC/USD")
+    parser.add_argument("--cooldown-scope", choices=["shared", "per_symbol"], default="shared")
+    parser.add_argument("--cooldown-hours", type=float, default=4)
+    parser.add_argument("--max-open", type=int, default=1, help="Bir vaqtda ochiq savdolar (jami)")
+    parser.add_argument("--max-open-per-symbol", type=int, default=1)
+    parser.add_argument("--risk", type=float, default=10.0, help="Har bir savdo riski ($)")
+    args = parser.parse_args()
+
+    policy = PortfolioPolicy(
+        cooldown_scope=args.cooldown_scope,
+        cooldown_hours=args.cooldown_hours,
+        max_open_total=args.max_open,
+        max_open_per_symbol=args.max_open_per_symbol,
+        risk_per_trade=args.risk,
+    )
+    run_portfolio([s for s in args.symbols.split(",") if s], policy)
+
+
+if __name__ == "__main__":
+    main()
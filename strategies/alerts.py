@@ -0,0 +1,214 @@
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ABOVE = "ABOVE"
+BELOW = "BELOW"
+
+
+class ThresholdIndex:
+    """
+    Narx chegaralarining saralangan indeksi.
+
+    ABOVE chegaralari (narx >= threshold bo'lganda ishlaydi) va BELOW chegaralari
+    (narx <= threshold) alohida o'sish tartibidagi massivlarda saqlanadi. Yangi narx
+    oralig'i (low..high) uchun kesib o'tilgan chegaralar searchsorted bilan topiladi:
+    ABOVE - massiv boshidagi [0, i) bo'lak, BELOW - oxiridagi [j, n) bo'lak,
+    ya'ni O(log n + k), barcha ogohlantirishlarni aylanib chiqmasdan.
+    """
+    def __init__(self):
+        self._levels = {ABOVE: np.empty(0, dtype=np.float64), BELOW: np.empty(0, dtype=np.float64)}
+        self._keys = {ABOVE: np.empty(0, dtype=object), BELOW: np.empty(0, dtype=object)}
+        self._where = {}  # kalit -> yo'nalish
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def add(self, key, threshold: float, direction: str):
+        if direction not in self._levels:
+            raise ValueError(f"Noma'lum yo'nalish: {direction}")
+        if key in self._where:
+            self.remove(key)
+        levels = self._levels[direction]
+        # Teng chegaralar ichida qo'shilish tartibi saqlanadi
+        pos = int(np.searchsorted(levels, threshold, side="right"))
+        self._levels[direction] = np.insert(levels, pos, float(threshold))
+        self._keys[direction] = np.insert(self._keys[direction], pos, key)
+        self._where[key] = direction
+
+    def extend(self, items):
+        """Ko'p chegarani birdaniga qo'shish: [(key, threshold, direction), ...] - bitta saralash bilan."""
+        for direction in (ABOVE, BELOW):
+            batch = [(k, t) for k, t, d in items if d == direction and k not in self._where]
+            if not batch:
+                continue
+            keys = np.empty(len(batch), dtype=object)
+            keys[:] = [k for k, _ in batch]
+            levels = np.concatenate([self._levels[direction], np.array([t for _, t in batch], dtype=np.float64)])
+            keys = np.concatenate([self._keys[direction], keys])
+            order = np.argsort(levels, kind="stable")
+            self._levels[direction], self._keys[direction] = levels[order], keys[order]
+            for k, _ in batch:
+                self._where[k] = direction
+
+    def remove(self, key) -> bool:
+        direction = self._where.pop(key, None)
+        if direction is None:
+            return False
+        keys = self._keys[direction]
+        pos = np.flatnonzero(keys == key)
+        self._levels[direction] = np.delete(self._levels[direction], pos)
+        self._keys[direction] = np.delete(keys, pos)
+        return True
+
+    def pop_crossed(self, high: float, low: float = None) -> list:
+        """
+        Narx oralig'i [low, high] da kesib o'tilgan barcha kalitlarni qaytaradi va indeksdan olib tashlaydi.
+        Bitta narx (tick) uchun low berilmaydi.
+        """
+        low = high if low is None else low
+        i = int(np.searchsorted(self._levels[ABOVE], high, side="right"))
+        j = int(np.searchsorted(self._levels[BELOW], low, side="left"))
+        fired = self._keys[ABOVE][:i].tolist() + self._keys[BELOW][j:].tolist()
+        if i:
+            self._levels[ABOVE], self._keys[ABOVE] = self._levels[ABOVE][i:], self._keys[ABOVE][i:]
+        if j < len(self._levels[BELOW]):
+            self._levels[BELOW], self._keys[BELOW] = self._levels[BELOW][:j], self._keys[BELOW][:j]
+        for key in fired:
+            self._where.pop(key, None)
+        return fired
+
+
+class PriceAlertManager:
+    """
+    Foydalanuvchi narx ogohlantirishlari: bazadagi PriceAlert jadvali + har bir simvol uchun ThresholdIndex.
+
+    DataHandler har yangi narxda on_price(symbol, price, source=...) ni chaqiradi (add_price_listener);
+    ishlagan ogohlantirishlar bazada bitta UPDATE bilan yopiladi va yuborish navbatiga qo'yiladi.
+    Bot navbatni drain() bilan paketlab oladi va foydalanuvchilarga yuboradi.
+    """
+    def __init__(self, db, max_per_user: int = 20):
+        self.db = db
+        self.max_per_user = max_per_user
+        self._indexes = {}
+        self._alerts = {}  # id -> yozuv
+        self._pending = deque()
+        self._last_price = {}  # simvol -> (narx, manba)
+        # on_price ishchi oqimda (baholash), add/cancel/drain esa event loop da chaqiriladi
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Faol ogohlantirishlarni bazadan xotiraga yuklash (ishga tushishda)."""
+        alerts = self.db.get_active_price_alerts()
+        with self._lock:
+            self._indexes.clear()
+            self._alerts = {a["id"]: a for a in alerts}
+            by_symbol = {}
+            for a in alerts:
+                by_symbol.setdefault(a["symbol"], []).append((a["id"], a["threshold"], a["direction"]))
+            for symbol, items in by_symbol.items():
+                self._index(symbol).extend(items)
+        logger.info(f"{len(alerts)} ta narx ogohlantirishi yuklandi")
+        return len(alerts)
+
+    def _index(self, symbol) -> ThresholdIndex:
+        if symbol not in self._indexes:
+            self._indexes[symbol] = ThresholdIndex()
+        return self._indexes[symbol]
+
+    def active_count(self, symbol=None) -> int:
+        if symbol:
+            return len(self._indexes.get(symbol, ()))
+        return len(self._alerts)
+
+    def user_alerts(self, user_id) -> list:
+        with self._lock:
+            return sorted((a for a in self._alerts.values() if a["user_id"] == str(user_id)),
+                          key=lambda a: a["threshold"])
+
+    def add(self, user_id, symbol, threshold: float, direction: str = None, current_price: float = None):
+        """
+        Yangi ogohlantirish. direction berilmasa joriy narxga nisbatan aniqlanadi
+        (chegara narxdan yuqori - ABOVE, past - BELOW).
+        Returns: yozuv dict. Limitdan oshsa yoki yo'nalish aniqlanmasa ValueError.
+        """
+        if direction is None:
+            if not current_price:
+                raise ValueError("Yo'nalishni aniqlash uchun joriy narx kerak")
+            direction = ABOVE if threshold > current_price else BELOW
+        direction = direction.upper()
+        if direction not in (ABOVE, BELOW):
+            raise ValueError(f"Noma'lum yo'nalish: {direction}")
+        if len(self.user_alerts(user_id)) >= self.max_per_user:
+            raise ValueError(f"Faol ogohlantirishlar limiti: {self.max_per_user}")
+
+        alert = self.db.add_price_alert(user_id, symbol, direction, threshold)
+        with self._lock:
+            self._alerts[alert["id"]] = alert
+            self._index(symbol).add(alert["id"], alert["threshold"], direction)
+        return alert
+
+    def cancel(self, alert_id, user_id=None) -> bool:
+        alert = self.db.deactivate_price_alert(alert_id, user_id=user_id)
+        if not alert:
+            return False
+        with self._lock:
+            self._alerts.pop(alert["id"], None)
+            index = self._indexes.get(alert["symbol"])
+            if index:
+                index.remove(alert["id"])
+        return True
+
+    def on_price(self, symbol, high: float, low: float = None, source: str = None) -> int:
+        """
+        Yangi narx (yoki sham oralig'i). Oldingi narx bilan birga kesib o'tilgan chegaralar ham olinadi,
+        shuning uchun ikki tick orasida "sakrab o'tilgan" chegara ham ishlaydi.
+        source: narx manbai - oraliq faqat bir manbadagi ketma-ket ticklar orasida olinadi
+        (spot va fyuchers narxlari orasidagi farq "kesib o'tish" deb hisoblanmaydi).
+        Returns: ishga tushgan ogohlantirishlar soni.
+        """
+        if not high:
+            return 0
+        low = high if low is None else low
+        tick = high if low == high else None
+        with self._lock:
+            index = self._indexes.get(symbol)
+            prev, prev_source = self._last_price.get(symbol, (None, None))
+            self._last_price[symbol] = (tick, source)
+            if not index:
+                return 0
+            if prev is not None and prev_source == source:
+                high, low = max(high, prev), min(low, prev)
+            fired = index.pop_crossed(high, low)
+            alerts = [self._alerts.pop(key) for key in fired if key in self._alerts]
+        if not alerts:
+            return 0
+
+        try:
+            self.db.mark_price_alerts_triggered([a["id"] for a in alerts], tick)
+        except Exception as e:
+            logger.error(f"Narx ogohlantirishlarini yopishda xato: {e}")
+        with self._lock:
+            for a in alerts:
+                # Sham oralig'i bo'yicha ishlaganda aniq narx yo'q - chegaraning o'zi
+                self._pending.append({**a, "price": tick if tick is not None else a["threshold"]})
+        logger.info(f"{symbol}: {len(alerts)} ta narx ogohlantirishi ishladi")
+        return len(alerts)
+
+    def drain(self, limit: int = None) -> list:
+        """Yuborilishi kerak bo'lgan ogohlantirishlar (navbatdan olinadi)."""
+        with self._lock:
+            count = len(self._pending) if limit is None else min(limit, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def requeue(self, items):
+        """Yuborilmay qolganlarni navbat boshiga qaytarish."""
+        with self._lock:
+            self._pending.extendleft(reversed(list(items)))
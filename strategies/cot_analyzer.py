@@ -1,145 +1,294 @@
 import requests
+import numpy as np
 import pandas as pd
+import json
 import logging
+import threading
 from datetime import datetime, timedelta
 import os
 
 logger = logging.getLogger(__name__)
 
+# Socrata API manzili; test/offline uchun mahalliy server berish mumkin (COT_API_URL=http://127.0.0.1:8000)
+COT_API_URL = os.getenv("COT_API_URL", "https://publicreporting.cftc.gov/resource")
+# Hisobot seshanba holatida, juma 15:30 (Nyu-York) da e'lon qilinadi: keyingi hisobot sanasidan ~3 kun 20 soat keyin
+RELEASE_LAG = timedelta(days=3, hours=20, minutes=30)
+# E'lon kechiksa (bayram) qayta urinish oralig'i
+RETRY_INTERVAL = timedelta(hours=6)
+# Bo'sh bazada birinchi yuklanadigan tarix (hafta)
+INITIAL_WEEKS = 156
+DATE_COLUMN = "report_date_as_yyyy_mm_dd"
+
+# Socrata datasetlari: "smart money" long/short ustunlari
+#   72hh-3qpy - Disaggregated Futures Only (tovarlar): Managed Money (Hedge fondlar)
+#   gpe5-46if - Traders in Financial Futures (valyutalar, indekslar): Leveraged Funds
+DATASETS = {
+    "72hh-3qpy": ("m_money_positions_long_all", "m_money_positions_short_all"),
+    "gpe5-46if": ("lev_money_positions_long", "lev_money_positions_short"),
+}
+# Bozor -> (dataset, CFTC kontrakt kodi)
+MARKETS = {
+    "GOLD": ("72hh-3qpy", "088691"),
+    "SILVER": ("72hh-3qpy", "084691"),
+    "COPPER": ("72hh-3qpy", "085692"),
+    "USD_INDEX": ("gpe5-46if", "098662"),
+    "EUR": ("gpe5-46if", "099741"),
+}
+
+SENTIMENT_COLUMNS = ["report_date", "long", "short", "net", "net_change", "cot_index", "zscore",
+                     "sentiment", "score", "weeks", "details"]
+
+
+def cot_sentiment_table(history: pd.DataFrame, lookback: int = 52, threshold: float = 0.10) -> pd.DataFrame:
+    """
+    Ko'p bozorli COT tarixidan (market, report_date, long, short ustunli bitta jadval) har bir bozorning
+    oxirgi holatini hisoblaydi - barcha bozorlar uchun birdaniga, groupby shift/rolling bilan:
+        net        - long - short
+        net_change - haftalik o'zgarish, % (|oldingi net| ga nisbatan)
+        cot_index  - lookback haftalik min/max oralig'idagi o'rni (Willco), %
+        zscore     - lookback haftalik o'rtacha va standart og'ishga nisbatan
+    Returns: bozor bo'yicha indekslangan jadval (SENTIMENT_COLUMNS); kamida 2 haftalik bozorlar.
+    """
+    if history is None or history.empty:
+        return pd.DataFrame(columns=SENTIMENT_COLUMNS, index=pd.Index([], name="market"))
+
+    df = history.sort_values(["market", "report_date"], kind="stable").reset_index(drop=True)
+    net = df["long"] - df["short"]
+    grouped = net.groupby(df["market"], sort=False)
+
+    prev = grouped.shift(1)
+    change = ((net - prev) / prev.abs()).where(prev.abs() > 0, 0.0)
+
+    rolling = grouped.rolling(lookback, min_periods=1)
+    low = rolling.min().reset_index(level=0, drop=True)
+    high = rolling.max().reset_index(level=0, drop=True)
+    mean = rolling.mean().reset_index(level=0, drop=True)
+    std = rolling.std(ddof=0).reset_index(level=0, drop=True)
+    span = high - low
+    cot_index = ((net - low) / span * 100).where(span != 0, 0.0)
+    zscore = ((net - mean) / std).where(std > 0, 0.0)
+
+    df = df.assign(net=net, net_change=change, cot_index=cot_index, zscore=zscore,
+                   weeks=grouped.cumcount() + 1)
+    last = df.groupby("market", sort=True).tail(1)
+    last = last[last["weeks"] >= 2].set_index("market").sort_index()
+
+    # Signal shartlari: trend (haftalik o'zgarish) + haddan tashqari holatlarda qayrilish
+    trend = np.select([last["net_change"] > threshold, last["net_change"] < -threshold], [1, -1], 0)
+    sentiment = np.select(
+        [(trend == 1) & (last["cot_index"] > 90), (trend == -1) & (last["cot_index"] < 10), trend == 1, trend == -1],
+        ["REVERSAL_BEARISH", "REVERSAL_BULLISH", "BULLISH", "BEARISH"], "NEUTRAL")
+
+    table = last.assign(
+        net_change=(last["net_change"] * 100).round(1),
+        cot_index=last["cot_index"].round(1),
+        zscore=last["zscore"].round(2),
+        sentiment=sentiment,
+        score=trend,
+    )
+    # Izoh trend bilan bir xil chegara va yaxlitlanmagan o'zgarish bo'yicha (score bilan mos kelishi uchun)
+    table["details"] = [_details(c, i, threshold * 100) for c, i in zip(last["net_change"] * 100, table["cot_index"])]
+    return table[SENTIMENT_COLUMNS]
+
+
+def _details(net_change_pct, cot_index, threshold_pct=10.0) -> str:
+    details = []
+    # Trend tahlili
+    if net_change_pct > threshold_pct:
+        details.append(f"Hedge-fondlar rekord darajada sotib olishmoqda (+{net_change_pct:.1f}%)")
+    elif net_change_pct < -threshold_pct:
+        details.append(f"Hedge-fondlar sotishni boshladi ({net_change_pct:.1f}%)")
+    # Reversal (Qayrilish) punktlari
+    if cot_index > 90:
+        details.append("Bozor haddan tashqari sotib olingan (Overbought)")
+    elif cot_index < 10:
+        details.append("Bozor haddan tashqari sotilgan (Oversold)")
+    return " | ".join(details)
+
+
 class COTAnalyzer:
     """
     CFTC COT (Commitment of Traders) hisobotlarini tahlil qilish moduli.
-    Yirik o'yinchilar (Hedge fondlar) kayfiyatini aniqlaydi.
+    Yirik o'yinchilar (Hedge fondlar) kayfiyatini aniqlaydi: oltin, kumush, mis, dollar indeksi va yevro.
+
+    Hisobotlar bazadagi cot_reports jadvalida saqlanadi, shuning uchun tahlil ishga tushishda
+    tarmoqsiz tayyor. refresh() faqat yangi hisobot e'lon qilingan bo'lishi kerak bo'lgandan keyin
+    (oxirgi sana + 7 kun + RELEASE_LAG) har bir dataset uchun bitta kichik so'rov yuboradi: $where bilan
+    faqat oxirgi saqlangan sanadan keyingi qatorlar, ETag bilan esa o'zgarmagan javob 304 bo'lib qaytadi.
+    Kayfiyat jadvali (sentiment_table) yangi hisobot kelgandagina qayta hisoblanadi.
     """
-    def __init__(self, db):
+    def __init__(self, db, api_url=None, session=None, markets=None):
         self.db = db
-        # Socrata API - Disaggregated Futures Only (Oltin uchun eng mos)
-        # Managed Money -> "Smart Money" (Hedge fondlar) uchun proksi
-        self.dataset_id = "72hh-3qpy"
-        self.api_url = f"https://publicreporting.cftc.gov/resource/{self.dataset_id}.json"
+        self.api_base = (api_url or COT_API_URL).rstrip('/')
+        self.markets = markets or MARKETS
+        self.http = session or requests.Session()
         self.lookback_period = 52 # Standart: 52 hafta
         self.threshold = 0.10   # 10% o'zgarish bo'sag'asi
-        
-        # Keshlangan natijalar
-        self.last_analysis = None
+
+        # Keshlangan natijalar (bazadagi oxirgi hisobot sanalari bo'yicha)
         self.last_fetch_time = None
+        self._table = None
+        self._table_key = None
+        self._latest = None
+        self._lock = threading.Lock()
 
-    def fetch_cot_data(self, limit=100):
+    def latest_dates(self) -> dict:
+        """{bozor: oxirgi saqlangan hisobot sanasi} (bazadan bir marta o'qiladi)."""
+        if self._latest is None:
+            self._latest = self.db.get_cot_latest_dates()
+        return self._latest
+
+    def latest_report_date(self, market="GOLD"):
+        return self.latest_dates().get(market)
+
+    def refresh_due(self, now=None) -> bool:
+        """Yangi hisobot e'lon qilingan bo'lishi mumkinmi (va oxirgi urinishdan RETRY_INTERVAL o'tganmi)."""
+        now = now or datetime.utcnow()
+        if self.last_fetch_time and now - self.last_fetch_time < RETRY_INTERVAL:
+            return False
+        latest = self.latest_dates()
+        if any(m not in latest for m in self.markets):
+            return True
+        return now >= min(latest[m] for m in self.markets) + timedelta(days=7) + RELEASE_LAG
+
+    def refresh(self, force=False) -> int:
         """
-        CFTC API dan Oltin bo'yicha oxirgi hisobotlarni yuklab oladi.
+        Kerak bo'lsa yangi hisobotlarni yuklab bazaga yozadi (dataset bo'yicha bittadan so'rov).
+        Returns: yangi/yangilangan qatorlar soni (so'rov yuborilmagan yoki 304 bo'lsa 0).
         """
+        with self._lock:
+            if not force and not self.refresh_due():
+                return 0
+            self.last_fetch_time = datetime.utcnow()
+            latest = self.latest_dates()
+            by_dataset = {}
+            for market, (dataset_id, _) in self.markets.items():
+                by_dataset.setdefault(dataset_id, []).append(market)
+
+            count = 0
+            for dataset_id, markets in by_dataset.items():
+                known = [latest[m] for m in markets if m in latest]
+                since = min(known) if len(known) == len(markets) else self.last_fetch_time - timedelta(weeks=INITIAL_WEEKS)
+                df = self.fetch_cot_data(dataset_id, markets, since=since)
+                if df is None or df.empty:
+                    continue
+                rows = df[["market", "report_date", "long", "short", "open_interest"]].to_dict("records")
+                for r in rows:
+                    r["report_date"] = r["report_date"].to_pydatetime()
+                count += self.db.upsert_cot_reports(rows)
+                for market, date in df.groupby("market")["report_date"].max().items():
+                    date = date.to_pydatetime()
+                    latest[market] = max(date, latest.get(market, date))
+            if count:
+                logger.info(f"COT: {count} ta yangi hisobot saqlandi")
+            return count
+
+    def fetch_cot_data(self, dataset_id="72hh-3qpy", markets=("GOLD",), since=None, limit=5000):
+        """
+        CFTC API dan bitta datasetdagi bozorlar bo'yicha since dan keyingi hisobotlarni yuklab oladi.
+        Returns: DataFrame (market, report_date, long, short, open_interest; sana bo'yicha o'sish tartibida).
+        Javob o'zgarmagan bo'lsa (304) - bo'sh DataFrame, xatoda - None.
+        """
+        long_col, short_col = DATASETS[dataset_id]
+        codes = {self.markets[m][1]: m for m in markets}
+        where = "cftc_contract_market_code in ({})".format(", ".join(f"'{c}'" for c in sorted(codes)))
+        if since is not None:
+            where += f" AND {DATE_COLUMN} > '{since:%Y-%m-%dT%H:%M:%S}'"
         params = {
-            "$where": "market_and_exchange_names like '%GOLD - NEW YORK MERCANTILE EXCHANGE%'",
+            "$select": f"{DATE_COLUMN},cftc_contract_market_code,{long_col},{short_col},open_interest_all",
+            "$where": where,
             "$limit": limit,
-            "$order": "report_date_as_yyyy_mm_dd DESC"
+            "$order": f"{DATE_COLUMN} ASC"
         }
-        
+        # ETag faqat aynan shu so'rov uchun amal qiladi
+        headers = {}
+        etags = self._load_etags()
+        cached = etags.get(dataset_id, {})
+        if cached.get("where") == where and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+
         try:
-            logger.info("CFTC dan COT ma'lumotlari yuklanmoqda...")
-            response = requests.get(self.api_url, params=params, timeout=10)
+            logger.info(f"CFTC dan COT ma'lumotlari yuklanmoqda ({dataset_id}: {', '.join(markets)})...")
+            response = self.http.get(f"{self.api_base}/{dataset_id}.json", params=params, headers=headers, timeout=10)
+            if response.status_code == 304:
+                logger.info("COT: yangi hisobot yo'q (304)")
+                return pd.DataFrame()
             response.raise_for_status()
             data = response.json()
-            
+            if response.headers.get("ETag"):
+                etags[dataset_id] = {"where": where, "etag": response.headers["ETag"]}
+                self.db.set_config("COT_ETAG", json.dumps(etags))
+
             if not data:
-                logger.warning("CFTC dan Oltin bo'yicha ma'lumot topilmadi.")
-                return None
-                
-            df = pd.DataFrame(data)
-            
+                logger.info("COT: yangi hisobot hali e'lon qilinmagan")
+                return pd.DataFrame()
+
+            raw = pd.DataFrame(data)
             # Kerakli ustunlarni raqamlarga o'tkazish
-            cols_to_numeric = [
-                'm_money_positions_long_all', 
-                'm_money_positions_short_all', 
-                'open_interest_all'
-            ]
-            for col in cols_to_numeric:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                
-            df['report_date'] = pd.to_datetime(df['report_date_as_yyyy_mm_dd'])
-            df = df.sort_values('report_date', ascending=True)
-            
-            return df
-            
+            df = pd.DataFrame({
+                "market": raw["cftc_contract_market_code"].map(codes),
+                "report_date": pd.to_datetime(raw[DATE_COLUMN]),
+                "long": pd.to_numeric(raw[long_col], errors='coerce'),
+                "short": pd.to_numeric(raw[short_col], errors='coerce'),
+                "open_interest": pd.to_numeric(raw["open_interest_all"], errors='coerce'),
+            })
+            return df.dropna().sort_values('report_date', ascending=True)
+
         except Exception as e:
             logger.error(f"COT ma'lumotlarini yuklashda xatolik: {e}")
             return None
 
-    def analyze(self):
+    def _load_etags(self) -> dict:
+        try:
+            return json.loads(self.db.get_config("COT_ETAG", "{}"))
+        except (TypeError, ValueError):
+            return {}
+
+    def history(self) -> pd.DataFrame:
+        """Bazadagi barcha bozorlarning oxirgi lookback_period ta hisoboti - bitta jadval."""
+        rows = self.db.get_cot_reports(limit=self.lookback_period)
+        df = pd.DataFrame(rows, columns=["market", "report_date", "long", "short", "open_interest"])
+        return df[df["market"].isin(list(self.markets))]
+
+    def sentiment_table(self, refresh=False) -> pd.DataFrame:
+        """
+        Barcha bozorlar bo'yicha kayfiyat jadvali (cot_sentiment_table). Faqat yangi hisobot
+        kelganda qayta hisoblanadi; strategiya va bot shu keshlangan jadvalni o'qiydi.
+        """
+        if refresh:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"COT yangilashda xatolik: {e}")
+        key = tuple(sorted(self.latest_dates().items()))
+        if self._table is None or self._table_key != key:
+            self._table = cot_sentiment_table(self.history(), self.lookback_period, self.threshold)
+            self._table_key = key
+        return self._table
+
+    def analyze(self, refresh=True, market="GOLD"):
         """
-        COT ma'lumotlarini tahlil qiladi va Sentiment Score qaytaradi.
+        Bitta bozor uchun COT tahlili va Sentiment Score.
+        refresh=False - faqat bazadagi hisobotlar (tarmoqsiz; strategiya baholashida).
         """
-        # Faqat kuniga bir marta yoki kesh bo'sh bo'lsa yangilash
-        now = datetime.now()
-        if self.last_analysis and self.last_fetch_time:
-            if (now - self.last_fetch_time) < timedelta(hours=12):
-                return self.last_analysis
-
-        df = self.fetch_cot_data()
-        if df is None or len(df) < 2:
+        table = self.sentiment_table(refresh=refresh)
+        if market not in table.index:
             return {"sentiment": "NEUTRAL", "score": 0, "details": "Ma'lumot kam"}
 
-        # Oxirgi va undan oldingi xabarlar
-        current = df.iloc[-1]
-        previous = df.iloc[-2]
-        
-        # 1. Net Position (Long - Short)
-        net_curr = current['m_money_positions_long_all'] - current['m_money_positions_short_all']
-        net_prev = previous['m_money_positions_long_all'] - previous['m_money_positions_short_all']
-        
-        # Net Position o'zgarishi
-        net_change_pct = 0
-        if abs(net_prev) > 0:
-            net_change_pct = (net_curr - net_prev) / abs(net_prev)
-
-        # 2. COT Index (Willco) - 52 hafta
-        lookback_df = df.tail(self.lookback_period)
-        net_positions = lookback_df['m_money_positions_long_all'] - lookback_df['m_money_positions_short_all']
-        
-        min_net = net_positions.min()
-        max_net = net_positions.max()
-        
-        cot_index = 0
-        if max_net != min_net:
-            cot_index = (net_curr - min_net) / (max_net - min_net) * 100
-
-        # 3. Signal Shartlari
-        sentiment = "NEUTRAL"
-        score = 0
-        details = []
-
-        # Trend tahlili
-        if net_change_pct > self.threshold:
-            sentiment = "BULLISH"
-            score = 1
-            details.append(f"Hedge-fondlar rekord darajada sotib olishmoqda (+{net_change_pct*100:.1f}%)")
-        elif net_change_pct < -self.threshold:
-            sentiment = "BEARISH"
-            score = -1
-            details.append(f"Hedge-fondlar sotishni boshladi ({net_change_pct*100:.1f}%)")
-
-        # Reversal (Qayrilish) punktlari
-        if cot_index > 90:
-            details.append("Bozor haddan tashqari sotib olingan (Overbought)")
-            if sentiment == "BULLISH": sentiment = "REVERSAL_BEARISH"
-        elif cot_index < 10:
-            details.append("Bozor haddan tashqari sotilgan (Oversold)")
-            if sentiment == "BEARISH": sentiment = "REVERSAL_BULLISH"
-
-        result = {
-            "sentiment": sentiment,
-            "score": score,
-            "cot_index": round(cot_index, 1),
-            "net_change": round(net_change_pct * 100, 1),
-            "long": int(current['m_money_positions_long_all']),
-            "short": int(current['m_money_positions_short_all']),
-            "details": " | ".join(details)
+        row = table.loc[market]
+        return {
+            "sentiment": row["sentiment"],
+            "score": int(row["score"]),
+            "cot_index": float(row["cot_index"]),
+            "net_change": float(row["net_change"]),
+            "zscore": float(row["zscore"]),
+            "long": int(row["long"]),
+            "short": int(row["short"]),
+            "report_date": row["report_date"].strftime("%Y-%m-%d"),
+            "details": row["details"]
         }
-        
-        self.last_analysis = result
-        self.last_fetch_time = now
-        return result
 
-    def get_summary_message(self, analysis):
+    def get_summary_message(self, analysis, market="GOLD"):
         """
         Telegram uchun COT xabari matnini tayyorlaydi.
         """
@@ -148,7 +297,7 @@ class COTAnalyzer:
         if analysis['score'] == 0: trend_text = "Neytral"
 
         msg = (
-            f"🏦 <b>SMART MONEY ALERT: GOLD</b>\n\n"
+            f"🏦 <b>SMART MONEY ALERT: {market}</b>\n\n"
             f"Trend: Hedge-fondlar pozitsiyasi <b>{analysis['net_change']:+g}%</b> o'zgardi.\n"
             f"Sentiment: <b>{trend_text} {emoji}</b>\n"
             f"COT Index: <b>{analysis['cot_index']}%</b>\n\n"
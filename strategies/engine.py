@@ -1,227 +1,295 @@
 import logging
+import time
+import pandas as pd
 from strategies.indicators import calculate_indicators
-from data.feed import DataHandler
+from data.feed import BarNotReady, DataHandler, closed_bars
 from strategies.news import NewsFilter
+from strategies.sessions import SessionCalendar
 from strategies.cot_analyzer import COTAnalyzer
+from strategies.tracing import SignalTracer
+from strategies.state_manager import TradeBook
 
 logger = logging.getLogger(__name__)
 
 class StrategyEngine:
-    def __init__(self, db, data_handler: DataHandler):
+    # Darajaga yaqinlik (Goldda $5)
+    LEVEL_TOLERANCE = 5.0
+    # Shamlar orasida narx kuzatiladigan masofa: darajadan uzoqroq bo'lsa, tick tekshiruv tarmoqqa chiqmaydi
+    ZONE_WATCH = 15.0
+
+    def __init__(self, db, data_handler: DataHandler, trades: TradeBook = None):
         self.db = db
         self.data_handler = data_handler
-        self.news_filter = NewsFilter()
+        # Bozor ochilish/yopilish jadvali (DST bilan, UTC da); bot rejalashtiruvchisi ham shundan foydalanadi
+        self.sessions = SessionCalendar()
+        # news_calendar.json + import qilingan news_events jadvali (data/calendar_import.py)
+        self.news_filter = NewsFilter(db=db, sessions=self.sessions)
         self.cot_analyzer = COTAnalyzer(db)
+        # Oxirgi to'liq baholashdagi H4 darajalari: {simbol: {"prices", "distance", "inside"}}
+        self._zones = {}
+        # Bosqichlar bo'yicha qarorlar izi va kechikishlar (/trace); enabled=False - o'lchov yo'q
+        self.tracer = SignalTracer(capacity=500)
+        # Ochiq savdolar va simvol bo'yicha cooldown (trades jadvali + xotiradagi nusxa)
+        self.trades = trades or TradeBook(db)
+        # Indikator sozlamalari: Config keshidan bir marta quriladi, set_config da darhol yangilanadi
+        self.indicator_config = self._load_indicator_config()
+        db.add_config_listener(self._on_config_change)
 
-    def check_signal(self, symbol="XAU/USD"):
-        # 0. Import needed helpers
-        from strategies.indicators import (
-            calculate_indicators, identify_levels, check_trend_ema200, 
-            detect_patterns, check_candlestick_patterns
-        )
-        from strategies.state_manager import check_cooldown, update_trade_status, open_trade
-        
+    # Engine ga ta'sir qiluvchi Config kalitlari
+    CONFIG_KEYS = ("RSI_PERIOD",)
 
-        # 1. Bozor Filtrlari (Vaqt va Yangiliklar)
-        session = self.news_filter.get_market_session()
-        # if session == "CLOSED": pass 
+    def _load_indicator_config(self):
+        return {
+            "RSI_PERIOD": self.db.get_config("RSI_PERIOD", 14, cast=int),
+            "EMA_FAST": 50,
+            "EMA_SLOW": 200
+        }
 
-        if not self.news_filter.check_news_impact():
-            logger.info("Yuqori ta'sirli yangilik aniqlandi. Savdo o'tkazib yuborildi.")
-            return None
+    def _on_config_change(self, key, value):
+        if key in self.CONFIG_KEYS:
+            self.indicator_config = self._load_indicator_config()
+            logger.info(f"Engine sozlamalari yangilandi: {key}={value}")
 
-        # 2. Ma'lumotlarni yuklash (H4 - Global Context, M15 - Entry)
-        # H4 trend va darajalar uchun
-        df_h4 = self.data_handler.fetch_data(symbol, timeframe="H4", limit=200)
-        # M15 bu paternlar va kirish uchun
-        df_m15 = self.data_handler.fetch_data(symbol, timeframe="M15", limit=200)
+    def _remember_zone(self, symbol, levels, price):
+        prices = [float(l['price']) for l in levels]
+        distance = min((abs(p - float(price)) for p in prices), default=float("inf"))
+        self._zones[symbol] = {
+            "prices": prices,
+            "distance": distance,
+            "inside": distance < self.LEVEL_TOLERANCE,
+        }
+
+    def tick_check(self, symbol="XAU/USD", deadline=None):
+        """
+        M15 shamlar yopilishi orasidagi arzon tekshiruv (indikatorlar hisoblanmaydi).
+        Narx faqat ochiq savdo bo'lsa yoki oxirgi baholashda narx darajaga yaqin bo'lsa olinadi:
+          - ochiq savdo: joriy narx bo'yicha SL/TP tekshiriladi;
+          - daraja zonasi: narx zonaga kirganini qayd etadi.
+        Returns: "ZONE" - narx hozirgina daraja zonasiga kirdi, aks holda None.
+        deadline: bot.worker.Deadline (ishchi oqimda ishlaganda muddat nazorati).
+        """
+        zone = self._zones.get(symbol)
+        trades = self.trades.open_trades(symbol)
+        watching = zone is not None and zone["distance"] < self.ZONE_WATCH
+        if not trades and not watching:
+            return None
 
-        if df_h4.empty or df_m15.empty:
+        price = self.data_handler.get_current_price(symbol)
+        if not price:
             return None
+        if deadline: deadline.check()
+
+        if trades:
+            self.trades.update_trade_status(symbol, current_high=price, current_low=price)
+
+        if zone is not None and zone["prices"]:
+            distance = min(abs(p - price) for p in zone["prices"])
+            inside = distance < self.LEVEL_TOLERANCE
+            entered = inside and not zone["inside"]
+            zone["distance"], zone["inside"] = distance, inside
+            if entered:
+                logger.info(f"{symbol}: narx {price:.2f} daraja zonasiga kirdi (masofa {distance:.2f})")
+                return "ZONE"
+        return None
+
+    # Baholash bosqichlari: har biri arzonidan qimmatiga, birinchi muvaffaqiyatsiz bosqichda to'xtaydi
+    STAGES = ("news", "cooldown", "level", "pattern", "confirmation")
+
+    def check_signal(self, symbol="XAU/USD", deadline=None, bar_open=None):
+        """
+        3-bosqichli strategiya: yangiliklar -> cooldown -> darajaga yaqinlik -> sham patterni -> tasdiq.
+        Har bir bosqich faqat o'ziga kerakli ma'lumotni (SignalContext orqali, dangasa) yuklaydi,
+        shuning uchun aksariyat sikllar bir-ikki arzon tekshiruvdan keyin tugaydi.
+        deadline: bot.worker.Deadline - muddat tugasa yoki bekor qilinsa, keyingi yuklashda to'xtaydi.
+        bar_open: baholanayotgan M15 shamning ochilish vaqti (UTC); manba uni hali bermagan bo'lsa,
+        M15 yuklanganda BarNotReady ko'tariladi (eski sham qayta baholanmaydi).
+        """
+        ctx = SignalContext(self, symbol, deadline, bar_open)
+        tracer = self.tracer
+        if tracer is None or not tracer.enabled:
+            for name in self.STAGES:
+                if not getattr(self, f"_stage_{name}")(ctx):
+                    ctx.exit_stage = name
+                    logger.debug(f"{symbol}: '{name}' bosqichida to'xtadi")
+                    return None
+            return self._build_signal(ctx)
+        return self._check_signal_traced(ctx, tracer)
+
+    def _check_signal_traced(self, ctx, tracer):
+        # check_signal bilan bir xil, lekin har bir bosqich natijasi, kirishlari va vaqti yoziladi
+        trace = tracer.begin(ctx.symbol)
+        result = "error"
+        try:
+            for name in self.STAGES:
+                ctx.inputs = {}
+                started = time.perf_counter()
+                try:
+                    passed = getattr(self, f"_stage_{name}")(ctx)
+                except Exception:
+                    tracer.stage(trace, name, "error", (time.perf_counter() - started) * 1000, ctx.inputs)
+                    raise
+                tracer.stage(trace, name, "pass" if passed else "reject",
+                             (time.perf_counter() - started) * 1000, ctx.inputs)
+                if not passed:
+                    ctx.exit_stage = name
+                    logger.debug(f"{ctx.symbol}: '{name}' bosqichida to'xtadi")
+                    result = "none"
+                    return None
+            signal = self._build_signal(ctx)
+            result = "signal"
+            return signal
+        finally:
+            tracer.end(trace, result)
 
-        # 2.1 Update Active Trade Status (Check SL/TP)
-        if not df_m15.empty:
+    # --- Bosqichlar ---
+
+    def _stage_news(self, ctx):
+        # 1. Bozor Filtrlari (Yangiliklar)
+        if not self.news_filter.check_news_impact():
+            logger.info("Yuqori ta'sirli yangilik aniqlandi. Savdo o'tkazib yuborildi.")
+            return False
+        return True
+
+    def _stage_cooldown(self, ctx):
+        # Ochiq savdo bo'lsa - oxirgi M15 sham bo'yicha SL/TP (faqat shu holatda M15 yuklanadi)
+        active = self.trades.open_trades(ctx.symbol)
+        ctx.inputs["open_trades"] = len(active)
+        if active:
+            df_m15 = ctx.m15
+            if df_m15.empty:
+                return False
             last_candle = df_m15.iloc[-1]
-            update_trade_status(current_high=last_candle['high'], current_low=last_candle['low'])
-        
-        # 0. Cooldown Check (Now valid)
-        is_cooldown, remaining = check_cooldown(hours=4)
+            self.trades.update_trade_status(ctx.symbol, current_high=last_candle['high'], current_low=last_candle['low'])
+
+        is_cooldown, remaining = self.trades.check_cooldown(ctx.symbol, hours=4)
+        ctx.inputs["cooldown_min"] = remaining if is_cooldown else 0
         if is_cooldown:
-             logger.info(f"Cooldown active: {remaining} min remaining")
-             return None
+            logger.info(f"Cooldown active: {remaining} min remaining")
+            return False
+        return True
 
-        # 3. Indikatorlarni hisoblash
-        config = {
-            "RSI_PERIOD": int(self.db.get_config("RSI_PERIOD", 14)),
-            "EMA_FAST": 50,
-            "EMA_SLOW": 200
-        }
-        
-        df_h4 = calculate_indicators(df_h4, config)
-        df_m15 = calculate_indicators(df_m15, config)
-
-        # --- 3-BOSQICH: STRATEGIYA MANTIQI ---
-
-        # 1-BOSQICH: Global Context (H4)
-        global_trend = check_trend_ema200(df_h4)
-        
-        # Support/Resistance darajalari (H4/D1 simulation on H4 data)
-        # 50 shamlik oyna bilan kuchli darajalarni topamiz
-        h4_levels = identify_levels(df_h4, window=20) 
-        
-        current_price = self.data_handler.get_current_price(symbol)
-        
-        # Filtr: Bizga darajaga yaqinlik kerak (masalan 20-30 pips = $2-$3 Goldda)
-        # UPDATE: Ko'proq signal uchun tolerance oshirildi $3 -> $5
-        LEVEL_TOLERANCE = 5.0 
-        
-        nearby_support = [l for l in h4_levels if l['type'] == 'SUPPORT' and abs(l['price'] - current_price) < LEVEL_TOLERANCE]
-        nearby_resistance = [l for l in h4_levels if l['type'] == 'RESISTANCE' and abs(l['price'] - current_price) < LEVEL_TOLERANCE]
-        
-        # Agar trend yo'q bo'lsa yoki daraja topilmasa -> o'tkazib yuborish (user talabi: "Check Level ... yaqinmi?")
-        # Lekin user "Trend EMA 200 dan past bo'lsa faqat Sell" degan.
-        
-        direction = None
-        if global_trend == "UP":
-            if not nearby_support: # Trend Up bo'lsa, Supportdan qaytishni kutamiz
-                 pass # Yoki shartni yumshatamiz
+    def _stage_level(self, ctx):
+        # 1-BOSQICH: Global Context (H4) - Support/Resistance darajalariga yaqinlik
+        from strategies.indicators import identify_levels
+
+        df_h4 = ctx.h4
+        if df_h4.empty:
+            return False
+
+        # 20 shamlik oyna bilan kuchli darajalarni topamiz (faqat high/low kerak - indikatorlarsiz)
+        h4_levels = identify_levels(df_h4, window=20)
+        current_price = ctx.price
+        if not current_price:
+            return False
+
+        tolerance = self.LEVEL_TOLERANCE
+        nearby_support = [l for l in h4_levels if l['type'] == 'SUPPORT' and abs(l['price'] - current_price) < tolerance]
+        nearby_resistance = [l for l in h4_levels if l['type'] == 'RESISTANCE' and abs(l['price'] - current_price) < tolerance]
+        # Shamlar orasidagi tick tekshiruv uchun
+        self._remember_zone(ctx.symbol, h4_levels, current_price)
+        ctx.inputs.update(price=round(float(current_price), 2), levels=len(h4_levels),
+                          distance=round(self._zones[ctx.symbol]["distance"], 2),
+                          support=len(nearby_support), resistance=len(nearby_resistance))
+
+        if not nearby_support and not nearby_resistance:
+            return False # Daraja yo'q
+
+        # Trend faqat ikkala tomonda ham daraja bo'lsa hal qiluvchi:
+        # UP - Supportdan qaytish (BUY), DOWN - Resistancedan (SELL), aks holda reversal
+        if nearby_support and nearby_resistance:
+            ctx.direction = "SELL" if ctx.trend == "DOWN" else "BUY"
+        else:
+            ctx.direction = "BUY" if nearby_support else "SELL"
+        ctx.inputs["direction"] = ctx.direction
+        return True
+
+    def _stage_pattern(self, ctx):
+        # 2-BOSQICH: Sham patterni (M15) - faqat OHLC kerak, indikatorlarsiz
+        from strategies.indicators import check_candlestick_patterns
+
+        df_m15 = ctx.m15
+        if len(df_m15) < 3:
+            return False
+
+        ctx.candlesticks = check_candlestick_patterns(df_m15.iloc[-1], df_m15.iloc[-2], df_m15.iloc[-3])
+        ctx.inputs.update(direction=ctx.direction, candles=list(ctx.candlesticks))
+        wanted = BUY_CANDLES if ctx.direction == "BUY" else SELL_CANDLES
+        # OPTIMIZATION UPDATE: Pattern alone gives low quality trades. We REQUIRE candle signal.
+        return any(p in ctx.candlesticks for p in wanted)
+
+    def _stage_confirmation(self, ctx):
+        # 3-BOSQICH: Tasdiq (M15 RSI/MACD + H4/H1 sham ranglari)
+        df_m15 = ctx.m15_indicators
+        last_m15, prev_m15 = df_m15.iloc[-1], df_m15.iloc[-2]
+        rsi = last_m15.get(ctx.rsi_column, 50)
+        macd_hist = last_m15.get("MACDh_12_26_9", 0)
+        prev_macd_hist = prev_m15.get("MACDh_12_26_9", 0)
+        ctx.inputs.update(rsi=round(float(rsi), 1), macd=round(float(macd_hist), 3),
+                          prev_macd=round(float(prev_macd_hist), 3))
+
+        if ctx.direction == "BUY":
+            # RSI: Tepada sotib olmaslik kerak (RSI < 70); Momentum UP: Hist > Prev_Hist yoki Hist > 0
+            if not rsi < 70:
+                return False
+            if not (macd_hist > prev_macd_hist or macd_hist > 0):
+                return False
+        else:
+            # RSI: Pastda sotmaslik kerak (RSI > 30); Momentum DOWN: Hist < Prev_Hist yoki Hist < 0
+            if not rsi > 30:
+                return False
+            if not (macd_hist < prev_macd_hist or macd_hist < 0):
+                return False
+
+        # Multi-Timeframe Candle Confirmation (H4 + H1) - 78% WR
+        df_h1 = ctx.h1
+        if not df_h1.empty:
+            h1_last = df_h1.iloc[-1]
+            last_h4 = ctx.h4.iloc[-1]
+            ctx.inputs.update(h1_bull=bool(h1_last['close'] > h1_last['open']),
+                              h4_bull=bool(last_h4['close'] > last_h4['open']))
+            if ctx.direction == "BUY":
+                candles_ok = h1_last['close'] > h1_last['open'] and last_h4['close'] > last_h4['open']
             else:
-                 direction = "BUY"
-        elif global_trend == "DOWN":
-             if not nearby_resistance:
-                 pass
-             else:
-                 direction = "SELL"
-                 
-        # Agar Trend Neutral bo'lsa yoki darajaga yaqin bo'lmasa, "Pattern" bosqichiga o'tmaymiz...
-        # Lekin ehtimol trend o'zgarishi ham mumkin (Reversal).
-        # User flowchart: Check Trend -> Check Level -> Check Pattern
-        
-        if not direction:
-            # Simple fallback: Agar biz kuchli darajaga keldik-u, lekin trend hali o'zgarmagan bo'lsa (Reversal uchun)
-            if nearby_support: direction = "BUY" # Potential Reversal Buy
-            elif nearby_resistance: direction = "SELL" # Potential Reversal Sell
-            else: return None # Daraja yo'q
-            
-        # 2-BOSQICH: Pattern Recognition (M15)
-        # Bu yerda M15 da shakllarni qidiramiz
-        patterns = detect_patterns(df_m15)
-        
-        valid_pattern = False
+                candles_ok = h1_last['close'] < h1_last['open'] and last_h4['close'] < last_h4['open']
+            if not candles_ok:
+                return False # Veto if candles mismatch
+
+        ctx.confirmation_reason = f"Candle: {ctx.candlesticks} | RSI: {rsi:.1f} | MACD: OK"
+        return True
+
+    # --- EXECUTION ---
+
+    def _build_signal(self, ctx):
+        from strategies.indicators import detect_patterns
+
+        signal = ctx.direction
+        last_m15 = ctx.m15_indicators.iloc[-1]
+
+        # Double Bottom/Top signal uchun shart emas - faqat sabab matni uchun
+        patterns = detect_patterns(ctx.m15_indicators)
         pattern_name = ""
-        
-        if direction == "BUY":
-            if "DOUBLE_BOTTOM" in patterns:
-                valid_pattern = True
-                pattern_name = "Double Bottom"
-                
-        if direction == "SELL":
-            if "DOUBLE_TOP" in patterns:
-                valid_pattern = True
-                pattern_name = "Double Top"
-                
-        # UPDATE: Ko'proq signal uchun "Pattern SHART EMAS", agar qat'iy sham tasdi (Stage 3) bo'lsa.
-        # Biz valid_pattern ni saqlab qolamiz, lekin return qilmaymiz.
-
-        # 3-BOSQICH: Kirish va Tasdiq (M15)
-        # Sham tahlili va RSI
-        last_m15 = df_m15.iloc[-1]
-        prev_m15 = df_m15.iloc[-2]
-        prev_2_m15 = df_m15.iloc[-3]
-        
-        candlesticks = check_candlestick_patterns(last_m15, prev_m15, prev_2_m15)
-        
-        confirmed = False
-        confirmation_reason = ""
-        
-        rsi = last_m15["RSI_14"]
-        
-        if direction == "BUY":
-            # Hammer, Bullish Engulfing yoki Morning Star
-            has_candle_signal = any(p in candlesticks for p in ["HAMMER", "BULLISH_ENGULFING", "MORNING_STAR"])
-            
-            # --- YANGI FILTRLAR (Win Rate 75% uchun) ---
-            # 1. RSI: Tepada sotib olmaslik kerak (RSI < 70)
-            rsi_ok = rsi < 70
-            
-            # 2. MACD Momentum: Gistogramma o'sayotgan bo'lishi kerak
-            # Indikatorlar dataframe da 'MACDh_12_26_9' (Hist) borligini tekshiramiz
-            macd_hist = last_m15.get("MACDh_12_26_9", 0)
-            prev_macd_hist = prev_m15.get("MACDh_12_26_9", 0)
-            
-            # Momentum UP: Hist > Prev_Hist (Kuchaymoqda) Yoki Hist > 0 (Trend o'zgarishi)
-            momentum_ok = macd_hist > prev_macd_hist or macd_hist > 0
-            
-            # 3. Multi-Timeframe Candle Confirmation (H4 + H1) - 78% WR
-            df_h1 = self.data.fetch_data(symbol, "H1", limit=50)
-            if not df_h1.empty:
-                 h1_last = df_h1.iloc[-1]
-                 is_h1_bullish = h1_last['close'] > h1_last['open']
-                 is_h4_bullish = last_h4['close'] > last_h4['open']
-                 
-                 if not (is_h1_bullish and is_h4_bullish):
-                     momentum_ok = False # Veto if candles mismatch
-
-            # OPTIMIZATION UPDATE: Pattern alone gives low quality trades. We REQUIRE candle signal.
-            if has_candle_signal:
-                if rsi_ok and momentum_ok:
-                    confirmed = True
-                    p_text = f"Pattern: {pattern_name}" if valid_pattern else "No Pattern"
-                    c_text = f"Candle: {candlesticks}" 
-                    confirmation_reason = f"{p_text} | {c_text} | RSI: {rsi:.1f} | MACD: OK"
-            
-
-        if direction == "SELL":
-             # Shooting Star, Bearish Engulfing yoki Evening Star
-            has_candle_signal = any(p in candlesticks for p in ["SHOOTING_STAR", "BEARISH_ENGULFING", "EVENING_STAR"])
-
-            # --- YANGI FILTRLAR ---
-            # 1. RSI: Pastda sotmaslik kerak (RSI > 30)
-            rsi_ok = rsi > 30
-            
-            # 2. Momentum DOWN: Hist < Prev_Hist (Pasaymoqda) Yoki Hist < 0
-            macd_hist = last_m15.get("MACDh_12_26_9", 0)
-            prev_macd_hist = prev_m15.get("MACDh_12_26_9", 0)
-            
-            momentum_ok = macd_hist < prev_macd_hist or macd_hist < 0
-
-            # 3. Multi-Timeframe Candle Confirmation (H4 + H1) - 78% WR
-            df_h1 = self.data.fetch_data(symbol, "H1", limit=50)
-            if not df_h1.empty:
-                 h1_last = df_h1.iloc[-1]
-                 is_h1_bearish = h1_last['close'] < h1_last['open']
-                 is_h4_bearish = last_h4['close'] < last_h4['open']
-                 
-                 if not (is_h1_bearish and is_h4_bearish):
-                     momentum_ok = False # Veto if candles mismatch
-
-            if has_candle_signal:
-                if rsi_ok and momentum_ok:
-                    confirmed = True
-                    p_text = f"Pattern: {pattern_name}" if valid_pattern else "No Pattern"
-                    c_text = f"Candle: {candlesticks}" 
-                    confirmation_reason = f"{p_text} | {c_text} | RSI: {rsi:.1f} | MACD: OK"
-                
-        if not confirmed:
-            return None
-            
-        # --- EXECUTION ---
-        
-        signal = direction
+        if signal == "BUY" and "DOUBLE_BOTTOM" in patterns:
+            pattern_name = "Double Bottom"
+        elif signal == "SELL" and "DOUBLE_TOP" in patterns:
+            pattern_name = "Double Top"
+        p_text = f"Pattern: {pattern_name}" if pattern_name else "No Pattern"
+
         entry_price = last_m15["close"]
         atr = last_m15.get("ATRr_14", entry_price * 0.002) * 1.5
-        
+
         sl = entry_price - atr if signal == "BUY" else entry_price + atr
         tp = entry_price + (atr * 2) if signal == "BUY" else entry_price - (atr * 2)
-        
+
         score = 3
-        reason = f"3-Stage System: Trend {global_trend} | Level Reached | Pattern {pattern_name} | {confirmation_reason}"
-        
+        # COT tahlili bazadagi hisobotlardan (tarmoqsiz; yangilash - bot rejalashtiruvchisida)
+        cot = self.cot_analyzer.analyze(refresh=False)
+        reason = f"3-Stage System: Trend {ctx.trend} | Level Reached | Pattern {pattern_name} | {p_text} | {ctx.confirmation_reason}"
+
         # Record Trade for Cooldown Logic
-        open_trade(symbol, signal, float(entry_price), float(sl), float(tp))
-        
+        self.trades.open_trade(ctx.symbol, signal, float(entry_price), float(sl), float(tp))
+
         return {
-            "symbol": symbol,
+            "symbol": ctx.symbol,
             "type": signal,
             "price": entry_price,
             "sl": sl,
@@ -229,5 +297,86 @@ class StrategyEngine:
             "reason": reason,
             "time": last_m15.name,
             "score": score,
-            "cot_info": None
+            "cot_info": cot if "cot_index" in cot else None
         }
+
+
+BUY_CANDLES = ("HAMMER", "BULLISH_ENGULFING", "MORNING_STAR")
+SELL_CANDLES = ("SHOOTING_STAR", "BEARISH_ENGULFING", "EVENING_STAR")
+
+
+class SignalContext:
+    """
+    Bitta baholash sikli uchun ma'lumotlar: har bir manba (H4, M15, H1, narx, indikatorlar)
+    birinchi so'ralganda yuklanadi va sikl davomida qayta ishlatiladi.
+    """
+    def __init__(self, engine, symbol, deadline=None, bar_open=None):
+        self.engine = engine
+        self.symbol = symbol
+        self.deadline = deadline
+        self.bar_open = bar_open
+        self._cache = {}
+        self.direction = None
+        self.candlesticks = []
+        self.confirmation_reason = ""
+        self.exit_stage = None
+        # Joriy bosqichning qisqa kirish ma'lumotlari (SignalTracer uchun)
+        self.inputs = {}
+
+    def _get(self, key, loader):
+        if key not in self._cache:
+            if self.deadline: self.deadline.check()
+            self._cache[key] = loader()
+        return self._cache[key]
+
+    @property
+    def indicator_config(self):
+        # Sikl davomida bitta sozlama nusxasi (set_config baholash o'rtasida chaqirilsa ham)
+        return self._get("config", lambda: self.engine.indicator_config)
+
+    @property
+    def rsi_column(self):
+        return f"RSI_{self.indicator_config['RSI_PERIOD']}"
+
+    @property
+    def h4(self):
+        return self._get("h4", lambda: self.engine.data_handler.fetch_data(self.symbol, timeframe="H4", limit=200))
+
+    @property
+    def h1(self):
+        return self._get("h1", lambda: self.engine.data_handler.fetch_data(self.symbol, timeframe="H1", limit=50))
+
+    @property
+    def m15(self):
+        # Faqat yopilgan shamlar (baholash M15 sham yopilishida ishga tushadi)
+        return self._get("m15", self._load_m15)
+
+    def _load_m15(self):
+        df = closed_bars(self.engine.data_handler.fetch_data(self.symbol, timeframe="M15", limit=200), "M15")
+        if self.bar_open is None:
+            return df
+        # Manba kechiksa, oxirgi yopilgan sham avvalgisi bo'ladi - uni yangi sham deb baholamaymiz
+        expected = pd.Timestamp(self.bar_open)
+        last_open = pd.Timestamp(df.index[-1]) if not df.empty else None
+        if last_open is not None and last_open.tzinfo is None:
+            last_open = last_open.tz_localize("UTC")
+        if last_open is None or last_open < expected:
+            raise BarNotReady(f"{self.symbol}: {expected:%H:%M} M15 shami manbada hali yo'q (oxirgisi: {last_open})")
+        return df
+
+    @property
+    def price(self):
+        return self._get("price", lambda: self.engine.data_handler.get_current_price(self.symbol))
+
+    @property
+    def h4_indicators(self):
+        return self._get("h4_ind", lambda: calculate_indicators(self.h4.copy(), self.indicator_config))
+
+    @property
+    def m15_indicators(self):
+        return self._get("m15_ind", lambda: calculate_indicators(self.m15.copy(), self.indicator_config))
+
+    @property
+    def trend(self):
+        from strategies.indicators import check_trend_ema200
+        return self._get("trend", lambda: check_trend_ema200(self.h4_indicators))
@@ -0,0 +1,192 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from strategies.indicators import calculate_rsi
+from strategies.intrabar import utc_ns
+
+logger = logging.getLogger(__name__)
+
+LEVEL_LOOKBACK = 100  # identify_levels(h4_subset.tail(100), ...)
+
+
+def pivot_masks(high: np.ndarray, low: np.ndarray, window: int):
+    """
+    identify_levels dagi fractal shartining vektor ko'rinishi:
+    high[m] qo'shni `window` ta shamning har biridan qat'iy katta (RESISTANCE),
+    low[m] esa qat'iy kichik (SUPPORT). Chetdagi shamlar pivot emas.
+    """
+    n = len(high)
+    is_high = np.zeros(n, dtype=bool)
+    is_low = np.zeros(n, dtype=bool)
+    if n < 2 * window + 1:
+        return is_high, is_low
+
+    win_h = sliding_window_view(high, 2 * window + 1)
+    win_l = sliding_window_view(low, 2 * window + 1)
+    center_h = win_h[:, window:window + 1]
+    center_l = win_l[:, window:window + 1]
+    neighbours = np.r_[0:window, window + 1:2 * window + 1]
+    is_high[window:n - window] = (center_h > win_h[:, neighbours]).all(axis=1)
+    is_low[window:n - window] = (center_l < win_l[:, neighbours]).all(axis=1)
+    return is_high, is_low
+
+
+def candle_pattern_bits(o, h, l, c):
+    """
+    check_candlestick_patterns(row, prev_row, prev_row_2) ning vektor ko'rinishi.
+    Returns: {"HAMMER": mask, "SHOOTING_STAR": ..., "BULLISH_ENGULFING": ..., ...}
+    (birinchi ikki sham uchun oldingi shamlar yo'q - engulfing/star False).
+    """
+    n = len(c)
+    body = np.abs(c - o)
+    total = h - l
+    lower_wick = np.minimum(c, o) - l
+    upper_wick = h - np.maximum(c, o)
+    has_range = total != 0
+
+    green = c > o
+    red = c < o
+
+    def shift(a, k, fill):
+        out = np.full(n, fill, dtype=a.dtype)
+        out[k:] = a[:n - k]
+        return out
+
+    o1, c1 = shift(o, 1, np.nan), shift(c, 1, np.nan)
+    o2, c2 = shift(o, 2, np.nan), shift(c, 2, np.nan)
+    green1, red1 = shift(green, 1, False), shift(red, 1, False)
+    green2, red2 = shift(green, 2, False), shift(red, 2, False)
+
+    body1 = np.abs(c1 - o1)
+    body2 = np.abs(c2 - o2)
+    small1 = body1 < body2 * 0.4
+
+    bits = {
+        "HAMMER": (lower_wick > body * 2) & (upper_wick < body),
+        "SHOOTING_STAR": (upper_wick > body * 2) & (lower_wick < body),
+        "BULLISH_ENGULFING": red1 & green & (c > o1) & (o < c1),
+        "BEARISH_ENGULFING": green1 & red & (c < o1) & (o > c1),
+        "MORNING_STAR": red2 & small1 & green & (c > o2 - body2 / 2),
+        "EVENING_STAR": green2 & small1 & red & (c < o2 + body2 / 2),
+    }
+    # total_size == 0 bo'lsa hech qanday pattern qaytarilmaydi
+    return {name: mask & has_range for name, mask in bits.items()}
+
+
+class FeatureStore:
+    """
+    Optimizatsiya ssenariylari uchun parametrga bog'liq bo'lmagan M15 belgilari (features).
+
+    Har bir dataset uchun bir marta hisoblanadi: H4/H1 ning mos shamlari, trend, sham ranglari,
+    shamcha patternlari, MACD momentumi. Parametrga bog'liq qismlar (level window, RSI davri)
+    birinchi so'rovda hisoblanib keshda saqlanadi. Ssenariy faqat arzon shartlarni qo'llaydi.
+    """
+    def __init__(self, df_h4: pd.DataFrame, df_h1: pd.DataFrame, df_m15: pd.DataFrame):
+        self.n = len(df_m15)
+        self.close = df_m15['close'].to_numpy(dtype=np.float64)
+        o = df_m15['open'].to_numpy(dtype=np.float64)
+        h = df_m15['high'].to_numpy(dtype=np.float64)
+        l = df_m15['low'].to_numpy(dtype=np.float64)
+
+        # M15 shamiga mos oxirgi H4/H1 sham (index <= current_time), -1 - yo'q
+        m15_ns = utc_ns(df_m15.index)
+        self.h4_pos = np.searchsorted(utc_ns(df_h4.index), m15_ns, side="right") - 1
+        self.h1_pos = np.searchsorted(utc_ns(df_h1.index), m15_ns, side="right") - 1
+        self.aligned = (self.h4_pos >= 0) & (self.h1_pos >= 0)
+        h4_at = np.maximum(self.h4_pos, 0)
+        h1_at = np.maximum(self.h1_pos, 0)
+
+        self.h4_high = df_h4['high'].to_numpy(dtype=np.float64)
+        self.h4_low = df_h4['low'].to_numpy(dtype=np.float64)
+        h4_open = df_h4['open'].to_numpy(dtype=np.float64)[h4_at]
+        h4_close = df_h4['close'].to_numpy(dtype=np.float64)[h4_at]
+        h1_open = df_h1['open'].to_numpy(dtype=np.float64)[h1_at]
+        h1_close = df_h1['close'].to_numpy(dtype=np.float64)[h1_at]
+
+        # Global trend: H4 close > EMA 200 (EMA ustuni bo'lmasa - ssenariy ishlamaydi)
+        self.has_ema = "EMA_200" in df_h4
+        ema_200 = df_h4['EMA_200'].to_numpy(dtype=np.float64)[h4_at] if self.has_ema else np.full(self.n, np.nan)
+        self.trend_up = h4_close > ema_200
+
+        self.h4_bull, self.h4_bear = h4_close > h4_open, h4_close < h4_open
+        self.h1_bull, self.h1_bear = h1_close > h1_open, h1_close < h1_open
+
+        bits = candle_pattern_bits(o, h, l, self.close)
+        self.buy_candle = bits["HAMMER"] | bits["BULLISH_ENGULFING"] | bits["MORNING_STAR"]
+        self.sell_candle = bits["SHOOTING_STAR"] | bits["BEARISH_ENGULFING"] | bits["EVENING_STAR"]
+
+        if "MACDh_12_26_9" in df_m15:
+            macd_h = df_m15['MACDh_12_26_9'].to_numpy(dtype=np.float64)
+        else:
+            macd_h = np.zeros(self.n)
+        prev_h = np.r_[np.nan, macd_h[:-1]]
+        self.momentum_up = (macd_h > prev_h) | (macd_h > 0)
+        self.momentum_down = (macd_h < prev_h) | (macd_h < 0)
+
+        if "ATRr_14" in df_m15:
+            self.atr = df_m15['ATRr_14'].to_numpy(dtype=np.float64) * 1.5
+        else:
+            self.atr = self.close * 0.002 * 1.5
+
+        self._m15 = df_m15
+        self._levels = {}
+        self._rsi = {}
+
+    def level_distances(self, window: int):
+        """
+        Har bir M15 sham uchun eng yaqin H4 SUPPORT / RESISTANCE darajasigacha masofa
+        (oxirgi 100 ta H4 shamdagi fractal darajalar, identify_levels bilan bir xil). Daraja yo'q - inf.
+        """
+        if window in self._levels:
+            return self._levels[window]
+
+        width = LEVEL_LOOKBACK - 2 * window
+        dist_sup = np.full(self.n, np.inf)
+        dist_res = np.full(self.n, np.inf)
+        if width > 0:
+            is_high, is_low = pivot_masks(self.h4_high, self.h4_low, window)
+            k = len(self.h4_high)
+            # Har bir H4 pozitsiyasi uchun darajalar matritsasi: [k-99+w, k-w] oralig'idagi pivotlar
+            m = np.arange(k)[:, None] - (LEVEL_LOOKBACK - 1) + window + np.arange(width)[None, :]
+            valid = m >= window
+            m_safe = np.clip(m, 0, k - 1)
+            sup_levels = np.where(valid & is_low[m_safe], self.h4_low[m_safe], np.nan)
+            res_levels = np.where(valid & is_high[m_safe], self.h4_high[m_safe], np.nan)
+
+            rows = np.flatnonzero(self.aligned)
+            for chunk in np.array_split(rows, max(1, len(rows) // 20000 + 1)):
+                if len(chunk) == 0:
+                    continue
+                price = self.close[chunk, None]
+                pos = self.h4_pos[chunk]
+                with np.errstate(invalid="ignore"):
+                    d_sup = np.abs(sup_levels[pos] - price)
+                    d_res = np.abs(res_levels[pos] - price)
+                dist_sup[chunk] = np.min(np.where(np.isnan(d_sup), np.inf, d_sup), axis=1)
+                dist_res[chunk] = np.min(np.where(np.isnan(d_res), np.inf, d_res), axis=1)
+
+        self._levels[window] = (dist_sup, dist_res)
+        return self._levels[window]
+
+    def rsi(self, period: int) -> np.ndarray:
+        """RSI_<period> qiymatlari (ustun bo'lmasa hisoblanadi)."""
+        period = int(period)
+        if period not in self._rsi:
+            col = f"RSI_{period}"
+            if col in self._m15:
+                values = self._m15[col].to_numpy(dtype=np.float64)
+            else:
+                values = calculate_rsi(self._m15['close'], period).to_numpy(dtype=np.float64)
+            self._rsi[period] = values
+        return self._rsi[period]
+
+    def prepare(self, windows=(), rsi_periods=()):
+        """Parametrga bog'liq belgilarni oldindan hisoblash (masalan, ishchi jarayonlarga yuborishdan oldin)."""
+        for w in windows:
+            self.level_distances(int(w))
+        for p in rsi_periods:
+            self.rsi(p)
+        return self
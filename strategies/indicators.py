@@ -23,16 +23,7 @@ def calculate_indicators(df: pd.DataFrame, config: dict = None) -> pd.DataFrame:
 
     # --- RSI ---
     rsi_len = int(config.get("RSI_PERIOD", 14))
-    
-    # RSI uchun Wilder smoothing uslubi (TA-Lib kutubxonasiga eng yaqin va aniq usul)
-    delta = close.diff()
-    gain = delta.clip(lower=0)
-    loss = -1 * delta.clip(upper=0)
-    avg_gain = gain.ewm(alpha=1/rsi_len, adjust=False).mean()
-    avg_loss = loss.ewm(alpha=1/rsi_len, adjust=False).mean()
-    
-    rs = avg_gain / avg_loss
-    df[f"RSI_{rsi_len}"] = 100 - (100 / (1 + rs))
+    df[f"RSI_{rsi_len}"] = calculate_rsi(close, rsi_len)
 
     # --- MACD ---
     macd_fast = int(config.get("MACD_FAST", 12))
@@ -73,6 +64,19 @@ def calculate_indicators(df: pd.DataFrame, config: dict = None) -> pd.DataFrame:
 
     return df
 
+def calculate_rsi(close: pd.Series, period: int = 14) -> pd.Series:
+    """
+    RSI uchun Wilder smoothing uslubi (TA-Lib kutubxonasiga eng yaqin va aniq usul).
+    """
+    delta = close.diff()
+    gain = delta.clip(lower=0)
+    loss = -1 * delta.clip(upper=0)
+    avg_gain = gain.ewm(alpha=1/period, adjust=False).mean()
+    avg_loss = loss.ewm(alpha=1/period, adjust=False).mean()
+    
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
 def identify_levels(df: pd.DataFrame, window=10) -> list:
     """
     Support va Resistance darajalarini aniqlaydi (Fractals / Swing High-Low).
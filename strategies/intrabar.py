@@ -0,0 +1,165 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# Natija kodlari
+OUTCOME_BE = 0      # Keyingi sham yo'q (ma'lumot oxiri)
+OUTCOME_WIN = 1
+OUTCOME_LOSS = 2
+OUTCOME_CLOSE = 3   # Vaqt tugadi, oxirgi close da yopildi
+OUTCOME_NAMES = np.array(["BE", "WIN", "LOSS", "CLOSE"])
+
+
+def utc_ns(index) -> np.ndarray:
+    """DatetimeIndex ni UTC int64 nanosekundlarga o'tkazadi."""
+    idx = pd.DatetimeIndex(index)
+    if idx.tz is not None:
+        idx = idx.tz_convert("UTC").tz_localize(None)
+    return idx.values.astype("datetime64[ns]").astype(np.int64)
+
+
+class IntrabarResolver:
+    """
+    Bitta M15 sham ichida ham SL, ham TP tegib ketgan holatlarda (ambiguous bar)
+    qaysi daraja birinchi urilganini M1 ma'lumotlari orqali aniqlaydi.
+
+    M15 sham -> M1 bo'lagi (start, end) indeksi bir marta searchsorted bilan quriladi.
+    So'rovlar paket (batch) ko'rinishida bajariladi, shuning uchun narx faqat
+    noaniq shamlar soniga bog'liq, umumiy shamlar soniga emas.
+    """
+    def __init__(self, m15_index, df_m1: pd.DataFrame, bar_minutes: int = 15):
+        self.m1_high = df_m1['high'].to_numpy(dtype=np.float64)
+        self.m1_low = df_m1['low'].to_numpy(dtype=np.float64)
+
+        m15_ns = utc_ns(m15_index)
+        m1_ns = utc_ns(df_m1.index)
+        bar_ns = np.int64(bar_minutes * 60 * 1_000_000_000)
+
+        # M15 shamning ochilish vaqtidan [t, t + 15min) oralig'idagi M1 shamlar
+        self.starts = np.searchsorted(m1_ns, m15_ns, side="left")
+        self.ends = np.searchsorted(m1_ns, m15_ns + bar_ns, side="left")
+
+    def coverage(self) -> int:
+        """M1 ma'lumoti mavjud bo'lgan M15 shamlar soni."""
+        return int(np.count_nonzero(self.ends > self.starts))
+
+    def resolve(self, bar_pos, is_buy, sl, tp) -> np.ndarray:
+        """
+        Har bir so'rov uchun: True - TP birinchi urilgan, False - SL birinchi
+        (yoki M1 ma'lumoti yo'q / bitta M1 sham ichida yana noaniq - konservativ SL).
+        """
+        bar_pos = np.asarray(bar_pos, dtype=np.int64)
+        tp_first = np.zeros(len(bar_pos), dtype=bool)
+        if len(bar_pos) == 0:
+            return tp_first
+
+        starts = self.starts[bar_pos]
+        lengths = self.ends[bar_pos] - starts
+        has_data = lengths > 0
+        if not has_data.any():
+            return tp_first
+
+        q = np.flatnonzero(has_data)
+        starts, lengths = starts[q], lengths[q]
+        is_buy = np.asarray(is_buy, dtype=bool)[q]
+        sl = np.asarray(sl, dtype=np.float64)[q]
+        tp = np.asarray(tp, dtype=np.float64)[q]
+
+        # Barcha bo'laklarni bitta tekis massivga yoyish
+        seg_offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        local = np.arange(lengths.sum()) - np.repeat(seg_offsets, lengths)
+        flat = np.repeat(starts, lengths) + local
+
+        buy_f = np.repeat(is_buy, lengths)
+        sl_f = np.repeat(sl, lengths)
+        tp_f = np.repeat(tp, lengths)
+        high = self.m1_high[flat]
+        low = self.m1_low[flat]
+
+        sl_hit = np.where(buy_f, low <= sl_f, high >= sl_f)
+        tp_hit = np.where(buy_f, high >= tp_f, low <= tp_f)
+
+        never = np.iinfo(np.int64).max
+        first_sl = np.minimum.reduceat(np.where(sl_hit, local, never), seg_offsets)
+        first_tp = np.minimum.reduceat(np.where(tp_hit, local, never), seg_offsets)
+
+        tp_first[q] = first_tp < first_sl
+        return tp_first
+
+
+def resolve_exits(df_m15: pd.DataFrame, entry_pos, is_buy, entry_price, sl, tp, horizon: int, resolver: IntrabarResolver = None) -> dict:
+    """
+    Bir nechta savdoning chiqish natijasini vektorlashtirilgan holda aniqlaydi.
+
+    Har bir savdo uchun keyingi `horizon` ta M15 sham ko'riladi (iloc[i+1:i+1+horizon]):
+    SL yoki TP birinchi tekkan sham - natija. Agar bitta shamda ikkalasi ham tegsa,
+    `resolver` berilgan bo'lsa M1 ga tushib aniqlanadi, aks holda SL (konservativ).
+    Hech biri tegmasa - oxirgi sham close narxida yopiladi (CLOSE).
+
+    Returns: {"outcome": kodlar, "exit_pos": indekslar, "pnl": narx farqi, "ambiguous": mask}
+    """
+    entry_pos = np.asarray(entry_pos, dtype=np.int64)
+    is_buy = np.asarray(is_buy, dtype=bool)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    sl = np.asarray(sl, dtype=np.float64)
+    tp = np.asarray(tp, dtype=np.float64)
+    k = len(entry_pos)
+
+    outcome = np.full(k, OUTCOME_BE, dtype=np.int8)
+    exit_pos = entry_pos.copy()
+    pnl = np.zeros(k, dtype=np.float64)
+    ambiguous = np.zeros(k, dtype=bool)
+    if k == 0:
+        return {"outcome": outcome, "exit_pos": exit_pos, "pnl": pnl, "ambiguous": ambiguous}
+
+    high = df_m15['high'].to_numpy(dtype=np.float64)
+    low = df_m15['low'].to_numpy(dtype=np.float64)
+    close = df_m15['close'].to_numpy(dtype=np.float64)
+    n = len(close)
+
+    # Ma'lumot oxiridagi savdolar uchun NaN bilan to'ldirish (taqqoslash False beradi)
+    pad = np.full(horizon, np.nan)
+    high_w = sliding_window_view(np.concatenate((high, pad)), horizon)[entry_pos + 1]
+    low_w = sliding_window_view(np.concatenate((low, pad)), horizon)[entry_pos + 1]
+
+    buy_col = is_buy[:, None]
+    sl_hit = np.where(buy_col, low_w <= sl[:, None], high_w >= sl[:, None])
+    tp_hit = np.where(buy_col, high_w >= tp[:, None], low_w <= tp[:, None])
+
+    any_sl = sl_hit.any(axis=1)
+    any_tp = tp_hit.any(axis=1)
+    first_sl = np.where(any_sl, sl_hit.argmax(axis=1), horizon)
+    first_tp = np.where(any_tp, tp_hit.argmax(axis=1), horizon)
+
+    is_loss = any_sl & (first_sl <= first_tp)
+    is_win = any_tp & (first_tp < first_sl)
+    ambiguous = any_sl & (first_sl == first_tp)
+
+    if resolver is not None and ambiguous.any():
+        amb = np.flatnonzero(ambiguous)
+        tp_first = resolver.resolve(entry_pos[amb] + 1 + first_sl[amb], is_buy[amb], sl[amb], tp[amb])
+        is_win[amb[tp_first]] = True
+        is_loss[amb[tp_first]] = False
+
+    sign = np.where(is_buy, 1.0, -1.0)
+
+    outcome[is_loss] = OUTCOME_LOSS
+    exit_pos[is_loss] = entry_pos[is_loss] + 1 + first_sl[is_loss]
+    pnl[is_loss] = (sl[is_loss] - entry_price[is_loss]) * sign[is_loss]
+
+    outcome[is_win] = OUTCOME_WIN
+    exit_pos[is_win] = entry_pos[is_win] + 1 + first_tp[is_win]
+    pnl[is_win] = (tp[is_win] - entry_price[is_win]) * sign[is_win]
+
+    # Vaqt tugadi: oxirgi mavjud shamning close narxi
+    timed_out = ~(is_loss | is_win) & (entry_pos + 1 < n)
+    last = np.minimum(entry_pos + horizon, n - 1)
+    outcome[timed_out] = OUTCOME_CLOSE
+    exit_pos[timed_out] = last[timed_out]
+    pnl[timed_out] = (close[last[timed_out]] - entry_price[timed_out]) * sign[timed_out]
+
+    return {"outcome": outcome, "exit_pos": exit_pos, "pnl": pnl, "ambiguous": ambiguous}
@@ -0,0 +1,120 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bitta paketdagi maksimal katakchalar (trials x trades) - xotirani cheklash uchun
+MAX_CELLS = 4_000_000
+
+
+def sample_paths(pnl, trials: int, method: str = "bootstrap", rng=None) -> np.ndarray:
+    """
+    Savdolar ketma-ketligining tasodifiy variantlari: (trials x trades) massiv.
+
+    bootstrap - savdolar qaytarib tanlanadi (natijalar taqsimoti ham o'zgaradi);
+    shuffle   - faqat tartib almashtiriladi (yakuniy PnL bir xil, drawdown/seriyalar o'zgaradi).
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    rng = rng if rng is not None else np.random.default_rng()
+    n = len(pnl)
+    if method == "bootstrap":
+        return pnl[rng.integers(0, n, size=(trials, n))]
+    if method == "shuffle":
+        return rng.permuted(np.broadcast_to(pnl, (trials, n)), axis=1)
+    raise ValueError(f"Noma'lum usul: {method}")
+
+
+def path_drawdowns(paths: np.ndarray, initial_balance: float = 1000.0):
+    """
+    Har bir qator uchun eng katta pasayish (absolyut va cho'qqiga nisbatan %).
+    Boshlang'ich balans ham cho'qqi hisoblanadi (performance.compute_metrics bilan bir xil).
+    """
+    equity = initial_balance + np.cumsum(paths, axis=1)
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=1), initial_balance)
+    drawdowns = peaks - equity
+    pos = np.argmax(drawdowns, axis=1)
+    rows = np.arange(len(paths))
+    dd = np.maximum(drawdowns[rows, pos], 0.0)
+    peak_at = peaks[rows, pos]
+    dd_pct = np.divide(dd * 100, peak_at, out=np.zeros_like(dd), where=peak_at > 0)
+    return dd, dd_pct, equity[:, -1]
+
+
+def longest_losing_streak(paths: np.ndarray) -> np.ndarray:
+    """Har bir qatordagi eng uzun ketma-ket zararli savdolar soni (sikllarsiz)."""
+    losing = paths < 0
+    counts = np.cumsum(losing, axis=1)
+    # Zararsiz savdoda hisoblagich "qayta boshlanadi": o'sha joydagi cumsum ni ayiramiz
+    resets = np.maximum.accumulate(np.where(losing, 0, counts), axis=1)
+    return (counts - resets).max(axis=1)
+
+
+def _summary(values: np.ndarray, percentiles) -> dict:
+    out = {f"p{p:g}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+    out["mean"] = float(values.mean())
+    return out
+
+
+def monte_carlo(pnl, trials: int = 10_000, method: str = "bootstrap", initial_balance: float = 1000.0,
+                seed: int = None, percentiles=(5, 50, 95), ruin_pct: float = 50.0) -> dict:
+    """
+    Savdolar PnL massivi bo'yicha Monte Carlo tahlili. Barcha sinovlar NumPy paketlarida
+    (trials x trades) hisoblanadi; katta massivlar MAX_CELLS bo'yicha bo'laklarga bo'linadi.
+
+    Returns:
+        {"trials", "trades", "method",
+         "final_equity": {p5, p50, p95, mean}, "max_drawdown": {...}, "max_drawdown_pct": {...},
+         "losing_streak": {...}, "prob_loss": yakuniy balans < boshlang'ich,
+         "prob_ruin": drawdown >= ruin_pct foiz}
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    n = len(pnl)
+    if n == 0:
+        return {"trials": 0, "trades": 0, "method": method}
+
+    rng = np.random.default_rng(seed)
+    batch = max(1, MAX_CELLS // n)
+
+    dd, dd_pct, final, streak = [], [], [], []
+    for start in range(0, trials, batch):
+        paths = sample_paths(pnl, min(batch, trials - start), method, rng)
+        d, d_pct, f = path_drawdowns(paths, initial_balance)
+        dd.append(d)
+        dd_pct.append(d_pct)
+        final.append(f)
+        streak.append(longest_losing_streak(paths))
+
+    dd, dd_pct = np.concatenate(dd), np.concatenate(dd_pct)
+    final, streak = np.concatenate(final), np.concatenate(streak)
+
+    return {
+        "trials": int(trials),
+        "trades": int(n),
+        "method": method,
+        "final_equity": _summary(final, percentiles),
+        "max_drawdown": _summary(dd, percentiles),
+        "max_drawdown_pct": _summary(dd_pct, percentiles),
+        "losing_streak": _summary(streak.astype(np.float64), percentiles),
+        "prob_loss": float(np.mean(final < initial_balance)),
+        "prob_ruin": float(np.mean(dd_pct >= ruin_pct)),
+    }
+
+
+def format_monte_carlo(mc: dict) -> str:
+    """Konsol uchun qisqa matn."""
+    if not mc.get("trades"):
+        return "Monte Carlo: savdolar yo'q"
+
+    def row(label, key, fmt):
+        s = mc[key]
+        return f"  {label:<18} {fmt.format(s['p5'])} | {fmt.format(s['p50'])} | {fmt.format(s['p95'])}"
+
+    return "\n".join([
+        f"Monte Carlo ({mc['method']}, {mc['trials']} sinov x {mc['trades']} savdo) - p5 | p50 | p95:",
+        row("Yakuniy balans", "final_equity", "${:,.2f}"),
+        row("Max Drawdown", "max_drawdown", "${:,.2f}"),
+        row("Max Drawdown %", "max_drawdown_pct", "{:.1f}%"),
+        row("Zarar seriyasi", "losing_streak", "{:.0f}"),
+        f"  Zarar ehtimoli: {mc['prob_loss'] * 100:.1f}% | Ruin ehtimoli: {mc['prob_ruin'] * 100:.1f}%",
+    ])
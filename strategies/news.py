@@ -1,14 +1,65 @@
+import bisect
 import datetime
 import json
 import os
 import logging
+import time
+from zoneinfo import ZoneInfo
+
+from tzlocal import get_localzone
+
+from strategies.sessions import SessionCalendar
 
 logger = logging.getLogger(__name__)
 
+# Kalendardagi "date"/"time" qaysi vaqt zonasida (masalan, "Asia/Tashkent", "UTC").
+# Berilmasa - server mahalliy vaqti (avvalgi datetime.now() bilan solishtirish bilan bir xil).
+CALENDAR_TZ = os.getenv("NEWS_CALENDAR_TZ")
+# Yuqori ta'sirli yangilik oynasi: yangilikdan 60 daqiqa oldin - 30 daqiqa keyin
+IMPACT_BEFORE = datetime.timedelta(minutes=60)
+IMPACT_AFTER = datetime.timedelta(minutes=30)
+# Fayl o'zgarganini (mtime) tekshirish oralig'i (soniya)
+RELOAD_CHECK_INTERVAL = 5.0
+# Oltin uchun ahamiyatli valyutalar (valyutasi ko'rsatilmagan yangiliklar ham hisobga olinadi)
+NEWS_CURRENCIES = ("USD",)
+# Bazadan (news_events) yuklanadigan o'tmish oralig'i
+DB_LOOKBACK = datetime.timedelta(days=1)
+
+
+def _calendar_tz():
+    """Kalendar zonasi: NEWS_CALENDAR_TZ yoki serverning IANA zonasi (DST o'tishlari bilan, qotirilgan offset emas)."""
+    if CALENDAR_TZ:
+        try:
+            return ZoneInfo(CALENDAR_TZ)
+        except Exception as e:
+            logger.error(f"NEWS_CALENDAR_TZ noto'g'ri ({CALENDAR_TZ}): {e}")
+    try:
+        return get_localzone()
+    except Exception as e:
+        logger.error(f"Server vaqt zonasini aniqlab bo'lmadi, UTC ishlatiladi: {e}")
+        return datetime.timezone.utc
+
+
 class NewsFilter:
-    def __init__(self):
-        self.calendar_path = os.path.join(os.path.dirname(__file__), "..", "data", "news_calendar.json")
-        self.news_events = self._load_calendar()
+    """
+    Iqtisodiy kalendar: news_calendar.json va (db berilsa) news_events jadvali bir marta o'qiladi va
+    vaqt bo'yicha saralangan indeksga aylantiriladi (tz-aware vaqt -> unix soniya). Ta'sir tekshiruvi va
+    yaqin yangiliklar bisect bilan O(log n); fayl (mtime/hajm) yoki jadval (soni/oxirgi yangilanish)
+    o'zgarsa indeks avtomatik qayta quriladi.
+    """
+    def __init__(self, calendar_path=None, db=None, currencies=NEWS_CURRENCIES, sessions=None):
+        self.calendar_path = calendar_path or os.path.join(os.path.dirname(__file__), "..", "data", "news_calendar.json")
+        self.db = db
+        self.sessions = sessions or SessionCalendar()
+        self.currencies = set(currencies) if currencies else None
+        self.news_events = []
+        self._times = []       # barcha yangiliklar vaqti (unix soniya, o'sish tartibida)
+        self._events = []      # _times ga mos yangiliklar
+        self._high_times = []  # faqat High impact vaqtlari
+        self._high_events = []
+        self._signature = None
+        self._checked_at = 0.0
+        self._ensure_index(force=True)
 
     def _load_calendar(self):
         try:
@@ -20,71 +71,100 @@ class NewsFilter:
             logger.error(f"Yangiliklar kalendarini yuklashda xatolik: {e}")
             return []
 
-    def check_news_impact(self):
-        """
-        USD uchun yaqin 1 soat ichida 'Yuqori ta'sirli' (High Impact) yangilik bor-yo'qligini tekshiradi.
-        """
-        now = datetime.datetime.now()
-        
-        for event in self.news_events:
+    def _ensure_index(self, force=False):
+        """Fayl yoki jadval o'zgargan bo'lsa indeksni qayta quradi (tekshiruv RELOAD_CHECK_INTERVAL da bir marta)."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            st = os.stat(self.calendar_path)
+            signature = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature = None
+        if self.db is not None:
+            try:
+                signature = (signature, self.db.get_news_signature())
+            except Exception as e:
+                logger.error(f"news_events jadvalini tekshirishda xatolik: {e}")
+        if not force and signature == self._signature:
+            return
+        self._signature = signature
+        self._build_index(self._load_calendar())
+
+    def _load_db_events(self, tz):
+        """news_events dagi (UTC) yangiliklar -> (unix vaqt, kalendar ko'rinishidagi dict)."""
+        if self.db is None:
+            return []
+        since = datetime.datetime.utcnow() - DB_LOOKBACK
+        try:
+            rows = self.db.get_news_events(start=since)
+        except Exception as e:
+            logger.error(f"news_events dan yuklashda xatolik: {e}")
+            return []
+        out = []
+        for row in rows:
+            event_dt = row["event_time"].replace(tzinfo=datetime.timezone.utc)
+            local = event_dt.astimezone(tz)
+            out.append((event_dt.timestamp(), {
+                "date": local.strftime("%Y-%m-%d"), "time": local.strftime("%H:%M"),
+                "title": row["title"], "impact": row["impact"], "country": row["currency"],
+            }))
+        return out
+
+    def _build_index(self, events):
+        tz = _calendar_tz()
+        parsed = []
+        for event in events:
             try:
                 # Format: "2026-01-29" va "13:30"
-                event_time_str = f"{event['date']} {event['time']}"
-                event_dt = datetime.datetime.strptime(event_time_str, "%Y-%m-%d %H:%M")
-                
-                # Vaqt farqini hisoblash (minutlarda)
-                diff = (event_dt - now).total_seconds() / 60
-                
-                # Agar yangilikka 60 minut qolgan bo'lsa yoki 30 minut o'tgan bo'lsa
-                if -30 <= diff <= 60:
-                    if event['impact'] == 'High':
-                        logger.warning(f"YUQORI TA'SIRLI YANGILIK: {event['title']} ({event_time_str})")
-                        return False # Xavfli
+                event_dt = datetime.datetime.strptime(f"{event['date']} {event['time']}", "%Y-%m-%d %H:%M")
+                parsed.append((event_dt.replace(tzinfo=tz).timestamp(), event))
             except Exception as e:
-                continue
-                
+                logger.warning(f"Yangilik o'tkazib yuborildi ({event}): {e}")
+        parsed.extend(self._load_db_events(tz))
+        if self.currencies:
+            parsed = [(t, e) for t, e in parsed if not e.get('country') or e['country'] in self.currencies]
+        parsed.sort(key=lambda item: item[0])
+
+        self.news_events = events
+        self._times = [t for t, _ in parsed]
+        self._events = [e for _, e in parsed]
+        high = [(t, e) for t, e in parsed if e.get('impact') == 'High']
+        self._high_times = [t for t, _ in high]
+        self._high_events = [e for _, e in high]
+        logger.info(f"Yangiliklar kalendari yuklandi: {len(parsed)} ta yangilik ({len(high)} ta High)")
+
+    def check_news_impact(self, now=None):
+        """
+        USD uchun yaqin 1 soat ichida 'Yuqori ta'sirli' (High Impact) yangilik bor-yo'qligini tekshiradi.
+        now: tz-aware datetime (standart - hozir).
+        """
+        self._ensure_index()
+        now = (now or datetime.datetime.now(datetime.timezone.utc)).timestamp()
+
+        # Agar yangilikka 60 minut qolgan bo'lsa yoki 30 minut o'tgan bo'lsa
+        i = bisect.bisect_left(self._high_times, now - IMPACT_AFTER.total_seconds())
+        if i < len(self._high_times) and self._high_times[i] <= now + IMPACT_BEFORE.total_seconds():
+            event = self._high_events[i]
+            logger.warning(f"YUQORI TA'SIRLI YANGILIK: {event['title']} ({event['date']} {event['time']})")
+            return False # Xavfli
+
         return True # Xavfsiz
 
-    def get_upcoming_news(self, hours=24):
+    def get_upcoming_news(self, hours=24, now=None):
         """
-        Keyingi 24 soat ichidagi muhim yangiliklarni qaytaradi.
+        Keyingi 24 soat ichidagi muhim yangiliklarni qaytaradi (vaqt bo'yicha tartiblangan).
         """
-        now = datetime.datetime.now()
-        upcoming = []
-        
-        for event in self.news_events:
-            try:
-                event_time_str = f"{event['date']} {event['time']}"
-                event_dt = datetime.datetime.strptime(event_time_str, "%Y-%m-%d %H:%M")
-                
-                if now < event_dt <= (now + datetime.timedelta(hours=hours)):
-                    upcoming.append(event)
-            except:
-                continue
-        return upcoming
-
-    def get_market_session(self):
+        self._ensure_index()
+        now = (now or datetime.datetime.now(datetime.timezone.utc)).timestamp()
+        lo = bisect.bisect_right(self._times, now)
+        hi = bisect.bisect_right(self._times, now + hours * 3600)
+        return self._events[lo:hi]
+
+    def get_market_session(self, now=None):
         """
-        Joriy sessiya (London/NY) haqidagi ma'lumotni qaytaradi.
+        Joriy sessiya (London/NY) haqidagi ma'lumotni qaytaradi: "OPEN" yoki "CLOSED".
+        Sessiya chegaralari birjalarning mahalliy vaqtida (DST bilan) - strategies/sessions.py.
         """
-        # UTC+5 (Toshkent vaqti) bo'yicha sessiyalar
-        now = datetime.datetime.now().time()
-        
-        # London: 13:00 - 21:00 (Toshkent)
-        london_start = datetime.time(13, 0)
-        london_end = datetime.time(21, 0)
-        
-        # New York: 18:00 - 02:00 (Toshkent)
-        ny_start = datetime.time(18, 0)
-        ny_end = datetime.time(2, 0)
-        
-        # NY sessiyasi tun yarmidan o'tganini hisobga olish
-        is_ny = False
-        if ny_start <= now or now <= ny_end:
-            is_ny = True
-            
-        is_london = london_start <= now <= london_end
-        
-        if is_london or is_ny:
-            return "OPEN"
-        return "CLOSED"
+        return "OPEN" if self.sessions.active_sessions(now) else "CLOSED"
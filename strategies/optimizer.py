@@ -0,0 +1,375 @@
+import hashlib
+import itertools
+import json
+import logging
+import math
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Reyting metrikalari: (kalit, katta qiymat yaxshimi)
+RANK_METRICS = (
+    ("pnl", True),
+    ("profit_factor", True),
+    ("sharpe", True),
+    ("max_dd", False),
+)
+
+
+def space_size(space: dict) -> int:
+    return math.prod(len(v) for v in space.values())
+
+
+def grid_configs(space: dict):
+    """Qidiruv maydonining barcha kombinatsiyalari (generator)."""
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def config_hash(params: dict) -> str:
+    """Konfiguratsiyaning barqaror hashi (kalitlar tartibiga bog'liq emas)."""
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def run_hash(mode: str, space: dict, **options) -> str:
+    """Qidiruv run i identifikatori: rejim + maydon + sozlamalar (masalan, samples, seed)."""
+    return f"{mode}-{config_hash({'space': space, **options})[:12]}"
+
+
+def decode_config(space: dict, index: int) -> dict:
+    """Grid ichidagi tartib raqamini (mixed-radix) konfiguratsiyaga aylantiradi."""
+    config = {}
+    for key in reversed(list(space)):
+        values = space[key]
+        index, r = divmod(index, len(values))
+        config[key] = values[r]
+    return {k: config[k] for k in space}
+
+
+def random_configs(space: dict, n: int, seed: int = 0):
+    """Grid dan takrorlanmas tasodifiy n ta konfiguratsiya (butun grid ni yaratmasdan)."""
+    total = space_size(space)
+    n = min(n, total)
+    rng = np.random.default_rng(seed)
+    if n * 2 >= total:
+        indices = rng.permutation(total)[:n]
+    else:
+        seen = set()
+        while len(seen) < n:
+            seen.update(int(i) for i in rng.integers(0, total, size=n - len(seen)))
+        indices = sorted(seen)
+        rng.shuffle(indices)
+    for i in indices:
+        yield decode_config(space, int(i))
+
+
+# --- Parallel baholash ---
+# Ishchi jarayonlar ma'lumotlarni initializer orqali bir marta oladi
+# (har bir vazifada DataFrame larni qayta pickle qilmaslik uchun).
+
+_WORKER = {}
+
+
+def _init_worker(evaluate, state):
+    _WORKER["evaluate"] = evaluate
+    _WORKER["state"] = state
+
+
+def _run_task(task):
+    idx, params = task
+    try:
+        result = _WORKER["evaluate"](_WORKER["state"], params)
+    except Exception as e:
+        result = {"error": str(e)}
+    result["params"] = params
+    return idx, result
+
+
+def run_parallel(evaluate, state, configs, workers=None, progress_every=5.0, chunksize=None, on_result=None):
+    """
+    `evaluate(state, params) -> dict` ni barcha konfiguratsiyalar uchun jarayonlar pulida bajaradi.
+
+    Natijalar tayyor bo'lishi bilan (imap_unordered) olinadi, progress va ETA
+    `progress_every` soniyada bir chop etiladi. `on_result(result)` har bir natija uchun
+    chaqiriladi (masalan, bazaga yozish uchun). Qaytariladigan ro'yxat `configs` tartibida.
+    """
+    configs = list(configs)
+    total = len(configs)
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, min(16, total // (workers * 8) or 1))
+
+    results = [None] * total
+    done = 0
+    started = time.time()
+    last_report = started
+
+    def _collect(idx, result):
+        nonlocal last_report, done
+        results[idx] = result
+        done += 1
+        if on_result:
+            on_result(result)
+        now = time.time()
+        if now - last_report >= progress_every or done == total:
+            rate = done / max(now - started, 1e-9)
+            eta = (total - done) / rate if rate > 0 else 0
+            print(f"Progress: {done}/{total} ({done / total * 100:.1f}%) | {rate:.2f} konf/s | ETA {eta / 60:.1f} min")
+            last_report = now
+
+    if workers == 1 or total <= 1:
+        _init_worker(evaluate, state)
+        for task in enumerate(configs):
+            _collect(*_run_task(task))
+        return results
+
+    with mp.Pool(processes=min(workers, total), initializer=_init_worker, initargs=(evaluate, state)) as pool:
+        for idx, result in pool.imap_unordered(_run_task, enumerate(configs), chunksize=chunksize):
+            _collect(idx, result)
+    return results
+
+
+def rank_results(results, metrics=RANK_METRICS, min_trades=5):
+    """
+    Bir nechta metrika bo'yicha reyting: har bir metrika bo'yicha o'rin (rank) hisoblanadi,
+    so'ng o'rtacha o'rin bo'yicha saralanadi. Kam savdoli konfiguratsiyalar oxiriga tushadi.
+    """
+    valid = [r for r in results if "error" not in r]
+    if not valid:
+        return []
+
+    n = len(valid)
+    ranks = np.zeros(n)
+    for key, higher_better in metrics:
+        values = np.array([r.get(key, 0.0) for r in valid], dtype=np.float64)
+        values = np.nan_to_num(values, nan=0.0, posinf=1e9, neginf=-1e9)
+        order = np.argsort(-values if higher_better else values, kind="stable")
+        metric_rank = np.empty(n)
+        metric_rank[order] = np.arange(n)
+        ranks += metric_rank
+    ranks /= len(metrics)
+
+    trades = np.array([r.get("trades", 0) for r in valid])
+    ranks[trades < min_trades] += n  # Statistik ahamiyatsiz - oxiriga
+
+    order = np.argsort(ranks, kind="stable")
+    ranked = []
+    for pos, i in enumerate(order):
+        r = dict(valid[i])
+        r["rank"] = pos + 1
+        r["avg_rank"] = float(ranks[i])
+        ranked.append(r)
+    return ranked
+
+
+# --- Moslashuvchan qidiruv (successive halving + surrogate) ---
+# Konfiguratsiyalar avval ma'lumotlarning qisqa bo'lagida baholanadi, faqat eng yaxshi
+# 1/eta qismi uzunroq bo'lakka o'tadi. `FIDELITY_KEY` - bo'lak ulushi (0..1],
+# uni evaluate() o'zi talqin qiladi (masalan, oxirgi N% shamlar).
+
+FIDELITY_KEY = "fidelity"
+
+
+def result_score(result, metric="pnl", higher_better=True, min_trades=5):
+    """Bitta natijaning skalyar bahosi (katta - yaxshi). Xato / kam savdo - -inf."""
+    if result is None or "error" in result:
+        return -math.inf
+    fidelity = result.get("params", {}).get(FIDELITY_KEY, 1.0)
+    if result.get("trades", 0) < max(1, math.ceil(min_trades * fidelity)):
+        return -math.inf
+    value = result.get(metric, 0.0)
+    if value is None or not np.isfinite(value):
+        value = 1e9 if value == math.inf else -1e9 if value == -math.inf else 0.0
+    return float(value) if higher_better else -float(value)
+
+
+def halving_rungs(min_fidelity=1 / 9, eta=3):
+    """Bo'lak ulushlari: [min_fidelity, min_fidelity*eta, ..., 1.0]."""
+    rungs = [1.0]
+    while rungs[-1] / eta >= min_fidelity * (1 - 1e-9):
+        rungs.append(rungs[-1] / eta)
+    return rungs[::-1]
+
+
+def successive_halving(evaluate, state, configs, eta=3, min_fidelity=1 / 9, workers=None,
+                       metric="pnl", higher_better=True, min_trades=5):
+    """
+    Successive halving: har bir bosqichda (rung) konfiguratsiyalar `fidelity` ulushli
+    bo'lakda baholanadi va eng yaxshi 1/eta qismi keyingi bosqichga o'tadi.
+    Oxirgi bosqich - to'liq ma'lumot (fidelity=1.0).
+
+    Returns: (oxirgi bosqich natijalari, barcha bosqichlar tarixi, sarflangan budjet)
+    Budjet to'liq backtest ekvivalentida (sum(fidelity)).
+    """
+    survivors = [dict(c) for c in configs]
+    history = []
+    budget = 0.0
+    results = []
+
+    rungs = halving_rungs(min_fidelity, eta)
+    for level, fidelity in enumerate(rungs):
+        tasks = [{**c, FIDELITY_KEY: fidelity} for c in survivors]
+        print(f"Bosqich {level + 1}/{len(rungs)}: {len(tasks)} ta konfiguratsiya, bo'lak {fidelity * 100:.0f}%")
+        results = run_parallel(evaluate, state, tasks, workers=workers)
+        budget += fidelity * len(tasks)
+        history.append({"fidelity": fidelity, "results": results})
+
+        if fidelity >= 1.0:
+            for r in results:
+                r["params"] = {k: v for k, v in r["params"].items() if k != FIDELITY_KEY}
+            break
+        scores = np.array([result_score(r, metric, higher_better, min_trades) for r in results])
+        keep = max(1, len(survivors) // eta)
+        order = np.argsort(-scores, kind="stable")[:keep]
+        survivors = [survivors[i] for i in order]
+
+    return results, history, budget
+
+
+def encode_configs(space: dict, configs) -> np.ndarray:
+    """Konfiguratsiyalarni one-hot matritsaga aylantiradi (surrogate model uchun)."""
+    offsets, width = {}, 0
+    for key, values in space.items():
+        offsets[key] = width
+        width += len(values)
+    X = np.zeros((len(configs), width + 1))
+    X[:, -1] = 1.0  # bias
+    for row, config in enumerate(configs):
+        for key, values in space.items():
+            if config.get(key) in values:
+                X[row, offsets[key] + values.index(config[key])] = 1.0
+    return X
+
+
+class RidgeSurrogate:
+    """
+    Yengil surrogate model: one-hot belgilar ustida ridge regressiya.
+    Har bir parametr qiymatining natijaga qo'shadigan hissasini baholaydi.
+    """
+    def __init__(self, space: dict, alpha: float = 1.0):
+        self.space = space
+        self.alpha = alpha
+        self.coef = None
+
+    def fit(self, configs, scores):
+        X = encode_configs(self.space, configs)
+        y = np.asarray(scores, dtype=np.float64)
+        A = X.T @ X + self.alpha * np.eye(X.shape[1])
+        self.coef = np.linalg.solve(A, X.T @ y)
+        return self
+
+    def predict(self, configs) -> np.ndarray:
+        return encode_configs(self.space, configs) @ self.coef
+
+
+def propose_configs(space, observed, scores, n, seed=0, pool_size=2000, explore=0.25):
+    """
+    Surrogate bo'yicha yangi nomzodlar: tasodifiy `pool_size` ta nuqtadan eng yaxshi
+    bashoratlilari + `explore` ulushida tasodifiy (lokal optimumga yopishib qolmaslik uchun).
+    Oldin baholanganlar takrorlanmaydi.
+    """
+    seen = {tuple(c[k] for k in space) for c in observed}
+    rng = np.random.default_rng(seed)
+    pool = [c for c in random_configs(space, pool_size, seed=int(rng.integers(1 << 31)))
+            if tuple(c[k] for k in space) not in seen]
+    if not pool:
+        return []
+
+    finite = np.isfinite(scores)
+    n_explore = int(round(n * explore)) if finite.sum() >= 2 else n
+    chosen = []
+    if n_explore < n:
+        s = np.asarray(scores, dtype=np.float64)
+        floor = s[finite].min() if finite.any() else 0.0
+        model = RidgeSurrogate(space).fit(observed, np.where(finite, s, floor))
+        order = np.argsort(-model.predict(pool), kind="stable")
+        chosen = [pool[i] for i in order[:n - n_explore]]
+    rest = [pool[i] for i in rng.permutation(len(pool)) if pool[i] not in chosen]
+    return chosen + rest[:n - len(chosen)]
+
+
+def adaptive_search(evaluate, state, space, n_configs=81, rounds=1, eta=3, min_fidelity=1 / 9,
+                    surrogate=True, workers=None, seed=0, metric="pnl", higher_better=True, min_trades=5):
+    """
+    Successive halving (bir yoki bir necha raund). Birinchi raund tasodifiy nuqtalardan
+    boshlanadi; keyingi raundlarda `surrogate=True` bo'lsa nomzodlar qisqa bo'lak natijalari
+    bo'yicha o'qitilgan RidgeSurrogate orqali taklif qilinadi.
+
+    Returns: (to'liq ma'lumotdagi natijalar, sarflangan budjet)
+    """
+    observed, observed_scores = [], []
+    finals = []
+    total_budget = 0.0
+
+    for rnd in range(rounds):
+        if rnd == 0 or not surrogate:
+            candidates = [c for c in random_configs(space, n_configs, seed=seed + rnd)
+                          if c not in observed]
+        else:
+            candidates = propose_configs(space, observed, np.array(observed_scores), n_configs, seed=seed + rnd)
+        if not candidates:
+            break
+
+        print(f"\nRaund {rnd + 1}/{rounds}: {len(candidates)} ta nomzod")
+        results, history, budget = successive_halving(
+            evaluate, state, candidates, eta, min_fidelity, workers, metric, higher_better, min_trades
+        )
+        total_budget += budget
+        finals.extend(results)
+
+        # Surrogate eng qisqa bo'lak natijalarida o'qitiladi (barcha nomzodlar uchun bor)
+        first = history[0]["results"]
+        observed.extend(candidates)
+        observed_scores.extend(result_score(r, metric, higher_better, min_trades) for r in first)
+
+    return finals, total_budget
+
+
+# --- Walk-forward ---
+# RANGE_KEY - (start, end) M15 shamlar oralig'i, evaluate() faqat shu oraliqda baholaydi.
+
+RANGE_KEY = "bar_range"
+
+
+def walk_forward_windows(n_bars, train_bars, test_bars, start=0, anchored=False):
+    """
+    Walk-forward oynalari: [(train_start, train_end, test_end), ...].
+    Har bir oyna test_bars ga suriladi; anchored=True bo'lsa train boshi joyida qoladi.
+    """
+    windows = []
+    train_start, train_end = start, start + train_bars
+    while train_end + test_bars <= n_bars:
+        windows.append((train_start, train_end, train_end + test_bars))
+        train_end += test_bars
+        if not anchored:
+            train_start += test_bars
+    return windows
+
+
+def parameter_stability(winners, space):
+    """
+    Oynalar g'oliblari bo'yicha parametrlar barqarorligi:
+    har bir parametr uchun eng ko'p tanlangan qiymat, uning ulushi va oynalar orasidagi o'zgarishlar soni.
+    """
+    out = {}
+    for key in space:
+        values = [w.get(key) for w in winners]
+        if not values:
+            continue
+        counts = {}
+        for v in values:
+            counts[v] = counts.get(v, 0) + 1
+        mode = max(counts, key=counts.get)
+        out[key] = {
+            "mode": mode,
+            "share": counts[mode] / len(values),
+            "changes": sum(1 for a, b in zip(values, values[1:]) if a != b),
+            "values": values,
+        }
+    return out
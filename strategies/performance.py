@@ -0,0 +1,230 @@
+import json
+import logging
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# UTC soatiga qarab savdo sessiyasi (kirish vaqti bo'yicha)
+SESSION_NAMES = ["ASIA", "LONDON", "NEW_YORK"]
+SESSION_BY_HOUR = np.array(
+    [0] * 7 +      # 00:00 - 07:00 Osiyo
+    [1] * 5 +      # 07:00 - 12:00 London
+    [2] * 9 +      # 12:00 - 21:00 Nyu-York (London bilan kesishma ham shu yerda)
+    [0] * 3        # 21:00 - 24:00 Osiyo (Sidney ochilishi)
+)
+
+
+def _to_utc_datetime64(times) -> np.ndarray:
+    """
+    Vaqtlarni (pandas Timestamp, datetime, datetime64) UTC datetime64[ns] massiviga o'tkazadi.
+    """
+    idx = pd.DatetimeIndex(times)
+    if idx.tz is not None:
+        idx = idx.tz_convert("UTC").tz_localize(None)
+    return idx.values.astype("datetime64[ns]")
+
+
+def _finite(value):
+    """JSON uchun: inf/NaN qiymatlarni None ga almashtiradi."""
+    if value is None:
+        return None
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def equity_curve(pnl: np.ndarray, initial_balance: float = 0.0) -> np.ndarray:
+    """Har bir savdodan keyingi balans (kumulyativ PnL)."""
+    return initial_balance + np.cumsum(np.asarray(pnl, dtype=np.float64))
+
+
+def max_drawdown(equity: np.ndarray) -> tuple:
+    """
+    Eng katta pasayish (peak -> trough).
+    Returns: (absolyut qiymat, cho'qqiga nisbatan foiz)
+    """
+    if len(equity) == 0:
+        return 0.0, 0.0
+    peaks = np.maximum.accumulate(equity)
+    drawdowns = peaks - equity
+    pos = int(np.argmax(drawdowns))
+    dd = float(drawdowns[pos])
+    dd_pct = dd / peaks[pos] * 100 if peaks[pos] > 0 else 0.0
+    return dd, float(dd_pct)
+
+
+def compute_metrics(pnl, initial_balance: float = 1000.0, periods_per_year: float = None) -> dict:
+    """
+    Savdolar PnL massividan asosiy ko'rsatkichlarni hisoblaydi (faqat NumPy, sikllarsiz).
+
+    Optimizer ichida minglab konfiguratsiyalar uchun chaqirilishi mumkin, shuning uchun
+    bu yerda pandas ishlatilmaydi.
+
+    Argumentlar:
+        pnl: Har bir savdoning natijasi (narx farqi).
+        initial_balance: Boshlang'ich balans (equity egri chizig'i uchun).
+        periods_per_year: Berilsa, Sharpe/Sortino yillik ko'rinishga keltiriladi.
+                          Aks holda savdo boshiga (per-trade) qiymatlar qaytadi.
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    n = len(pnl)
+    if n == 0:
+        return {
+            "trades": 0, "wins": 0, "losses": 0, "win_rate": 0.0, "total_pnl": 0.0,
+            "gross_profit": 0.0, "gross_loss": 0.0, "profit_factor": 0.0,
+            "avg_win": 0.0, "avg_loss": 0.0, "expectancy": 0.0,
+            "max_drawdown": 0.0, "max_drawdown_pct": 0.0,
+            "sharpe": 0.0, "sortino": 0.0, "final_equity": float(initial_balance),
+        }
+
+    win_mask = pnl > 0
+    loss_mask = pnl < 0
+    wins = int(np.count_nonzero(win_mask))
+    losses = int(np.count_nonzero(loss_mask))
+
+    gross_profit = float(pnl[win_mask].sum())
+    gross_loss = float(-pnl[loss_mask].sum())
+    profit_factor = gross_profit / gross_loss if gross_loss > 0 else math.inf
+
+    equity = equity_curve(pnl, initial_balance)
+    dd, dd_pct = max_drawdown(np.concatenate(([initial_balance], equity)))
+
+    mean = float(pnl.mean())
+    std = float(pnl.std(ddof=1)) if n > 1 else 0.0
+    downside = float(np.sqrt(np.mean(np.minimum(pnl, 0.0) ** 2)))
+    scale = math.sqrt(periods_per_year) if periods_per_year else 1.0
+
+    return {
+        "trades": n,
+        "wins": wins,
+        "losses": losses,
+        "win_rate": wins / n * 100,
+        "total_pnl": float(pnl.sum()),
+        "gross_profit": gross_profit,
+        "gross_loss": gross_loss,
+        "profit_factor": profit_factor,
+        "avg_win": gross_profit / wins if wins else 0.0,
+        "avg_loss": -gross_loss / losses if losses else 0.0,
+        "expectancy": mean,
+        "max_drawdown": dd,
+        "max_drawdown_pct": dd_pct,
+        "sharpe": mean / std * scale if std > 0 else 0.0,
+        "sortino": mean / downside * scale if downside > 0 else 0.0,
+        "final_equity": float(equity[-1]),
+    }
+
+
+def _grouped(pnl: np.ndarray, codes: np.ndarray, labels) -> dict:
+    """Guruhlar bo'yicha (bincount orqali) trades / win_rate / pnl."""
+    k = len(labels)
+    counts = np.bincount(codes, minlength=k)
+    wins = np.bincount(codes, weights=(pnl > 0).astype(np.float64), minlength=k)
+    sums = np.bincount(codes, weights=pnl, minlength=k)
+    out = {}
+    for i, label in enumerate(labels):
+        if counts[i] == 0:
+            continue
+        out[str(label)] = {
+            "trades": int(counts[i]),
+            "win_rate": float(wins[i] / counts[i] * 100),
+            "pnl": float(sums[i]),
+        }
+    return out
+
+
+def session_breakdown(pnl, times) -> dict:
+    """Kirish vaqtining UTC soati bo'yicha sessiyalar kesimidagi natijalar."""
+    pnl = np.asarray(pnl, dtype=np.float64)
+    if len(pnl) == 0:
+        return {}
+    hours = _to_utc_datetime64(times).astype("datetime64[h]").astype(np.int64) % 24
+    return _grouped(pnl, SESSION_BY_HOUR[hours], SESSION_NAMES)
+
+
+def monthly_breakdown(pnl, times) -> dict:
+    """Oylar kesimidagi natijalar (kalit: 'YYYY-MM')."""
+    pnl = np.asarray(pnl, dtype=np.float64)
+    if len(pnl) == 0:
+        return {}
+    months = _to_utc_datetime64(times).astype("datetime64[M]")
+    labels, codes = np.unique(months, return_inverse=True)
+    return _grouped(pnl, codes.ravel(), [str(m) for m in labels])
+
+
+def analyze_trades(trades: list, initial_balance: float = 1000.0, periods_per_year: float = None) -> dict:
+    """
+    Backtest savdolari ro'yxatidan (dict: time, pnl, ...) to'liq hisobotni yig'adi.
+    """
+    pnl = np.fromiter((t["pnl"] for t in trades), dtype=np.float64, count=len(trades))
+    report = {"metrics": compute_metrics(pnl, initial_balance, periods_per_year)}
+    if trades and "time" in trades[0]:
+        times = [t["time"] for t in trades]
+        report["sessions"] = session_breakdown(pnl, times)
+        report["monthly"] = monthly_breakdown(pnl, times)
+    return report
+
+
+def write_report(report: dict, trades: list, path_prefix: str, initial_balance: float = 1000.0, plot: bool = False) -> list:
+    """
+    Hisobotni diskka yozadi:
+        <prefix>.json    - ko'rsatkichlar va kesimlar
+        <prefix>.parquet - savdolar jadvali va equity (pyarrow o'rnatilgan bo'lsa)
+        <prefix>.png     - equity grafigi (plot=True bo'lsa)
+    Yozilgan fayllar ro'yxatini qaytaradi.
+    """
+    directory = os.path.dirname(path_prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    written = []
+
+    def _clean(obj):
+        if isinstance(obj, dict):
+            return {k: _clean(v) for k, v in obj.items()}
+        if isinstance(obj, (float, np.floating)):
+            return _finite(obj)
+        if isinstance(obj, np.integer):
+            return int(obj)
+        return obj
+
+    json_path = f"{path_prefix}.json"
+    with open(json_path, "w") as f:
+        json.dump(_clean(report), f, indent=4)
+    written.append(json_path)
+
+    if not trades:
+        return written
+
+    df = pd.DataFrame(trades)
+    df["equity"] = equity_curve(df["pnl"].to_numpy(), initial_balance)
+
+    parquet_path = f"{path_prefix}.parquet"
+    try:
+        df.to_parquet(parquet_path, index=False)
+        written.append(parquet_path)
+    except ImportError as e:
+        logger.warning(f"Parquet yozilmadi (pyarrow/fastparquet yo'q): {e}")
+
+    if plot:
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+        except ImportError as e:
+            logger.warning(f"Equity grafigi chizilmadi (matplotlib yo'q): {e}")
+            return written
+
+        png_path = f"{path_prefix}.png"
+        fig, ax = plt.subplots(figsize=(10, 4))
+        x = df["time"] if "time" in df else np.arange(len(df))
+        ax.plot(x, df["equity"], color="goldenrod")
+        ax.set_title("Equity")
+        ax.grid(alpha=0.3)
+        fig.tight_layout()
+        fig.savefig(png_path, dpi=100)
+        plt.close(fig)
+        written.append(png_path)
+
+    return written
@@ -0,0 +1,149 @@
+import heapq
+import logging
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from strategies.intrabar import OUTCOME_LOSS, OUTCOME_NAMES, utc_ns
+from strategies.performance import compute_metrics
+
+logger = logging.getLogger(__name__)
+
+HOUR_NS = 3600 * 1_000_000_000
+
+
+def candidates_from_exits(df_m15: pd.DataFrame, exits: dict) -> dict:
+    """
+    optimize_strategy.simulate_entries natijasini portfel uchun vaqt massivlariga o'tkazadi.
+    Savdo chiqish shamining yopilish vaqtida yopilgan deb hisoblanadi.
+    """
+    times = utc_ns(df_m15.index)
+    bar_ns = int(np.median(np.diff(times))) if len(times) > 1 else 15 * 60 * 1_000_000_000
+    return {
+        "entry_time": times[exits["entry_pos"]],
+        "exit_time": times[exits["exit_pos"]] + bar_ns,
+        "pnl": np.asarray(exits["pnl"], dtype=np.float64),
+        "sl_dist": np.asarray(exits["sl_dist"], dtype=np.float64),
+        "outcome": np.asarray(exits["outcome"]),
+        "direction": np.asarray(exits["direction"]),
+    }
+
+
+class PortfolioPolicy:
+    """
+    Portfel qoidalari (state_manager dagi bitta savdo + 4 soatlik cooldown modelining umumlashmasi).
+
+    cooldown_scope: "shared" - istalgan simvolda LOSS bo'lsa, barcha simvollar to'xtaydi;
+                    "per_symbol" - faqat o'sha simvol to'xtaydi.
+    max_open_total: bir vaqtda ochiq savdolar soni (barcha simvollar bo'yicha).
+    max_open_per_symbol: bitta simvol bo'yicha ochiq savdolar soni.
+    risk_per_trade: har bir savdoda SL gacha bo'lgan risk ($). Har xil narx shkalasidagi
+                    simvollarni bitta equity ga keltirish uchun PnL R-multiple ga aylantiriladi.
+    """
+    def __init__(self, cooldown_scope="shared", cooldown_hours=4, max_open_total=1,
+                 max_open_per_symbol=1, risk_per_trade=10.0):
+        if cooldown_scope not in ("shared", "per_symbol"):
+            raise ValueError(f"Noma'lum cooldown_scope: {cooldown_scope}")
+        self.cooldown_scope = cooldown_scope
+        self.cooldown_ns = int(cooldown_hours * HOUR_NS)
+        self.max_open_total = max_open_total
+        self.max_open_per_symbol = max_open_per_symbol
+        self.risk_per_trade = risk_per_trade
+
+
+def _symbol_stream(symbol, candidates):
+    """Bitta simvolning kirish hodisalari (vaqt bo'yicha tartiblangan)."""
+    order = np.argsort(candidates["entry_time"], kind="stable")
+    entry_time = candidates["entry_time"]
+    for j in order:
+        yield int(entry_time[j]), symbol, int(j)
+
+
+class PortfolioBacktester:
+    """
+    Ko'p simvolli backtest: har bir simvolning hodisalar oqimi heapq.merge bilan
+    yagona vaqt tartibidagi oqimga birlashtiriladi. Ochiq pozitsiyalar chiqish vaqti
+    bo'yicha heap da saqlanadi, shuning uchun har bir hodisa O(log n).
+    """
+    def __init__(self, policy: PortfolioPolicy = None, initial_balance: float = 1000.0):
+        self.policy = policy or PortfolioPolicy()
+        self.initial_balance = initial_balance
+
+    def run(self, candidates_by_symbol: dict) -> dict:
+        policy = self.policy
+        streams = [_symbol_stream(sym, c) for sym, c in candidates_by_symbol.items()]
+        events = heapq.merge(*streams)
+
+        open_heap = []                    # (exit_time, symbol, j)
+        open_per_symbol = defaultdict(int)
+        cooldown_until = defaultdict(int)  # "*" - umumiy, aks holda simvol
+        taken = []                        # (exit_time, entry_time, symbol, j)
+        skipped = {"cooldown": 0, "exposure": 0}
+
+        def release(until):
+            while open_heap and open_heap[0][0] <= until:
+                exit_time, sym, j = heapq.heappop(open_heap)
+                open_per_symbol[sym] -= 1
+                if candidates_by_symbol[sym]["outcome"][j] == OUTCOME_LOSS:
+                    key = "*" if policy.cooldown_scope == "shared" else sym
+                    cooldown_until[key] = max(cooldown_until[key], exit_time + policy.cooldown_ns)
+
+        for t, sym, j in events:
+            release(t)
+
+            key = "*" if policy.cooldown_scope == "shared" else sym
+            if t < cooldown_until[key]:
+                skipped["cooldown"] += 1
+                continue
+            if len(open_heap) >= policy.max_open_total or open_per_symbol[sym] >= policy.max_open_per_symbol:
+                skipped["exposure"] += 1
+                continue
+
+            exit_time = int(candidates_by_symbol[sym]["exit_time"][j])
+            heapq.heappush(open_heap, (exit_time, sym, j))
+            open_per_symbol[sym] += 1
+            taken.append((exit_time, t, sym, j))
+
+        return self._report(candidates_by_symbol, taken, skipped)
+
+    def _report(self, candidates_by_symbol, taken, skipped):
+        # Equity - realizatsiya qilingan PnL, chiqish vaqti tartibida
+        taken.sort()
+        symbols = sorted(candidates_by_symbol)
+        sym_code = {s: i for i, s in enumerate(symbols)}
+
+        n = len(taken)
+        pnl_usd = np.empty(n)
+        codes = np.empty(n, dtype=np.int64)
+        trades = []
+        for k, (exit_time, entry_time, sym, j) in enumerate(taken):
+            c = candidates_by_symbol[sym]
+            sl_dist = c["sl_dist"][j]
+            r_multiple = c["pnl"][j] / sl_dist if sl_dist > 0 else 0.0
+            pnl_usd[k] = r_multiple * self.policy.risk_per_trade
+            codes[k] = sym_code[sym]
+            trades.append({
+                "symbol": sym,
+                "type": str(c["direction"][j]),
+                "entry_time": pd.Timestamp(entry_time, tz="UTC"),
+                "time": pd.Timestamp(exit_time, tz="UTC"),
+                "outcome": str(OUTCOME_NAMES[c["outcome"][j]]),
+                "r": float(r_multiple),
+                "pnl": float(pnl_usd[k]),
+            })
+
+        counts = np.bincount(codes, minlength=len(symbols))
+        sums = np.bincount(codes, weights=pnl_usd, minlength=len(symbols))
+        per_symbol = {
+            s: {"trades": int(counts[i]), "pnl": float(sums[i])}
+            for i, s in enumerate(symbols)
+        }
+
+        return {
+            "metrics": compute_metrics(pnl_usd, self.initial_balance),
+            "equity": (self.initial_balance + np.cumsum(pnl_usd)).tolist(),
+            "per_symbol": per_symbol,
+            "skipped": skipped,
+            "trades": trades,
+        }
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+# Natijaga ta'sir qiluvchi kod fayllari: ular o'zgarsa, kesh avtomatik eskiradi
+CODE_FILES = [
+    "strategies/indicators.py",
+    "strategies/features.py",
+    "strategies/intrabar.py",
+    "strategies/performance.py",
+    "optimize_strategy.py",
+]
+
+
+def code_version(paths=None) -> str:
+    """Strategiya kodi fayllarining mazmunidan hash (kod versiyasi)."""
+    h = hashlib.sha256()
+    for rel in paths or CODE_FILES:
+        path = os.path.join(ROOT_DIR, rel)
+        h.update(rel.encode())
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def frame_digest(df: pd.DataFrame, columns=("open", "high", "low", "close")) -> str:
+    """Sham massivlari (vaqt + OHLC) mazmunidan hash. Indikator ustunlari hisobga olinmaydi."""
+    h = hashlib.sha256()
+    if df is None or df.empty:
+        return h.hexdigest()
+    idx = pd.DatetimeIndex(df.index)
+    if idx.tz is not None:
+        idx = idx.tz_convert("UTC")
+    h.update(np.ascontiguousarray(idx.asi8).tobytes())
+    for col in columns:
+        if col in df:
+            h.update(col.encode())
+            h.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def dataset_digest(*frames) -> str:
+    """Bir nechta DataFrame (H4, H1, M15, M1 ...) uchun umumiy hash."""
+    h = hashlib.sha256()
+    for df in frames:
+        h.update(frame_digest(df).encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Backtest / ssenariy natijalari uchun diskdagi kesh (content-addressed).
+
+    Kalit = hash(ma'lumotlar, parametrlar, kod versiyasi). Qiymat - JSON.
+    Hajm `max_bytes` dan oshsa, eng uzoq ishlatilmagan (mtime bo'yicha) yozuvlar o'chiriladi.
+    """
+    def __init__(self, directory=".cache/results", max_bytes=256 * 1024 * 1024, version=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version or code_version()
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def key(self, data_digest: str, params: dict) -> str:
+        payload = json.dumps(params, sort_keys=True, default=str)
+        h = hashlib.sha256()
+        for part in (data_digest, payload, self.version):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _entries(self):
+        """(yo'l, hajm, mtime) ro'yxati."""
+        out = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                out.append((path, st.st_size, st.st_mtime))
+        return out
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        # LRU uchun: oxirgi foydalanish vaqtini yangilash
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+
+        # Atomik yozish: vaqtinchalik fayl -> replace
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f, default=str)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        self._size += os.path.getsize(path) - old_size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Eng eski yozuvlarni hajm chegaraning 90% iga tushguncha o'chiradi."""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                continue
+        self._size = total
+        logger.info(f"Natija keshidan {removed} ta eski yozuv o'chirildi")
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
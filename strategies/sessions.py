@@ -0,0 +1,167 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+# Oltin (CME / spot) savdo kuni Nyu-York vaqti bo'yicha: 18:00 da ochiladi, ertasi kuni 17:00 da yopiladi
+# (har kuni 17:00-18:00 tanaffus). Savdo kunlari Yakshanba..Payshanba kechqurun boshlanadi, ya'ni
+# bozor Yakshanba 18:00 dan Juma 17:00 gacha ochiq. Vaqtlar mahalliy bo'lgani uchun DST avtomatik hisobga olinadi.
+MARKET_TZ = "America/New_York"
+MARKET_OPEN = (18, 0)
+MARKET_CLOSE = (17, 0)
+# Savdo kuni boshlanadigan kunlar (datetime.weekday: Dushanba = 0, Yakshanba = 6)
+SESSION_START_DAYS = (6, 0, 1, 2, 3)
+
+# Likvid sessiyalar (o'z birjasining mahalliy vaqtida)
+SESSIONS = {
+    "LONDON": ("Europe/London", (8, 0), (16, 30)),
+    "NEW_YORK": ("America/New_York", (8, 0), (17, 0)),
+}
+
+# Bozor yopiq kunlar (Nyu-York sanasi, shu kuni tugaydigan savdo kuni bo'lmaydi): (oy, kun) har yili
+HOLIDAYS = ((1, 1), (12, 25))
+# Qo'shimcha yopiq sanalar: MARKET_HOLIDAYS=2025-04-18,2025-11-27
+EXTRA_HOLIDAYS = os.getenv("MARKET_HOLIDAYS", "")
+
+# Oldindan hisoblanadigan davr (kun) va qayta hisoblash zaxirasi
+HORIZON_DAYS = 28
+REBUILD_MARGIN = timedelta(days=2)
+
+
+def _parse_dates(text: str) -> set:
+    out = set()
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            out.add(date.fromisoformat(part))
+        except ValueError:
+            logger.warning(f"MARKET_HOLIDAYS da noto'g'ri sana: {part}")
+    return out
+
+
+def _at(day: date, hm, tz) -> float:
+    """Mahalliy sana + soat:daqiqa -> unix vaqt (DST o'tishlari zoneinfo orqali)."""
+    return datetime(day.year, day.month, day.day, hm[0], hm[1], tzinfo=tz).timestamp()
+
+
+def _to_timestamp(now) -> float:
+    if now is None:
+        return time.time()
+    if isinstance(now, (int, float)):
+        return float(now)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    return now.timestamp()
+
+
+class SessionCalendar:
+    """
+    Bozor ochilish/yopilish o'tishlarining oldindan hisoblangan jadvali (UTC unix vaqtlarda).
+
+    Har bir jadval - saralangan chegaralar ro'yxati [ochilish0, yopilish0, ochilish1, ...]:
+    bisect_right natijasi toq bo'lsa, vaqt ochiq oraliq ichida. Dam olish kunlari, kunlik
+    tanaffus va bayramlar oraliqlar orasidagi bo'shliqlar sifatida kiradi. Jadval HORIZON_DAYS kunga
+    quriladi va oxiriga yaqinlashganda avtomatik uzaytiriladi.
+    """
+    def __init__(self, horizon_days: int = HORIZON_DAYS, holidays=None, sessions=None):
+        self.horizon_days = horizon_days
+        self.holidays = _parse_dates(EXTRA_HOLIDAYS) if holidays is None else set(holidays)
+        self.sessions = SESSIONS if sessions is None else sessions
+        self._lock = threading.Lock()
+        self._market = []
+        self._session_edges = {}
+        self._start = self._end = 0.0
+
+    # --- Qurish ---
+
+    def _is_holiday(self, day: date) -> bool:
+        return (day.month, day.day) in HOLIDAYS or day in self.holidays
+
+    def _build(self, now: float):
+        tz = ZoneInfo(MARKET_TZ)
+        # Joriy savdo kunini ham qamrash uchun bir kun oldindan boshlaymiz
+        first = datetime.fromtimestamp(now, tz).date() - timedelta(days=1)
+        days = [first + timedelta(days=i) for i in range(self.horizon_days + 2)]
+
+        market = []
+        for day in days:
+            if day.weekday() not in SESSION_START_DAYS:
+                continue
+            end_day = day + timedelta(days=1)
+            if self._is_holiday(end_day):
+                continue
+            market.extend((_at(day, MARKET_OPEN, tz), _at(end_day, MARKET_CLOSE, tz)))
+
+        session_edges = {}
+        for name, (zone, start, end) in self.sessions.items():
+            session_tz = ZoneInfo(zone)
+            edges = []
+            for day in days:
+                if day.weekday() >= 5 or self._is_holiday(day):
+                    continue
+                edges.extend((_at(day, start, session_tz), _at(day, end, session_tz)))
+            session_edges[name] = edges
+
+        self._market = market
+        self._session_edges = session_edges
+        self._start = _at(first, (0, 0), tz)
+        self._end = _at(days[-1], (0, 0), tz)
+        logger.debug(f"Sessiya jadvali qurildi: {len(market) // 2} ta savdo kuni")
+
+    def _ensure(self, ts: float):
+        if self._start <= ts < self._end - REBUILD_MARGIN.total_seconds():
+            return
+        with self._lock:
+            if not (self._start <= ts < self._end - REBUILD_MARGIN.total_seconds()):
+                self._build(ts)
+
+    # --- So'rovlar (bisect, O(log n)) ---
+
+    @staticmethod
+    def _inside(edges, ts) -> bool:
+        return bisect.bisect_right(edges, ts) % 2 == 1
+
+    def is_open(self, now=None) -> bool:
+        ts = _to_timestamp(now)
+        self._ensure(ts)
+        return self._inside(self._market, ts)
+
+    def seconds_until_open(self, now=None) -> float:
+        """Bozor ochiq bo'lsa 0, aks holda keyingi ochilishgacha soniyalar."""
+        ts = _to_timestamp(now)
+        self._ensure(ts)
+        i = bisect.bisect_right(self._market, ts)
+        if i % 2 == 1:
+            return 0.0
+        return self._market[i] - ts
+
+    def next_transition(self, now=None):
+        """Keyingi o'tish: (UTC datetime, "OPEN"|"CLOSE")."""
+        ts = _to_timestamp(now)
+        self._ensure(ts)
+        i = bisect.bisect_right(self._market, ts)
+        kind = "CLOSE" if i % 2 == 1 else "OPEN"
+        return datetime.fromtimestamp(self._market[i], timezone.utc), kind
+
+    def transitions(self, count: int = 10, now=None) -> list:
+        """Keyingi count ta o'tish: [(UTC datetime, "OPEN"|"CLOSE"), ...]."""
+        ts = _to_timestamp(now)
+        self._ensure(ts)
+        i = bisect.bisect_right(self._market, ts)
+        return [(datetime.fromtimestamp(edge, timezone.utc), "CLOSE" if j % 2 == 1 else "OPEN")
+                for j, edge in enumerate(self._market[i:i + count], start=i)]
+
+    def active_sessions(self, now=None) -> list:
+        """Hozir ochiq likvid sessiyalar (masalan, ["LONDON", "NEW_YORK"]); bozor yopiq bo'lsa []."""
+        ts = _to_timestamp(now)
+        self._ensure(ts)
+        if not self._inside(self._market, ts):
+            return []
+        return [name for name, edges in self._session_edges.items() if self._inside(edges, ts)]
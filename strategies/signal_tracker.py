@@ -0,0 +1,153 @@
+import logging
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from strategies.alerts import ThresholdIndex, ABOVE, BELOW
+
+logger = logging.getLogger(__name__)
+
+
+def _naive_utc(ts) -> datetime:
+    """Bazadagi vaqtlar naive UTC (datetime.utcnow) - sham vaqtini ham shunga keltiramiz."""
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.to_pydatetime()
+
+
+class SignalOutcomeTracker:
+    """
+    Kanalga chiqarilgan barcha ochiq signallarning SL/TP natijasini kuzatadi.
+
+    Har bir simvol uchun ikkita ThresholdIndex: TP lar va SL lar (BUY: TP - ABOVE, SL - BELOW;
+    SELL: aksincha). Yangi narx yoki sham oralig'i uchun ishlagan darajalar O(log n + k) da topiladi,
+    signalning ikkinchi darajasi indeksdan olib tashlanadi va natija bazaga bitta tranzaksiyada yoziladi.
+    Bitta shamda SL ham, TP ham tegsa - konservativ ravishda SL (backtest bilan bir xil).
+    """
+    def __init__(self, db):
+        self.db = db
+        self._tp = {}
+        self._sl = {}
+        self._signals = {}  # id -> {"symbol", "type", "sl", "tp", "price", "published_at"}
+        self._lock = threading.Lock()
+        self.resolved = []  # oxirgi yopilganlar (xabar berish uchun), drain_resolved() bilan olinadi
+
+    def load(self):
+        """Ochiq signallarni bazadan yuklash (ishga tushishda)."""
+        signals = self.db.get_open_signals()
+        with self._lock:
+            self._tp.clear()
+            self._sl.clear()
+            self._signals.clear()
+            for s in signals:
+                self._add(s)
+        logger.info(f"{len(signals)} ta ochiq signal kuzatuvga olindi")
+        return len(signals)
+
+    def _indexes(self, symbol):
+        if symbol not in self._tp:
+            self._tp[symbol] = ThresholdIndex()
+            self._sl[symbol] = ThresholdIndex()
+        return self._tp[symbol], self._sl[symbol]
+
+    def _add(self, signal):
+        if signal.sl is None or signal.tp is None:
+            return
+        tp_index, sl_index = self._indexes(signal.symbol)
+        buy = signal.signal_type == "BUY"
+        tp_index.add(signal.id, float(signal.tp), ABOVE if buy else BELOW)
+        sl_index.add(signal.id, float(signal.sl), BELOW if buy else ABOVE)
+        self._signals[signal.id] = {
+            "symbol": signal.symbol, "type": signal.signal_type, "price": signal.price,
+            "sl": float(signal.sl), "tp": float(signal.tp),
+            "published_at": signal.published_at or signal.timestamp,
+        }
+
+    def track(self, signal):
+        """Yangi chiqarilgan signal (SignalLog yozuvi)."""
+        with self._lock:
+            self._add(signal)
+
+    def open_count(self, symbol=None) -> int:
+        if symbol:
+            return len(self._tp.get(symbol, ()))
+        return len(self._signals)
+
+    def on_price(self, symbol, high: float, low: float = None, time=None, source: str = None) -> list:
+        """
+        Yangi narx (DataHandler kuzatuvchisi) yoki sham (high, low, time).
+        source: narx manbai - har bir narx alohida tekshiriladi (ticklar orasidagi oraliq olinmaydi), shuning uchun kerak emas.
+        Returns: yopilgan signallar [{"id", "outcome", "exit_price", "exit_time", ...}].
+        """
+        if not high or symbol not in self._tp:
+            return []
+        low = high if low is None else low
+        exit_time = _naive_utc(time) if time is not None else datetime.now(timezone.utc).replace(tzinfo=None)
+        with self._lock:
+            outcomes = self._pop(symbol, high, low, exit_time)
+        self._save(outcomes)
+        return outcomes
+
+    def _pop(self, symbol, high, low, exit_time, eligible=None):
+        tp_index, sl_index = self._tp[symbol], self._sl[symbol]
+        sl_hit = sl_index.pop_crossed(high, low)
+        tp_hit = tp_index.pop_crossed(high, low)
+        if eligible is not None:
+            # Sham signal chiqarilishidan oldin boshlangan bo'lsa, u signal uchun hisobga olinmaydi
+            for key in [k for k in sl_hit if k not in eligible]:
+                sl_hit.remove(key)
+                sl_index.add(key, self._signals[key]["sl"], BELOW if self._signals[key]["type"] == "BUY" else ABOVE)
+            for key in [k for k in tp_hit if k not in eligible]:
+                tp_hit.remove(key)
+                tp_index.add(key, self._signals[key]["tp"], ABOVE if self._signals[key]["type"] == "BUY" else BELOW)
+
+        outcomes = []
+        for key in sl_hit:
+            tp_index.remove(key)
+            info = self._signals.pop(key)
+            outcomes.append({"id": key, "outcome": "SL", "exit_price": info["sl"], "exit_time": exit_time, **info})
+        for key in tp_hit:
+            if key in sl_hit:
+                continue
+            sl_index.remove(key)
+            info = self._signals.pop(key)
+            outcomes.append({"id": key, "outcome": "TP", "exit_price": info["tp"], "exit_time": exit_time, **info})
+        return outcomes
+
+    def replay_bars(self, symbol, df: pd.DataFrame) -> list:
+        """
+        Bot ishlamay turgan paytdagi shamlar bo'yicha ochiq signallarni yopish (ishga tushishda).
+        Har bir sham faqat undan oldin chiqarilgan signallarga qo'llanadi.
+        """
+        if df is None or df.empty or symbol not in self._tp:
+            return []
+        outcomes = []
+        with self._lock:
+            for ts, high, low in zip(df.index, df["high"].to_numpy(), df["low"].to_numpy()):
+                bar_time = _naive_utc(ts)
+                eligible = {k for k, info in self._signals.items()
+                            if info["symbol"] == symbol and info["published_at"] and info["published_at"] <= bar_time}
+                if not eligible:
+                    continue
+                outcomes.extend(self._pop(symbol, float(high), float(low), bar_time, eligible))
+        self._save(outcomes)
+        return outcomes
+
+    def _save(self, outcomes):
+        if not outcomes:
+            return
+        try:
+            self.db.resolve_signals(outcomes)
+        except Exception as e:
+            logger.error(f"Signal natijalarini yozishda xato: {e}")
+        with self._lock:
+            self.resolved.extend(outcomes)
+        for o in outcomes:
+            logger.info(f"Signal #{o['id']} ({o['symbol']} {o['type']}) yopildi: {o['outcome']} @ {o['exit_price']:.2f}")
+
+    def drain_resolved(self) -> list:
+        with self._lock:
+            items, self.resolved = self.resolved, []
+        return items
@@ -1,87 +1,151 @@
 import json
+import logging
 import os
+import threading
 import time
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Eski (bitta savdoli) holat fayli: ishga tushishda bir marta trades jadvaliga ko'chiriladi
 STATE_FILE = "trading_state.json"
 
-def load_state():
-    if not os.path.exists(STATE_FILE):
-        return {"last_loss_time": 0, "active_trade": None}
-    try:
-        with open(STATE_FILE, "r") as f:
-            data = json.load(f)
-            # Ensure keys exist
-            if "last_loss_time" not in data: data["last_loss_time"] = 0
-            if "active_trade" not in data: data["active_trade"] = None
-            return data
-    except:
-        return {"last_loss_time": 0, "active_trade": None}
-
-def save_state(state):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=4)
-
-def open_trade(symbol, direction, entry, sl, tp):
-    state = load_state()
-    state["active_trade"] = {
-        "symbol": symbol,
-        "direction": direction,
-        "entry": entry,
-        "sl": sl,
-        "tp": tp,
-        "start_time": time.time()
-    }
-    save_state(state)
-
-def update_trade_status(current_high, current_low):
+
+class TradeBook:
     """
-    Checks if active trade hit SL or TP based on candle High/Low.
+    Savdo holati bazadagi `trades` jadvalida (db.database.Trade); bir nechta simvol va
+    bitta simvolda bir nechta ochiq savdo. Ochiq savdolar va simvollar bo'yicha oxirgi LOSS vaqti
+    xotirada ham saqlanadi (ishga tushishda indekslangan so'rovlar bilan yuklanadi, har o'zgarishda
+    avval bazaga yoziladi), shuning uchun cooldown va ochiq pozitsiya so'rovlari bazaga murojaat qilmaydi.
     """
-    state = load_state()
-    trade = state.get("active_trade")
-    
-    if not trade:
-        return
-
-    sl = trade["sl"]
-    tp = trade["tp"]
-    direction = trade["direction"]
-    
-    # Check outcomes
-    is_loss = False
-    is_win = False
-    
-    if direction == "BUY":
-        if current_low <= sl: is_loss = True
-        elif current_high >= tp: is_win = True
-    elif direction == "SELL":
-        if current_high >= sl: is_loss = True
-        elif current_low <= tp: is_win = True
-        
-    if is_loss:
-        print(f"🛑 TRADE STOPPED OUT (LOSS). Activating 4h Cooldown.")
-        state["last_loss_time"] = time.time()
-        state["active_trade"] = None
-        save_state(state)
-    elif is_win:
-        print(f"✅ TRADE WON. Clearing active trade.")
-        state["active_trade"] = None
-        save_state(state)
-
-def check_cooldown(hours=4):
-    """Returns (True, remaining_minutes) if in cooldown"""
-    state = load_state()
-    last_loss = state.get("last_loss_time", 0)
-    
-    if last_loss == 0:
+    def __init__(self, db, legacy_state_file: str = STATE_FILE):
+        self.db = db
+        self._lock = threading.Lock()
+        self._open = {}       # simvol -> [trade, ...]
+        self._last_loss = {}  # simvol -> unix vaqt
+        self._migrate_legacy(legacy_state_file)
+        self.reload()
+
+    def reload(self):
+        open_trades = self.db.get_open_trades()
+        last_loss = self.db.get_last_loss_times()
+        with self._lock:
+            self._open = {}
+            for t in open_trades:
+                self._open.setdefault(t["symbol"], []).append(t)
+            self._last_loss = {sym: _timestamp(ts) for sym, ts in last_loss.items() if ts}
+
+    def _migrate_legacy(self, path):
+        """
+        Eski trading_state.json dagi yagona savdo va last_loss_time ni bir marta ko'chirish:
+        savdo - trades jadvaliga, cooldown - Config (LAST_LOSS:<simvol>) ga; fayl .migrated ga qayta nomlanadi.
+        """
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.error(f"Eski holat faylini o'qib bo'lmadi ({path}): {e}")
+            return
+        trade = state.get("active_trade")
+        if trade:
+            self.db.open_trade(trade["symbol"], trade["direction"], trade["entry"], trade["sl"], trade["tp"],
+                               opened_at=datetime.utcfromtimestamp(trade.get("start_time", time.time())))
+        last_loss = state.get("last_loss_time", 0)
+        if last_loss:
+            # Eski model simvolni saqlamagan: cooldown asosiy simvolga yoziladi
+            symbol = trade["symbol"] if trade else "XAU/USD"
+            self.db.set_last_loss_time(symbol, datetime.utcfromtimestamp(last_loss))
+        os.replace(path, path + ".migrated")
+        logger.info(f"Eski savdo holati ({path}) trades jadvaliga o'tkazildi")
+
+    # --- O'qish (xotiradan) ---
+
+    def open_trades(self, symbol=None) -> list:
+        with self._lock:
+            if symbol:
+                return list(self._open.get(symbol, ()))
+            return [t for trades in self._open.values() for t in trades]
+
+    def exposure(self) -> dict:
+        """{simvol: {"open", "buy", "sell", "risk"}} - risk: SL gacha narx masofalari yig'indisi."""
+        with self._lock:
+            out = {}
+            for symbol, trades in self._open.items():
+                if not trades:
+                    continue
+                out[symbol] = {
+                    "open": len(trades),
+                    "buy": sum(1 for t in trades if t["direction"] == "BUY"),
+                    "sell": sum(1 for t in trades if t["direction"] == "SELL"),
+                    "risk": sum(abs(t["entry"] - t["sl"]) for t in trades),
+                }
+            return out
+
+    def check_cooldown(self, symbol, hours=4):
+        """Returns (True, remaining_minutes) if symbol is in cooldown after its last LOSS"""
+        last_loss = self._last_loss.get(symbol, 0)
+
+        if last_loss == 0:
+            return False, 0
+
+        cooldown_seconds = hours * 3600
+        elapsed = time.time() - last_loss
+
+        if elapsed < cooldown_seconds:
+            remaining = int((cooldown_seconds - elapsed) / 60)
+            return True, remaining
+
         return False, 0
-        
-    cooldown_seconds = hours * 3600
-    elapsed = time.time() - last_loss
-    
-    if elapsed < cooldown_seconds:
-        remaining = int((cooldown_seconds - elapsed) / 60)
-        return True, remaining
-    
-    return False, 0
+
+    # --- Yozish (avval baza, keyin xotira) ---
+
+    def open_trade(self, symbol, direction, entry, sl, tp):
+        trade = self.db.open_trade(symbol, direction, entry, sl, tp)
+        with self._lock:
+            self._open.setdefault(symbol, []).append(trade)
+        return trade
+
+    def update_trade_status(self, symbol, current_high, current_low):
+        """
+        Checks if open trades of the symbol hit SL or TP based on candle High/Low (or a tick: high == low).
+        Returns: closed trades [(trade, "WIN"/"LOSS"), ...]
+        """
+        closed = []
+        for trade in self.open_trades(symbol):
+            sl = trade["sl"]
+            tp = trade["tp"]
+            direction = trade["direction"]
+
+            # Check outcomes
+            status = None
+            if direction == "BUY":
+                if current_low <= sl: status = "LOSS"
+                elif current_high >= tp: status = "WIN"
+            elif direction == "SELL":
+                if current_high >= sl: status = "LOSS"
+                elif current_low <= tp: status = "WIN"
+            if status is None:
+                continue
+
+            exit_price = sl if status == "LOSS" else tp
+            now = datetime.utcnow()
+            if not self.db.close_trade(trade["id"], status, exit_price=exit_price, closed_at=now):
+                continue
+            with self._lock:
+                trades = self._open.get(symbol, [])
+                self._open[symbol] = [t for t in trades if t["id"] != trade["id"]]
+                if status == "LOSS":
+                    self._last_loss[symbol] = _timestamp(now)
+            if status == "LOSS":
+                logger.info(f"🛑 {symbol} #{trade['id']} TRADE STOPPED OUT (LOSS). Activating cooldown.")
+            else:
+                logger.info(f"✅ {symbol} #{trade['id']} TRADE WON.")
+            closed.append((trade, status))
+        return closed
+
+
+def _timestamp(dt) -> float:
+    """Bazadagi naive UTC vaqt -> unix vaqt."""
+    return (dt - datetime(1970, 1, 1)).total_seconds()
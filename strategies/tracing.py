@@ -0,0 +1,118 @@
+import bisect
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# Bosqich kechikishi gistogrammasi chegaralari (ms); oxirgi katak - undan kattalar
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class StageStats:
+    """Bitta bosqich bo'yicha yig'ma: necha marta ishladi, necha marta rad etdi, kechikish gistogrammasi."""
+    __slots__ = ("runs", "rejected", "errors", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.runs = 0
+        self.rejected = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, outcome: str, elapsed_ms: float):
+        self.runs += 1
+        if outcome == "reject":
+            self.rejected += 1
+        elif outcome == "error":
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Gistogramma bo'yicha taxminiy percentil (katak yuqori chegarasi, ms)."""
+        if not self.runs:
+            return 0.0
+        target = q / 100 * self.runs
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                # Katak chegarasi kuzatilgan maksimumdan oshmaydi
+                return min(float(LATENCY_BUCKETS_MS[i]), self.max_ms) if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "mean_ms": self.total_ms / self.runs if self.runs else 0.0,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_ms,
+        }
+
+
+class SignalTracer:
+    """
+    StrategyEngine.check_signal uchun qarorlar izi.
+
+    Har bir baholash uchun bosqichlar natijasi (pass/reject/error), qisqa kirish ma'lumotlari
+    va sarflangan vaqt cheklangan halqa buferda (oxirgi `capacity` ta baholash) saqlanadi.
+    Bosqichlar bo'yicha rad etishlar soni va kechikish gistogrammalari butun ish davomida yig'iladi.
+    O'chirilgan (enabled=False) bo'lsa, engine vaqt o'lchamaydi va hech narsa yozmaydi.
+    """
+    def __init__(self, capacity: int = 500, enabled: bool = True):
+        self.enabled = enabled
+        self.traces = deque(maxlen=capacity)
+        self.stages = {}
+        self.results = {"signal": 0, "none": 0, "error": 0}
+        # Baholash ishchi oqimlarda ishlaydi, /trace esa event loop da o'qiydi
+        self._lock = threading.Lock()
+
+    def begin(self, symbol: str) -> dict:
+        return {
+            "symbol": symbol,
+            "time": datetime.now(timezone.utc),
+            "started": time.perf_counter(),
+            "stages": [],
+            "result": None,
+            "total_ms": 0.0,
+        }
+
+    def stage(self, trace: dict, name: str, outcome: str, elapsed_ms: float, inputs: dict = None):
+        trace["stages"].append({"stage": name, "outcome": outcome, "ms": elapsed_ms, "inputs": inputs or {}})
+
+    def end(self, trace: dict, result: str):
+        """result: "signal" - signal berildi, "none" - biror bosqich rad etdi, "error" - xato/muddat."""
+        trace["result"] = result
+        trace["total_ms"] = (time.perf_counter() - trace.pop("started")) * 1000
+        with self._lock:
+            self.traces.append(trace)
+            self.results[result] = self.results.get(result, 0) + 1
+            for st in trace["stages"]:
+                self.stages.setdefault(st["stage"], StageStats()).add(st["outcome"], st["ms"])
+
+    def recent(self, limit: int = 10, symbol: str = None) -> list:
+        """Oxirgi baholashlar (yangilari birinchi)."""
+        with self._lock:
+            items = list(self.traces)
+        if symbol:
+            items = [t for t in items if t["symbol"] == symbol]
+        return items[::-1][:limit]
+
+    def summary(self) -> dict:
+        """{"results": {...}, "stages": {nom: StageStats.as_dict()}} - bosqichlar tartibida."""
+        with self._lock:
+            return {
+                "results": dict(self.results),
+                "stages": {name: st.as_dict() for name, st in self.stages.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.traces.clear()
+            self.stages.clear()
+            self.results = {"signal": 0, "none": 0, "error": 0}